@@ -3,11 +3,13 @@ analizar_precios.py
 ===================
 Lógica correcta de almacenamiento y comparación de precios.
 
-ALMACENAMIENTO:
-  data/precios_compacto.csv
-    → Una fila por producto por día
-    → Columnas: plu, nombre, marca, categoria, cat_principal,
-                precio_actual, precio_regular, fecha
+ALMACENAMIENTO (historial.py):
+  data/historial/productos.parquet
+    → Dimensión: plu_id → plu, nombre, marca, categoria, cat_principal
+  data/historial/precios/YYYYMMDD.parquet
+    → Una partición por día: plu_id, fecha, precio_actual, precio_regular
+    → Sólo se leen los días que alcanza la comparación más larga; los
+      nombres se unen sólo para las filas que llegan a los rankings
 
 ÍNDICE % (graficos.json):
     - Por cada día, para cada categoría principal:
@@ -15,6 +17,10 @@ ALMACENAMIENTO:
       que existían el día anterior.
     - Acumular esos % día a día (suma acumulada).
     - El primer día siempre es 0%.
+    - Las variaciones diarias se guardan en data/indice_diario.json y cada
+      corrida sólo calcula los días nuevos (--rebuild recalcula todo).
+    - --solo-graficos no hace nada si el histórico, el código y la fecha
+      son los de la corrida anterior (data/.cache_build.json).
 
 COMPARACIONES (resumen.json, rankings):
     - vs día anterior
@@ -32,80 +38,26 @@ CATEGORÍAS PRINCIPALES:
 
 import json
 import glob
+import os
+import numpy as np
 import pandas as pd
+from bisect import bisect_left
 from datetime import datetime, timedelta
 from pathlib import Path
 
-DIR_DATA         = Path("data")
-PRECIOS_COMPACTO = DIR_DATA / "precios_compacto.csv"
-
-# ── MAPEO DE CATEGORÍA PRINCIPAL ─────────────────────────────────────────────
-CATEGORIA_PRINCIPAL = {
-    "Golosinas":                       "Almacén",
-    "Panadería":                       "Almacén",
-    "Snacks":                          "Almacén",
-    "Cereales":                        "Almacén",
-    "Endulzantes":                     "Almacén",
-    "Aderezos Y Salsas":               "Almacén",
-    "Infusiones":                      "Almacén",
-    "Conservas":                       "Almacén",
-    "Harinas":                         "Almacén",
-    "Encurtidos":                      "Almacén",
-    "Mermeladas Y Dulces":             "Almacén",
-    "Salsas Y Puré De Tomate":        "Almacén",
-    "Aceites Y Condimentos":           "Almacén",
-    "Alimento Bebés Y Niños":          "Almacén",
-    "Arroz Y Legumbres":               "Almacén",
-    "Especias":                        "Almacén",
-    "Pasta Seca Y Rellenas":           "Almacén",
-    "Repostería":                      "Almacén",
-    "Sopas Y Saborizantes":            "Almacén",
-    "Rebozador Y Pan Rallado":         "Almacén",
-    "Leche En Polvo":                  "Almacén",
-    "Suplementos Dietarios":           "Almacén",
-    "Lácteos":                         "Frescos",
-    "Fiambres":                        "Frescos",
-    "Quesos":                          "Frescos",
-    "Carnicería":                      "Frescos",
-    "Aves":                            "Frescos",
-    "Pastas Frescas Y Tapas":          "Frescos",
-    "Comidas Elaboradas":              "Frescos",
-    "Frutas Y Verduras":               "Frescos",
-    "Pescadería":                      "Frescos",
-    "Huevos":                          "Frescos",
-    "Pescadería Congelada":            "Congelados",
-    "Nuggets Y Bocaditos":             "Congelados",
-    "Hamburguesas Y Milanesas":        "Congelados",
-    "Papas Congeladas":                "Congelados",
-    "Helados Y Postres":               "Congelados",
-    "Comidas Congeladas":              "Congelados",
-    "Vegetales Congelados":            "Congelados",
-    "Frutas Congeladas":               "Congelados",
-    "Bebidas Con Alcohol":             "Bebidas Con Alcohol",
-    "Bebidas Sin Alcohol":             "Bebidas Sin Alcohol",
-    "Lavado":                          "Limpieza",
-    "Accesorios De Limpieza":          "Limpieza",
-    "Desodorantes De Ambiente":        "Limpieza",
-    "Limpieza De Baño":                "Limpieza",
-    "Limpieza De Cocina":              "Limpieza",
-    "Limpieza De Pisos Y Superficies": "Limpieza",
-    "Lavandinas":                      "Limpieza",
-    "Cuidado Del Cabello":             "Cuidado Personal",
-    "Higiene Personal":                "Cuidado Personal",
-    "Desodorantes Y Antitranspirantes":"Cuidado Personal",
-    "Pañales E Incontinencia":         "Cuidado Personal",
-    "Cuidado Personal":                "Cuidado Personal",
-    "Cuidado Bucal":                   "Cuidado Personal",
-    "Protección Femenina":             "Cuidado Personal",
-    "Cuidado De La Piel":              "Cuidado Personal",
-    "Accesorios Perfumería":           "Cuidado Personal",
-}
+import cache_build
+import historial
+import rankings
+import submuestreo
+from categorias import ORDEN_CATS, principal_de, sin_mapear
 
-ORDEN_CATS = [
-    "Almacén", "Frescos", "Congelados",
-    "Bebidas Con Alcohol", "Bebidas Sin Alcohol",
-    "Limpieza", "Cuidado Personal",
-]
+DIR_DATA         = Path("data")
+INDICE_DIARIO    = DIR_DATA / "indice_diario.json"
+# Huella de la última corrida --solo-graficos (ver cache_build.py)
+CACHE_BUILD      = DIR_DATA / ".cache_build.json"
+# Código que decide las salidas: si cambia, --solo-graficos recalcula
+CODIGO = [Path(__file__).with_name(m) for m in (
+    "analizar_precios.py", "historial.py", "rankings.py", "categorias.py", "submuestreo.py")]
 
 PERIODOS = {
     "7d":  7,
@@ -114,30 +66,54 @@ PERIODOS = {
     "1y":  365,
 }
 
+# Horizontes de comparación de main(): nombre → (días hacia atrás, archivo de
+# ranking o None, etiqueta). 0 días = snapshot inmediatamente anterior.
+# resumen.json recibe "variacion_<nombre>" por cada uno; agregar un horizonte
+# (ej. "90d": (90, "ranking_90d.json", "90d")) es sólo otra entrada acá.
+HORIZONTES = {
+    "dia":  (0,   "ranking_dia.json",  "Día"),
+    "7d":   (7,   "ranking_7d.json",   "7d"),
+    "mes":  (30,  "ranking_mes.json",  "30d"),
+    "6m":   (180, None,                "6m"),
+    "anio": (365, "ranking_anio.json", "1año"),
+}
+# Horizonte con detalle completo en resumen.json (conteos, categorías, bajas)
+HORIZONTE_DETALLE = "dia"
+# Largo de ranking_baja_dia (los rankings de subas usan rankings.TOP_N)
+RANKING_BAJAS_N = 10
 
-def a_principal(cat):
-    cat = str(cat).strip()
-    # Buscar en cada segmento de la ruta (ej: "Golosinas > Chocolates > Almacén")
-    for segmento in cat.split('>'):
-        segmento = segmento.strip()
-        if segmento in CATEGORIA_PRINCIPAL:
-            return CATEGORIA_PRINCIPAL[segmento]
-    return cat
+# Días hacia atrás que necesita la comparación más larga
+HORIZONTE_DIAS = max(*(d for d, _, _ in HORIZONTES.values()), *PERIODOS.values())
 
 
 # ── CARGA ────────────────────────────────────────────────────────────────────
+def _leer_snapshot(archivo):
+    """Un snapshot del scraper: Parquet tipado o CSV (plu/ean siempre como str)."""
+    if archivo.endswith(".parquet"):
+        return pd.read_parquet(archivo)
+    return pd.read_csv(archivo, encoding="utf-8-sig", dtype={"plu": str, "ean": str})
+
+
 def cargar_csvs_hoy():
     hoy = datetime.now().strftime("%Y%m%d")
     patrones = [
-        f"outputs/output_bebidas/coto_bebidas_{hoy}*.csv",
-        f"outputs/output_alimentos/coto_alimentos_{hoy}*.csv",
-        f"outputs/output_hogar/coto_hogar_{hoy}*.csv",
+        f"outputs/output_bebidas/coto_bebidas_{hoy}*",
+        f"outputs/output_alimentos/coto_alimentos_{hoy}*",
+        f"outputs/output_hogar/coto_hogar_{hoy}*",
     ]
     dfs = []
     for patron in patrones:
-        for archivo in glob.glob(patron):
+        # Por corrida se prefiere el .parquet; si no está, el CSV (que puede
+        # venir comprimido con COTO_COMPRESION=gz|zst)
+        corridas = {}
+        for archivo in sorted(glob.glob(patron)):
+            base, _, ext = Path(archivo).name.partition(".")
+            if ext in ("parquet", "csv", "csv.gz", "csv.zst"):
+                corridas.setdefault(base, []).append(archivo)
+        for archivos in corridas.values():
+            archivo = next((a for a in archivos if a.endswith(".parquet")), archivos[0])
             try:
-                df = pd.read_csv(archivo, encoding="utf-8-sig")
+                df = _leer_snapshot(archivo)
                 dfs.append(df)
                 print(f"  Cargado: {archivo} ({len(df)} prods)")
             except Exception as e:
@@ -164,74 +140,78 @@ def preparar_df_dia(df_raw, fecha_str):
     df = df.drop_duplicates(subset=["plu"], keep="first")
     df["plu"] = df["plu"].astype(str)
     df["fecha"] = fecha_str
-    df["cat_principal"] = df["categoria"].apply(a_principal)
+    df["cat_principal"] = principal_de(df["categoria"])
+    faltan = sin_mapear(df["categoria"])
+    if faltan:
+        print(f"  {len(faltan)} categorías sin categoría principal (se publican tal cual): "
+              + ", ".join(f"{c} ({n})" for c, n in list(faltan.items())[:5])
+              + (" ..." if len(faltan) > 5 else ""))
     return df
 
 
 # ── ALMACENAMIENTO ───────────────────────────────────────────────────────────
-def guardar_compacto(df_dia, fecha_str):
-    """Una fila por producto por día. Re-run seguro."""
-    DIR_DATA.mkdir(parents=True, exist_ok=True)
-    cols_guardar = ["plu", "nombre", "marca", "categoria", "cat_principal",
-                    "precio_actual", "precio_regular", "fecha"]
-    df_guardar = df_dia[[c for c in cols_guardar if c in df_dia.columns]].copy()
-
-    if PRECIOS_COMPACTO.exists():
-        df_hist = pd.read_csv(PRECIOS_COMPACTO, dtype={"plu": str, "fecha": str})
-        if "cat_principal" not in df_hist.columns:
-            df_hist["cat_principal"] = df_hist["categoria"].apply(a_principal)
-        df_hist = df_hist[df_hist["fecha"] != fecha_str]
-        df_nuevo = pd.concat([df_hist, df_guardar], ignore_index=True)
-    else:
-        df_nuevo = df_guardar
+def cargar_historial():
+    """
+    Histórico desde la partición más reciente <= hoy - HORIZONTE_DIAS
+    (la que toma snapshot_en_fecha para la comparación más larga) hasta hoy.
+    El plu viene como categórica (códigos en orden alfabético) sólo para
+    ordenar; nombre/marca/categoria se unen recién en registros_ranking.
+    """
+    limite = (datetime.now() - timedelta(days=HORIZONTE_DIAS)).strftime("%Y%m%d")
+    return historial.Historial(historial.leer(desde=historial.fecha_en_o_antes(limite),
+                                              atributos=("cat_principal", "plu")))
+
 
-    df_nuevo.to_csv(PRECIOS_COMPACTO, index=False)
-    kb = PRECIOS_COMPACTO.stat().st_size / 1024
-    print(f"  precios_compacto.csv: {len(df_nuevo)} filas | {kb:.0f} KB")
-    return df_nuevo
+def guardar_compacto(df_dia, fecha_str):
+    """
+    Una partición por día en data/historial/. Re-run seguro.
+    Agrega a df_dia su columna plu_id (clave de la dimensión de productos).
+    """
+    historial.migrar_si_hace_falta()
+    df_dia["plu_id"] = historial.escribir_dia(df_dia, fecha_str)
+    hist = cargar_historial()
+    print(f"  historial: {len(df_dia)} filas del {fecha_str} | histórico cargado: {len(hist)} filas")
+    return hist
 
 
 # ── COMPARACIÓN ──────────────────────────────────────────────────────────────
-def snapshot_en_fecha(df_hist, fecha_objetivo_str):
+def snapshot_en_fecha(hist, fecha_objetivo_str):
     """Snapshot más reciente <= fecha_objetivo."""
-    fechas = sorted(df_hist["fecha"].unique())
-    candidato = None
-    for f in fechas:
-        if f <= fecha_objetivo_str:
-            candidato = f
+    candidato = hist.en_o_antes(fecha_objetivo_str)
     if candidato is None:
         return None
-    df = df_hist[df_hist["fecha"] == candidato].copy()
+    df = hist.dia(candidato)
     print(f"  Snapshot para {fecha_objetivo_str}: {candidato} ({len(df)} prods)")
     return df
 
 
-def snapshot_anterior(df_hist, fecha_hoy):
+def snapshot_anterior(hist, fecha_hoy):
     """El snapshot inmediatamente anterior a hoy."""
-    fechas = sorted(df_hist["fecha"].unique(), reverse=True)
-    for f in fechas:
-        if f < fecha_hoy:
-            df = df_hist[df_hist["fecha"] == f].copy()
-            print(f"  Snapshot anterior: {f} ({len(df)} prods)")
-            return df
-    return None
+    f = hist.anterior(fecha_hoy)
+    if f is None:
+        return None
+    df = hist.dia(f)
+    print(f"  Snapshot anterior: {f} ({len(df)} prods)")
+    return df
 
 
 def calcular_variacion(df_hoy, df_antes):
     """
     Producto a producto: diff_pct de precio_regular.
-    Solo productos que existen en ambos snapshots.
+    Solo productos que existen en ambos snapshots (por plu_id). Los datos
+    descriptivos (nombre, marca...) se conservan si df_hoy los trae.
     """
-    df_h = df_hoy[["plu", "nombre", "marca", "categoria", "cat_principal",
-                    "precio_actual", "precio_regular"]].copy()
+    cols = ["plu_id", "plu", "nombre", "marca", "categoria", "cat_principal",
+            "precio_actual", "precio_regular"]
+    df_h = df_hoy[[c for c in cols if c in df_hoy.columns]].copy()
     df_h = df_h.rename(columns={
         "precio_regular": "precio_hoy",
         "precio_actual":  "precio_actual_hoy",
     })
-    df_a = df_antes[["plu", "precio_regular"]].rename(
+    df_a = df_antes[["plu_id", "precio_regular"]].rename(
         columns={"precio_regular": "precio_antes"})
 
-    df = pd.merge(df_h, df_a, on="plu", how="inner")
+    df = pd.merge(df_h, df_a, on="plu_id", how="inner")
     df = df.dropna(subset=["precio_hoy", "precio_antes"])
     df = df[df["precio_antes"] > 0]
     df["diff_abs"] = (df["precio_hoy"] - df["precio_antes"]).round(2)
@@ -239,24 +219,103 @@ def calcular_variacion(df_hoy, df_antes):
     return df
 
 
-def calcular_variacion_cats(df_var):
-    """Variación promedio por categoría principal, ordenada."""
-    resumen = df_var.groupby("cat_principal").agg(
-        variacion_pct_promedio=("diff_pct", "mean"),
-        productos_subieron=("diff_pct", lambda x: (x > 0).sum()),
-        productos_bajaron=("diff_pct", lambda x: (x < 0).sum()),
-        productos_sin_cambio=("diff_pct", lambda x: (x == 0).sum()),
-        total_productos=("diff_pct", "count"),
-    ).reset_index()
-    resumen = resumen.rename(columns={"cat_principal": "categoria"})
-    resumen["variacion_pct_promedio"] = resumen["variacion_pct_promedio"].round(2)
+def comparar_horizontes(df_dia, hist, fecha_hoy):
+    """
+    Variación de hoy contra el snapshot de referencia de cada horizonte de
+    HORIZONTES, todos juntos: en vez de un merge por horizonte, los precios
+    de referencia se alinean a las filas de hoy con un lookup por plu_id
+    (matriz horizonte × producto) y diff_abs / diff_pct salen de una sola
+    operación vectorizada.
+
+    Devuelve {nombre: df_var} con el mismo DataFrame (filas, columnas y
+    orden) que daría calcular_variacion(df_dia, snapshot); None si no hay
+    snapshot o ningún producto en común.
+    """
+    refs = {}
+    for nombre, (dias, _, _) in HORIZONTES.items():
+        if dias == 0:
+            refs[nombre] = snapshot_anterior(hist, fecha_hoy)
+        else:
+            f = (datetime.now() - timedelta(days=dias)).strftime("%Y%m%d")
+            refs[nombre] = snapshot_en_fecha(hist, f)
+    nombres = [n for n, df in refs.items() if df is not None and len(df)]
+    resultado = dict.fromkeys(HORIZONTES)
+    if not nombres or not len(df_dia):
+        return resultado
+
+    ids = df_dia["plu_id"].to_numpy()
+    n_ids = 1 + max(int(ids.max()), *(int(refs[n]["plu_id"].max()) for n in nombres))
+    antes = np.full((len(nombres), len(ids)), np.nan)
+    lookup = np.empty(n_ids)
+    for i, nombre in enumerate(nombres):
+        lookup.fill(np.nan)
+        lookup[refs[nombre]["plu_id"].to_numpy()] = refs[nombre]["precio_regular"].to_numpy(float)
+        antes[i] = lookup[ids]
+
+    hoy = df_dia["precio_regular"].to_numpy(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        valido = ~np.isnan(hoy) & (antes > 0)
+        diff_abs = np.round(hoy - antes, 2)
+        diff_pct = np.round(diff_abs / antes * 100, 2)
+
+    cols = ["plu_id", "plu", "nombre", "marca", "categoria", "cat_principal",
+            "precio_actual", "precio_regular"]
+    base = df_dia[[c for c in cols if c in df_dia.columns]].rename(columns={
+        "precio_regular": "precio_hoy",
+        "precio_actual":  "precio_actual_hoy",
+    }).reset_index(drop=True)
+    for i, nombre in enumerate(nombres):
+        m = valido[i]
+        if not m.any():
+            continue
+        df = base[m].copy()
+        df["precio_antes"] = antes[i, m]
+        df["diff_abs"] = diff_abs[i, m]
+        df["diff_pct"] = diff_pct[i, m]
+        resultado[nombre] = df
+    return resultado
+
+
+def calcular_variacion_cats(df_var, nivel="cat_principal"):
+    """
+    Variación promedio y productos que subieron / bajaron / sin cambio por
+    categoría, en una sola pasada vectorizada: cada fila lleva un código
+    grupo × signo de diff_pct y los tres conteos salen de un bincount.
+
+    nivel: "cat_principal" (ordenadas según ORDEN_CATS) o "categoria" para
+    la tabla por subcategoría; las que no están en ORDEN_CATS van al final
+    en orden alfabético.
+    """
+    codigos, grupos = pd.factorize(df_var[nivel], sort=True)
+    diff = df_var["diff_pct"].to_numpy(float)
+    ok = (codigos >= 0) & ~np.isnan(diff)
+    codigos, diff = codigos[ok], diff[ok]
+    n = len(grupos)
+
+    # signo: 0 = bajó, 1 = sin cambio, 2 = subió
+    signo = np.sign(diff).astype(np.int64) + 1
+    conteos = np.bincount(codigos * 3 + signo, minlength=3 * n).reshape(n, 3)
+    total = conteos.sum(axis=1)
+    promedio = pd.Series(diff).groupby(codigos).mean().reindex(range(n)).to_numpy()
+
+    resumen = pd.DataFrame({
+        "categoria": np.asarray(grupos, dtype=object),
+        "variacion_pct_promedio": np.round(promedio, 2),
+        "productos_subieron": conteos[:, 2],
+        "productos_bajaron": conteos[:, 0],
+        "productos_sin_cambio": conteos[:, 1],
+        "total_productos": total,
+    })[total > 0]
     orden = {cat: i for i, cat in enumerate(ORDEN_CATS)}
-    resumen["_ord"] = resumen["categoria"].map(lambda x: orden.get(x, 999))
-    return resumen.sort_values("_ord").drop(columns="_ord")
+    ord_ = np.array([orden.get(c, len(orden)) for c in resumen["categoria"]])
+    return resumen.iloc[np.argsort(ord_, kind="stable")].reset_index(drop=True)
 
 
-def top_productos(df_var, n=20, ascendente=False):
-    df = df_var.sort_values("diff_pct", ascending=ascendente).head(n)
+def registros_ranking(df):
+    """Filas de un ranking → lista de dicts para los JSON."""
+    if "nombre" not in df.columns:
+        # Filas salidas del histórico: nombres desde la dimensión, sólo para el top
+        df = historial.describir(df)
     return df[[
         "plu", "nombre", "marca", "categoria",
         "precio_antes", "precio_hoy", "precio_actual_hoy",
@@ -264,8 +323,142 @@ def top_productos(df_var, n=20, ascendente=False):
     ]].to_dict("records")
 
 
+def top_productos(df_var, n=20, ascendente=False):
+    return registros_ranking(rankings.top_k(df_var, n, ascendente))
+
+
 # ── GRÁFICOS EN % ACUMULADO ───────────────────────────────────────────────────
-def generar_graficos_data(df_hist):
+def _iso(fecha):
+    """20260131 → "2026-01-31"."""
+    return f"{fecha // 10000:04d}-{fecha // 100 % 100:02d}-{fecha % 100:02d}"
+
+
+def variaciones_diarias(hist):
+    """
+    Variación promedio día contra día (la de calcular_variacion) entre cada
+    par de fechas consecutivas del histórico, en total y por categoría
+    principal, sin un merge por par: el histórico se pasa una vez a una
+    matriz fecha × PLU y todos los diff_pct salen de una sola operación.
+
+    Las columnas de la matriz siguen el orden alfabético del plu, el mismo
+    en que calcular_variacion sumaba, así los promedios dan bit a bit igual.
+
+    Devuelve (fechas, var, presencia):
+      fechas    → fechas del histórico (int YYYYMMDD), ordenadas
+      var       → {"total": [...], cat: [...]}; var[k][j] es el promedio de
+                  diff_pct de fechas[j-1] a fechas[j] (0.0 si no hay productos
+                  en ambos días; var[k][0] = 0.0)
+      presencia → {cat: [bool por fecha]}: si la categoría tiene productos ese día
+    """
+    df = hist.df
+    fechas = hist.fechas
+    n_f = len(fechas)
+    plu = df["plu"].cat.codes.to_numpy()
+    col = np.repeat(np.arange(n_f), [hist.rango(f)[1] - hist.rango(f)[0] for f in fechas])
+    n_plu = len(df["plu"].cat.categories)
+
+    precio = np.full((n_f, n_plu), np.nan)
+    precio[col, plu] = df["precio_regular"].to_numpy(float)
+    cats = list(df["cat_principal"].cat.categories)
+    cat = np.full((n_f, n_plu), -1, dtype=np.int16)
+    cat[col, plu] = df["cat_principal"].cat.codes.to_numpy()
+
+    # diff_pct de todos los pares (j-1, j) a la vez, con el mismo redondeo
+    antes, hoy = precio[:-1], precio[1:]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        valido = ~np.isnan(antes) & ~np.isnan(hoy) & (antes > 0)
+        diff_abs = np.round(hoy - antes, 2)
+        diff_pct = np.round(diff_abs / antes * 100, 2)
+
+    def promedios(mascara):
+        out = [0.0]
+        for j in range(n_f - 1):
+            vals = diff_pct[j][mascara[j]]
+            out.append(float(vals.sum() / len(vals)) if len(vals) else 0.0)
+        return out
+
+    var = {"total": promedios(valido)}
+    presencia = {}
+    for c in ORDEN_CATS:
+        if c not in cats:
+            continue
+        k = cats.index(c)
+        en_cat = cat == k
+        presencia[c] = en_cat.any(axis=1).tolist()
+        var[c] = promedios(valido & en_cat[:-1] & en_cat[1:])
+    return fechas, var, presencia
+
+
+def _serie_acumulada(fechas, var):
+    """Índice % acumulado: 0 el primer día, luego round(acum + var, 2)."""
+    serie = [{"fecha": _iso(fechas[0]), "pct": 0.0}]
+    acum = 0.0
+    for f, v in zip(fechas[1:], var[1:]):
+        acum = round(acum + v, 2)
+        serie.append({"fecha": _iso(f), "pct": acum})
+    return serie
+
+
+def cargar_indice_diario():
+    """Estado persistido de variaciones_diarias (o None si no hay / no se puede leer)."""
+    try:
+        with open(INDICE_DIARIO, encoding="utf-8") as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not {"fechas", "var", "presencia"} <= estado.keys():
+        return None
+    return estado
+
+
+def actualizar_indice_diario(hist, rebuild=False):
+    """
+    Trae data/indice_diario.json al día con `hist`: recalcula sólo desde la
+    última fecha guardada (por si ese día se re-corrió) hasta la última del
+    histórico. Con rebuild, o si el estado no coincide con las fechas del
+    histórico, lo rehace completo. Devuelve el estado.
+    """
+    estado = None if rebuild else cargar_indice_diario()
+    fechas = hist.fechas
+    k = None
+    if estado and estado["fechas"]:
+        ultima = estado["fechas"][-1]
+        # Las fechas guardadas dentro del rango del histórico deben ser las mismas
+        solapadas = [f for f in estado["fechas"] if f >= fechas[0]]
+        if ultima in fechas and solapadas == fechas[:len(solapadas)]:
+            k = fechas.index(ultima)
+
+    if k is None:
+        print("  índice diario: recalculando todo el histórico")
+        f, var, presencia = variaciones_diarias(hist)
+        estado = {"fechas": f, "var": var, "presencia": presencia}
+    else:
+        # Se recalcula desde `ultima` (por si ese día se re-corrió) con el día
+        # anterior como par; si `ultima` es el primer día cargado se conserva
+        i = max(k, 1)
+        parcial = historial.Historial(hist.df.iloc[hist.rango(fechas[i - 1])[0]:])
+        f, var, presencia = variaciones_diarias(parcial)
+        print(f"  índice diario: {len(f) - 1} día(s) nuevo(s) o recalculado(s)")
+        n = len(estado["fechas"]) - (1 if i == k else 0)
+        estado["fechas"] = estado["fechas"][:n] + f[1:]
+        for clave in set(estado["var"]) | set(var):
+            previo = estado["var"].get(clave, [0.0] * n)[:n]
+            estado["var"][clave] = previo + var.get(clave, [0.0] * len(f))[1:]
+        for clave in set(estado["presencia"]) | set(presencia):
+            # presencia del día anterior: la guardada manda
+            previo = estado["presencia"].get(clave, [False] * n)[:n]
+            estado["presencia"][clave] = previo + presencia.get(clave, [False] * len(f))[1:]
+
+    ruta = Path(INDICE_DIARIO)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_name(ruta.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(estado, fh, ensure_ascii=False)
+    os.replace(tmp, ruta)
+    return estado
+
+
+def generar_graficos_data(hist, rebuild=False, max_puntos=submuestreo.PUNTOS_POR_SERIE):
     """
     Para cada período construye índices % acumulados.
     
@@ -273,67 +466,46 @@ def generar_graficos_data(df_hist):
     Día N = acumulado[N-1] + promedio(diff_pct de productos que existían el día N-1)
     
     Esto refleja correctamente cuánto subió/bajó desde el inicio del período.
+    Las variaciones diarias salen del índice persistido
+    (actualizar_indice_diario); cada período es un sufijo de esas series.
+    Las series de más de max_puntos puntos se reducen con submuestreo.reducir
+    (conserva picos y pozos); None las deja completas.
     """
-    if df_hist.empty:
+    if not len(hist):
         return {}
 
-    df_hist = df_hist.copy()
-    df_hist["fecha_dt"] = pd.to_datetime(df_hist["fecha"], format="%Y%m%d")
-    df_hist = df_hist.sort_values(["fecha_dt", "plu"])
-
+    estado = actualizar_indice_diario(hist, rebuild)
+    fechas, var, presencia = estado["fechas"], estado["var"], estado["presencia"]
     hoy = pd.Timestamp.now().normalize()
     resultado = {}
 
     for periodo, dias in PERIODOS.items():
-        fecha_inicio = hoy - timedelta(days=dias)
-        df_p = df_hist[df_hist["fecha_dt"] >= fecha_inicio].copy()
-        fechas = sorted(df_p["fecha_dt"].unique())
+        fecha_inicio = int((hoy - timedelta(days=dias)).strftime("%Y%m%d"))
+        i0 = bisect_left(fechas, fecha_inicio)
 
-        if not fechas:
+        if i0 == len(fechas):
             resultado[periodo] = {"total": [], "categorias": {}}
             continue
 
-        fecha_str_0 = fechas[0].strftime("%Y-%m-%d")
-
-        # ── Total ────────────────────────────────────────────────────────────
-        serie_total = [{"fecha": fecha_str_0, "pct": 0.0}]
-        acum = 0.0
-        for i in range(1, len(fechas)):
-            dv = calcular_variacion(
-                df_p[df_p["fecha_dt"] == fechas[i]],
-                df_p[df_p["fecha_dt"] == fechas[i - 1]]
-            )
-            var = float(dv["diff_pct"].mean()) if not dv.empty else 0.0
-            acum = round(acum + var, 2)
-            serie_total.append({"fecha": fechas[i].strftime("%Y-%m-%d"), "pct": acum})
-
-        # ── Por categoría principal ───────────────────────────────────────────
-        series_cats = {}
-        for cat in ORDEN_CATS:
-            df_cat = df_p[df_p["cat_principal"] == cat]
-            if df_cat.empty:
-                continue
-            serie = [{"fecha": fecha_str_0, "pct": 0.0}]
-            acum_cat = 0.0
-            for i in range(1, len(fechas)):
-                dv = calcular_variacion(
-                    df_cat[df_cat["fecha_dt"] == fechas[i]],
-                    df_cat[df_cat["fecha_dt"] == fechas[i - 1]]
-                )
-                var = float(dv["diff_pct"].mean()) if not dv.empty else 0.0
-                acum_cat = round(acum_cat + var, 2)
-                serie.append({"fecha": fechas[i].strftime("%Y-%m-%d"), "pct": acum_cat})
-            series_cats[cat] = serie
-
-        resultado[periodo] = {"total": serie_total, "categorias": series_cats}
+        # El primer día del período arranca en 0: su variación no cuenta
+        f_p = fechas[i0:]
+        series_cats = {cat: submuestreo.reducir(_serie_acumulada(f_p, var[cat][i0:]), max_puntos)
+                       for cat in ORDEN_CATS if cat in presencia and any(presencia[cat][i0:])}
+        resultado[periodo] = {"total": submuestreo.reducir(_serie_acumulada(f_p, var["total"][i0:]), max_puntos),
+                              "categorias": series_cats}
 
     return resultado
 
 
 # ── MAIN ─────────────────────────────────────────────────────────────────────
-def main():
+def main(df_raw=None):
+    """
+    df_raw: productos de hoy ya en memoria (ej. desde coto_scrape_all);
+    si es None se cargan los CSVs de outputs/.
+    """
     import sys
-    solo_graficos = "--solo-graficos" in sys.argv
+    solo_graficos = df_raw is None and "--solo-graficos" in sys.argv
+    rebuild = "--rebuild" in sys.argv
 
     print(f"\n{'='*60}")
     print(f"  ANALISIS COTO — {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -345,34 +517,37 @@ def main():
     DIR_DATA.mkdir(parents=True, exist_ok=True)
 
     if solo_graficos:
-        # Usar precios_compacto.csv ya existente, tomar el último día como "hoy"
-        if not PRECIOS_COMPACTO.exists():
-            print("ERROR: No existe precios_compacto.csv")
+        # Usar el histórico ya existente, tomar el último día como "hoy"
+        historial.migrar_si_hace_falta()
+        if not historial.fechas():
+            print(f"ERROR: No hay histórico en {historial.DIR_HISTORIAL}")
+            return
+        # Los horizontes y períodos se cuentan desde hoy: la fecha es parte de la huella
+        clave = cache_build.huella([*historial.archivos(), *CODIGO], extra=(fecha_hoy,))
+        if not rebuild and cache_build.al_dia(CACHE_BUILD, "solo_graficos", clave):
+            print("  Sin cambios en el histórico ni en el código desde la última corrida: nada que hacer.")
             return
-        df_hist = pd.read_csv(PRECIOS_COMPACTO, dtype={"plu": str, "fecha": str})
-        if "cat_principal" not in df_hist.columns:
-            df_hist["cat_principal"] = df_hist["categoria"].apply(a_principal)
-        fecha_hoy = sorted(df_hist["fecha"].unique())[-1]
-        df_dia = df_hist[df_hist["fecha"] == fecha_hoy].copy()
+        hist = cargar_historial()
+        fecha_hoy = historial.fechas()[-1]
+        df_dia = hist.dia(fecha_hoy)
         print(f"  Usando fecha más reciente: {fecha_hoy} ({len(df_dia)} prods)")
     else:
-        print("[1/5] Cargando CSVs de hoy ...")
-        df_raw = cargar_csvs_hoy()
         if df_raw is None:
-            return
+            print("[1/5] Cargando CSVs de hoy ...")
+            df_raw = cargar_csvs_hoy()
+            if df_raw is None:
+                return
+        else:
+            print(f"[1/5] Usando {len(df_raw)} productos en memoria ...")
         df_dia = preparar_df_dia(df_raw, fecha_hoy)
-        print("\n[2/5] Guardando precios_compacto (1 fila/producto/día) ...")
-        df_hist = guardar_compacto(df_dia, fecha_hoy)
+        print("\n[2/5] Guardando histórico (1 partición/día) ...")
+        hist = guardar_compacto(df_dia, fecha_hoy)
 
     print("\n[3/5] Calculando variaciones ...")
     resumen = {
         "fecha": fecha_hoy,
         "total_productos": len(df_dia),
-        "variacion_dia":  None,
-        "variacion_7d":   None,
-        "variacion_mes":  None,
-        "variacion_6m":   None,
-        "variacion_anio": None,
+        **{f"variacion_{nombre}": None for nombre in HORIZONTES},
         "categorias_dia": [],
         "ranking_baja_dia": [],
         "productos_subieron_dia": 0,
@@ -380,79 +555,44 @@ def main():
         "productos_sin_cambio_dia": 0,
     }
 
-    # Día anterior
-    df_ayer = snapshot_anterior(df_hist, fecha_hoy)
-    if df_ayer is not None:
-        dv = calcular_variacion(df_dia, df_ayer)
-        if not dv.empty:
-            resumen["variacion_dia"]            = round(float(dv["diff_pct"].mean()), 2)
+    variaciones = comparar_horizontes(df_dia, hist, fecha_hoy)
+    for nombre, (_, archivo, etiqueta) in HORIZONTES.items():
+        dv = variaciones[nombre]
+        if dv is None:
+            continue
+        resumen[f"variacion_{nombre}"] = round(float(dv["diff_pct"].mean()), 2)
+        detalle = nombre == HORIZONTE_DETALLE
+        subas, bajas = rankings.subas_y_bajas(
+            dv, rankings.TOP_N if archivo else 0, RANKING_BAJAS_N if detalle else 0)
+        if detalle:
             resumen["productos_subieron_dia"]   = int((dv["diff_pct"] > 0).sum())
             resumen["productos_bajaron_dia"]    = int((dv["diff_pct"] < 0).sum())
             resumen["productos_sin_cambio_dia"] = int((dv["diff_pct"] == 0).sum())
-            resumen["ranking_baja_dia"]         = top_productos(dv, 10, True)
+            resumen["ranking_baja_dia"]         = registros_ranking(bajas)
             resumen["categorias_dia"]           = calcular_variacion_cats(dv).to_dict("records")
-            print(f"  Variación día: {resumen['variacion_dia']}%")
-            with open(DIR_DATA / "ranking_dia.json", "w", encoding="utf-8") as f:
-                json.dump(top_productos(dv, 20, False), f, ensure_ascii=False, indent=2)
-
-    # 7 días
-    f7 = (datetime.now() - timedelta(days=7)).strftime("%Y%m%d")
-    df_7d = snapshot_en_fecha(df_hist, f7)
-    if df_7d is not None:
-        dv = calcular_variacion(df_dia, df_7d)
-        if not dv.empty:
-            resumen["variacion_7d"] = round(float(dv["diff_pct"].mean()), 2)
-            print(f"  Variación 7d: {resumen['variacion_7d']}%")
-            with open(DIR_DATA / "ranking_7d.json", "w", encoding="utf-8") as f:
-                json.dump(top_productos(dv, 20, False), f, ensure_ascii=False, indent=2)
-
-    # 30 días
-    f30 = (datetime.now() - timedelta(days=30)).strftime("%Y%m%d")
-    df_mes = snapshot_en_fecha(df_hist, f30)
-    if df_mes is not None:
-        dv = calcular_variacion(df_dia, df_mes)
-        if not dv.empty:
-            resumen["variacion_mes"] = round(float(dv["diff_pct"].mean()), 2)
-            print(f"  Variación 30d: {resumen['variacion_mes']}%")
-            with open(DIR_DATA / "ranking_mes.json", "w", encoding="utf-8") as f:
-                json.dump(top_productos(dv, 20, False), f, ensure_ascii=False, indent=2)
-
-    # 6 meses
-    f6m = (datetime.now() - timedelta(days=180)).strftime("%Y%m%d")
-    df_6m = snapshot_en_fecha(df_hist, f6m)
-    if df_6m is not None:
-        dv = calcular_variacion(df_dia, df_6m)
-        if not dv.empty:
-            resumen["variacion_6m"] = round(float(dv["diff_pct"].mean()), 2)
-            print(f"  Variación 6m: {resumen['variacion_6m']}%")
-
-    # 1 año
-    f1y = (datetime.now() - timedelta(days=365)).strftime("%Y%m%d")
-    df_1y = snapshot_en_fecha(df_hist, f1y)
-    if df_1y is not None:
-        dv = calcular_variacion(df_dia, df_1y)
-        if not dv.empty:
-            resumen["variacion_anio"] = round(float(dv["diff_pct"].mean()), 2)
-            print(f"  Variación 1y: {resumen['variacion_anio']}%")
-            with open(DIR_DATA / "ranking_anio.json", "w", encoding="utf-8") as f:
-                json.dump(top_productos(dv, 20, False), f, ensure_ascii=False, indent=2)
+        print(f"  Variación {etiqueta}: {resumen[f'variacion_{nombre}']}%")
+        if archivo:
+            with open(DIR_DATA / archivo, "w", encoding="utf-8") as f:
+                json.dump(registros_ranking(subas), f, ensure_ascii=False, indent=2)
 
     print("\n[4/5] Guardando resumen.json ...")
     with open(DIR_DATA / "resumen.json", "w", encoding="utf-8") as f:
         json.dump(resumen, f, ensure_ascii=False, indent=2)
 
     print("\n[5/5] Generando graficos.json (índices % acumulados) ...")
-    graficos = generar_graficos_data(df_hist)
+    graficos = generar_graficos_data(hist, rebuild)
     with open(DIR_DATA / "graficos.json", "w", encoding="utf-8") as f:
         json.dump(graficos, f, ensure_ascii=False, indent=2)
 
+    if solo_graficos:
+        salidas = [DIR_DATA / "resumen.json", DIR_DATA / "graficos.json", INDICE_DIARIO]
+        salidas += [DIR_DATA / archivo for _, archivo, _ in HORIZONTES.values() if archivo]
+        cache_build.registrar(CACHE_BUILD, "solo_graficos", clave, salidas)
+
     print(f"\n{'='*60}")
     print(f"  LISTO — {resumen['total_productos']} productos")
-    for k, v in [("Día",  resumen["variacion_dia"]),
-                 ("7d",   resumen["variacion_7d"]),
-                 ("30d",  resumen["variacion_mes"]),
-                 ("6m",   resumen["variacion_6m"]),
-                 ("1año", resumen["variacion_anio"])]:
+    for nombre, (_, _, k) in HORIZONTES.items():
+        v = resumen[f"variacion_{nombre}"]
         if v is not None:
             emoji = "📈" if v > 0 else "📉"
             print(f"  {k}: {emoji} {v}%")
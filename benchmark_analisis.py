@@ -0,0 +1,567 @@
+"""
+benchmark_analisis.py
+=====================
+Benchmarks de analizar_precios sobre un histórico sintético (no necesita
+datos reales ni red): N productos con precios que cambian de a saltos,
+altas y bajas de productos, días faltantes y categorías con rutas reales.
+
+Uso:
+  python benchmark_analisis.py historial [--productos 14000] [--dias 365]
+      Escritura diaria, tamaño y lectura del histórico: precios_compacto.csv
+      reescrito completo vs. particiones anchas por día vs. dimensión de
+      productos + hechos angostos (historial.py).
+
+  python benchmark_analisis.py snapshots [--productos 14000] [--dias 365]
+      Las 5 búsquedas de snapshot de main(): unique + recorrido + máscara
+      + copia vs. Historial (bisect + slice).
+
+  python benchmark_analisis.py graficos [--productos 5000] [--dias 200]
+      generar_graficos_data: un calcular_variacion (merge) por período ×
+      categoría × día vs. la matriz fecha × PLU de variaciones_diarias.
+
+  python benchmark_analisis.py indice [--productos 14000] [--dias 365]
+      graficos.json con el índice diario persistido: recalculado completo
+      (--rebuild) vs. incremental con un día nuevo.
+
+  python benchmark_analisis.py horizontes [--productos 14000] [--dias 365]
+      Las comparaciones de main() (día, 7d, 30d, 6m, 1 año): un merge +
+      ranking por horizonte vs. comparar_horizontes (lookup por plu_id).
+"""
+
+import argparse
+import contextlib
+import io
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SCRIPT_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+MARCAS = ["Coto", "Arcor", "La Serenisima", "Molto", "Quilmes", "Ala", "Dove", "Knorr"]
+
+
+# ── HISTÓRICO SINTÉTICO ──────────────────────────────────────────────────────
+def fechas_sinteticas(dias, hasta=None, diarios=60, salto=3):
+    """
+    Fechas "YYYYMMDD" anteriores a `hasta` (default hoy): todos los días de
+    los últimos `diarios` y, más atrás, uno cada `salto` días (huecos como
+    los de un scraper que no corrió).
+    """
+    hasta = hasta or datetime.now()
+    fechas = []
+    for d in range(dias, 0, -1):
+        if d <= diarios or d % salto == 0:
+            fechas.append((hasta - timedelta(days=d)).strftime("%Y%m%d"))
+    return fechas
+
+
+def categorias_sinteticas():
+    from categorias import CATEGORIA_PRINCIPAL
+    cats = []
+    for i, sub in enumerate(CATEGORIA_PRINCIPAL):
+        cats.append(sub if i % 3 else f"{sub} > Varios {i % 5}")
+    return cats + ["Electro > Pequeños", "Temporada"]   # sin mapear
+
+
+def historial_sintetico(n_productos=3000, dias=400, seed=0, hasta=None):
+    """
+    Devuelve (df_hist, df_hoy):
+      df_hist → filas de precios_compacto.csv para las fechas anteriores a hoy
+      df_hoy  → productos de hoy con las columnas del scraper (para main(df_raw=))
+    """
+    from categorias import principal_de
+    rng = np.random.default_rng(seed)
+    fechas = fechas_sinteticas(dias, hasta) + [(hasta or datetime.now()).strftime("%Y%m%d")]
+    n_f = len(fechas)
+
+    plu = np.array([str(100000 + 7 * i) for i in range(n_productos)], dtype=object)
+    cats = categorias_sinteticas()
+    cat = np.array(cats, dtype=object)[rng.integers(0, len(cats), n_productos)]
+    marca = np.array(MARCAS, dtype=object)[rng.integers(0, len(MARCAS), n_productos)]
+    nombre = np.array([f"Producto {i}" for i in range(n_productos)], dtype=object)
+
+    # Precio regular: paseo multiplicativo con saltos poco frecuentes
+    base = rng.uniform(200, 20000, n_productos)
+    salto = np.where(rng.random((n_productos, n_f)) < 0.08, rng.uniform(-0.10, 0.15, (n_productos, n_f)), 0.0)
+    salto[:, 0] = 0.0
+    regular = np.round(base[:, None] * np.cumprod(1 + salto, axis=1), 2)
+    promo = rng.random((n_productos, n_f)) < 0.2
+    actual = np.where(promo, np.round(regular * 0.8, 2), regular)
+
+    # Presencia: altas escalonadas y faltantes sueltos
+    alta = rng.integers(0, n_f // 2, n_productos) * (rng.random(n_productos) < 0.3)
+    presente = (np.arange(n_f)[None, :] >= alta[:, None]) & (rng.random((n_productos, n_f)) > 0.03)
+    presente[:, -1] = True
+
+    i_p, i_f = np.nonzero(presente)
+    df = pd.DataFrame({
+        "plu": plu[i_p], "nombre": nombre[i_p], "marca": marca[i_p], "categoria": cat[i_p],
+        "precio_actual": actual[i_p, i_f], "precio_regular": regular[i_p, i_f],
+        "fecha": np.array(fechas, dtype=object)[i_f],
+    })
+    df.insert(4, "cat_principal", principal_de(df["categoria"]))
+
+    hoy = fechas[-1]
+    df_hist = df[df["fecha"] != hoy].sort_values(["fecha", "plu"], kind="stable").reset_index(drop=True)
+    df_hoy = df[df["fecha"] == hoy].drop(columns=["cat_principal", "fecha"]).reset_index(drop=True)
+    return df_hist, df_hoy
+
+
+def _cronometrar(fn, *args, repeticiones=1):
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        out = fn(*args)
+    return (time.perf_counter() - t0) / repeticiones, out
+
+
+# ── BENCH: HISTÓRICO ─────────────────────────────────────────────────────────
+def guardar_compacto_referencia(df_dia, fecha_str, ruta_csv):
+    """guardar_compacto previo: lee, filtra, concatena y reescribe todo el CSV."""
+    cols_guardar = ["plu", "nombre", "marca", "categoria", "cat_principal",
+                    "precio_actual", "precio_regular", "fecha"]
+    df_guardar = df_dia[[c for c in cols_guardar if c in df_dia.columns]].copy()
+    df_hist = pd.read_csv(ruta_csv, dtype={"plu": str, "fecha": str})
+    df_hist = df_hist[df_hist["fecha"] != fecha_str]
+    df_nuevo = pd.concat([df_hist, df_guardar], ignore_index=True)
+    df_nuevo.to_csv(ruta_csv, index=False)
+    return df_nuevo
+
+
+def bench_historial(args):
+    import analizar_precios
+    import historial
+
+    df_hist, df_hoy = historial_sintetico(args.productos, args.dias)
+    fecha_hoy = datetime.now().strftime("%Y%m%d")
+    df_dia = analizar_precios.preparar_df_dia(df_hoy, fecha_hoy)
+    print(f"Histórico: {len(df_hist)} filas, {df_hist['fecha'].nunique()} fechas; hoy {len(df_dia)} productos\n")
+
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        # Antes: leer + filtrar + concatenar + reescribir todo precios_compacto.csv
+        csv = tmp / "precios_compacto.csv"
+        df_hist.to_csv(csv, index=False)
+        t, _ = _cronometrar(guardar_compacto_referencia, df_dia, fecha_hoy, csv)
+        print(f"  precios_compacto.csv   escritura del día {t:6.2f} s | "
+              f"{csv.stat().st_size / 1e6:6.1f} MB")
+
+        # Particiones anchas (todas las columnas repetidas cada día)
+        anchas = tmp / "anchas"
+        anchas.mkdir()
+        df_todo = pd.read_csv(csv, dtype={"plu": str, "fecha": str})
+        for fecha, d in df_todo.groupby("fecha"):
+            d.to_parquet(anchas / f"{fecha}.parquet", index=False, compression="zstd")
+        mb = sum(p.stat().st_size for p in anchas.iterdir()) / 1e6
+        t, _ = _cronometrar(lambda: pd.concat([pd.read_parquet(p) for p in sorted(anchas.iterdir())]))
+        print(f"  particiones anchas      {mb:6.1f} MB | leer todo {t:5.2f} s\n")
+
+        # Ahora: dimensión de productos + hechos angostos por día
+        historial.DIR_HISTORIAL = tmp / "historial"
+        t, _ = _cronometrar(historial.migrar_csv, csv)
+        print(f"  migración: {t:.1f} s")
+        t, _ = _cronometrar(historial.escribir_dia, df_dia, fecha_hoy)
+        mb = sum(p.stat().st_size for p in historial.DIR_HISTORIAL.rglob("*.*")) / 1e6
+        print(f"  dimensión + hechos      {mb:6.1f} MB | escritura del día {t:5.2f} s")
+
+        t, df = _cronometrar(historial.leer)
+        print(f"  leer todo el histórico        {t:6.2f} s ({len(df)} filas, "
+              f"{df.memory_usage(deep=True).sum() / 1e6:.0f} MB en memoria)")
+        desde = (datetime.now() - timedelta(days=30)).strftime("%Y%m%d")
+        t, df = _cronometrar(historial.leer, desde)
+        print(f"  leer últimos 30 días          {t:6.2f} s ({len(df)} filas)")
+    finally:
+        shutil.rmtree(tmp)
+
+
+# ── BENCH: SNAPSHOTS ─────────────────────────────────────────────────────────
+def snapshot_en_fecha_referencia(df_hist, fecha_objetivo):
+    """snapshot_en_fecha previo: ordena las fechas, las recorre y enmascara toda la tabla."""
+    fechas = sorted(df_hist["fecha"].unique())
+    candidato = None
+    for f in fechas:
+        if f <= fecha_objetivo:
+            candidato = f
+    if candidato is None:
+        return None
+    return df_hist[df_hist["fecha"] == candidato].copy()
+
+
+def _historial_en_memoria(n_productos, dias):
+    """df_hist sintético con el formato de historial.leer() (plu_id, fecha int)."""
+    df_hist, _ = historial_sintetico(n_productos, dias)
+    ids = {p: i for i, p in enumerate(pd.unique(df_hist["plu"]))}
+    return pd.DataFrame({
+        "plu_id": df_hist["plu"].map(ids).to_numpy("int32"),
+        "fecha": df_hist["fecha"].astype(int).to_numpy("int32"),
+        "precio_actual": df_hist["precio_actual"].to_numpy(),
+        "precio_regular": df_hist["precio_regular"].to_numpy(),
+        "cat_principal": pd.Categorical(df_hist["cat_principal"]),
+        "plu": pd.Categorical(df_hist["plu"]),
+    })
+
+
+def bench_snapshots(args):
+    from historial import Historial
+
+    df = _historial_en_memoria(args.productos, args.dias)
+    hoy = datetime.now()
+    objetivos = [int((hoy - timedelta(days=d)).strftime("%Y%m%d")) for d in (1, 7, 30, 180, 365)]
+    print(f"Histórico: {len(df)} filas, {df['fecha'].nunique()} fechas\n")
+
+    t_ref, _ = _cronometrar(lambda: [snapshot_en_fecha_referencia(df, f) for f in objetivos], repeticiones=3)
+    t_idx, hist = _cronometrar(Historial, df)
+    t_new, _ = _cronometrar(lambda: [hist.dia(hist.en_o_antes(f)) for f in objetivos], repeticiones=3)
+    print(f"  referencia (5 snapshots)      {t_ref * 1000:8.1f} ms")
+    print(f"  Historial: índice (una vez)   {t_idx * 1000:8.1f} ms")
+    print(f"  Historial: 5 snapshots        {t_new * 1000:8.3f} ms")
+
+
+# ── BENCH: GRÁFICOS ──────────────────────────────────────────────────────────
+def generar_graficos_data_referencia(hist, max_puntos=None):
+    """
+    generar_graficos_data previo: un merge por período × categoría × par de
+    días. Las series se reducen a max_puntos igual que en el motor nuevo.
+    """
+    from analizar_precios import PERIODOS, ORDEN_CATS, calcular_variacion, _iso
+    import submuestreo
+
+    hoy = pd.Timestamp.now().normalize()
+    resultado = {}
+    dias_ordenados = {}
+
+    def dia(fecha):
+        if fecha not in dias_ordenados:
+            dias_ordenados[fecha] = hist.dia(fecha).sort_values("plu")
+        return dias_ordenados[fecha]
+
+    def serie_acumulada(fechas, filtro=None):
+        serie = [{"fecha": _iso(fechas[0]), "pct": 0.0}]
+        acum = 0.0
+        for f_antes, f_hoy in zip(fechas, fechas[1:]):
+            d_hoy, d_antes = dia(f_hoy), dia(f_antes)
+            if filtro is not None:
+                d_hoy = d_hoy[d_hoy["cat_principal"] == filtro]
+                d_antes = d_antes[d_antes["cat_principal"] == filtro]
+            dv = calcular_variacion(d_hoy, d_antes)
+            var = float(dv["diff_pct"].mean()) if not dv.empty else 0.0
+            acum = round(acum + var, 2)
+            serie.append({"fecha": _iso(f_hoy), "pct": acum})
+        return submuestreo.reducir(serie, max_puntos)
+
+    for periodo, dias in PERIODOS.items():
+        fechas = hist.desde(int((hoy - timedelta(days=dias)).strftime("%Y%m%d")))
+        if not fechas:
+            resultado[periodo] = {"total": [], "categorias": {}}
+            continue
+        series_cats = {cat: serie_acumulada(fechas, cat) for cat in ORDEN_CATS
+                       if any((dia(f)["cat_principal"] == cat).any() for f in fechas)}
+        resultado[periodo] = {"total": serie_acumulada(fechas), "categorias": series_cats}
+    return resultado
+
+
+def bench_graficos(args):
+    import analizar_precios
+    from historial import Historial
+
+    hist = Historial(_historial_en_memoria(args.productos, args.dias))
+    print(f"Histórico: {len(hist)} filas, {len(hist.fechas)} fechas\n")
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        # Índice diario en un directorio propio y reconstruido: no toca data/
+        analizar_precios.INDICE_DIARIO = tmp / "indice_diario.json"
+        puntos = analizar_precios.submuestreo.PUNTOS_POR_SERIE
+        t_ref, ref = _cronometrar(generar_graficos_data_referencia, hist, puntos)
+        t_new, new = _cronometrar(analizar_precios.generar_graficos_data, hist, True, puntos)
+    finally:
+        shutil.rmtree(tmp)
+    print(f"  merge por día (antes)   {t_ref:7.2f} s")
+    print(f"  matriz fecha × PLU      {t_new:7.2f} s   ({t_ref / t_new:.0f}x)")
+    print(f"  graficos idénticos: {ref == new}")
+
+
+# ── BENCH: ÍNDICE DIARIO INCREMENTAL ─────────────────────────────────────────
+def bench_indice(args):
+    import analizar_precios
+    from historial import Historial
+
+    df = _historial_en_memoria(args.productos, args.dias)
+    hist = Historial(df)
+    ayer = Historial(df.iloc[:hist.rango(hist.fechas[-1])[0]])
+    print(f"Histórico: {len(hist)} filas, {len(hist.fechas)} fechas\n")
+
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        analizar_precios.INDICE_DIARIO = tmp / "indice_diario.json"
+        analizar_precios.generar_graficos_data(ayer, rebuild=True)
+        t_inc, inc = _cronometrar(analizar_precios.generar_graficos_data, hist)
+        t_full, full = _cronometrar(analizar_precios.generar_graficos_data, hist, True)
+        kb = analizar_precios.INDICE_DIARIO.stat().st_size / 1024
+        print(f"\n  --rebuild (todo el histórico)  {t_full * 1000:8.1f} ms")
+        print(f"  incremental (1 día nuevo)     {t_inc * 1000:8.1f} ms   ({t_full / t_inc:.0f}x)")
+        print(f"  indice_diario.json: {kb:.0f} KB | graficos idénticos: {inc == full}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+# ── BENCH: HORIZONTES DE main() ──────────────────────────────────────────────
+def comparar_horizontes_referencia(df_dia, hist, fecha_hoy):
+    """Bloques previos de main(): un calcular_variacion (merge) por horizonte."""
+    from analizar_precios import HORIZONTES, calcular_variacion, snapshot_anterior, snapshot_en_fecha
+
+    resultado = {}
+    for nombre, (dias, _, _) in HORIZONTES.items():
+        if dias == 0:
+            df_antes = snapshot_anterior(hist, fecha_hoy)
+        else:
+            df_antes = snapshot_en_fecha(hist, (datetime.now() - timedelta(days=dias)).strftime("%Y%m%d"))
+        dv = calcular_variacion(df_dia, df_antes) if df_antes is not None else None
+        resultado[nombre] = dv if dv is not None and not dv.empty else None
+    return resultado
+
+
+def bench_horizontes(args):
+    from analizar_precios import HORIZONTES, comparar_horizontes, top_productos
+    from historial import Historial
+
+    hist = Historial(_historial_en_memoria(args.productos, args.dias))
+    fecha_hoy = hist.fechas[-1]
+    df_dia = hist.dia(fecha_hoy)
+    # Con descripciones, para que top_productos no vaya a la dimensión en disco
+    df_dia = df_dia.assign(nombre=df_dia["plu"].astype(str), marca="", categoria="")
+    print(f"Histórico: {len(hist)} filas | hoy: {len(df_dia)} productos | "
+          f"{len(HORIZONTES)} horizontes\n")
+
+    def con_rankings(comparar):
+        with contextlib.redirect_stdout(io.StringIO()):
+            dvs = comparar(df_dia, hist, fecha_hoy)
+        rankings = {n: top_productos(dv, 20, False) for n, dv in dvs.items()
+                    if dv is not None and HORIZONTES[n][1]}
+        return dvs, rankings
+
+    t_ref, (ref, rk_ref) = _cronometrar(con_rankings, comparar_horizontes_referencia, repeticiones=3)
+    t_new, (new, rk_new) = _cronometrar(con_rankings, comparar_horizontes, repeticiones=3)
+    medias = all((ref[n] is None) == (new[n] is None) and
+                 (ref[n] is None or ref[n]["diff_pct"].mean() == new[n]["diff_pct"].mean())
+                 for n in HORIZONTES)
+    print(f"  un merge por horizonte    {t_ref * 1000:8.1f} ms")
+    print(f"  comparar_horizontes       {t_new * 1000:8.1f} ms   ({t_ref / t_new:.1f}x)")
+    print(f"  promedios idénticos: {medias} | rankings idénticos: {rk_ref == rk_new}")
+
+
+# ── BENCH: RANKINGS ──────────────────────────────────────────────────────────
+def bench_rankings(args):
+    import rankings
+
+    rng = np.random.default_rng(0)
+    n = args.productos
+    # diff_pct redondeado a 2 decimales, con muchos 0 y empates como los reales
+    diff = np.round(np.where(rng.random(n) < 0.6, 0.0, rng.normal(0, 8, n)), 2)
+    dv = pd.DataFrame({
+        "plu": pd.Categorical(np.char.mod("%06d", rng.permutation(n) + 100000)),
+        "precio_hoy": rng.uniform(100, 20000, n).round(2),
+        "diff_pct": diff,
+    })
+    dv["precio_antes"] = (dv["precio_hoy"] / (1 + dv["diff_pct"] / 100)).round(2)
+    h = args.horizontes
+    print(f"{n} productos × {h} horizontes × (top {rankings.TOP_N} subas + bajas)\n")
+
+    def completo():
+        return [(dv.sort_values("diff_pct", ascending=False).head(rankings.TOP_N),
+                 dv.sort_values("diff_pct", ascending=True).head(rankings.TOP_N))
+                for _ in range(h)]
+
+    def parcial():
+        return [rankings.subas_y_bajas(dv) for _ in range(h)]
+
+    t_ref, ref = _cronometrar(completo, repeticiones=5)
+    t_new, new = _cronometrar(parcial, repeticiones=5)
+    mismos = all(a["diff_pct"].tolist() == c["diff_pct"].tolist() and
+                 b["diff_pct"].tolist() == d["diff_pct"].tolist()
+                 for (a, b), (c, d) in zip(ref, new))
+    print(f"  sort_values + head      {t_ref * 1000:8.1f} ms")
+    print(f"  subas_y_bajas           {t_new * 1000:8.1f} ms   ({t_ref / t_new:.1f}x)")
+    print(f"  mismos diff_pct: {mismos} (el orden de los empates ahora es por plu)")
+
+
+# ── BENCH: CATEGORÍAS ────────────────────────────────────────────────────────
+def a_principal_referencia(cat):
+    """a_principal previa: sin memoizar, parte la ruta en cada llamada."""
+    from categorias import CATEGORIA_PRINCIPAL
+    cat = str(cat).strip()
+    for segmento in cat.split('>'):
+        segmento = segmento.strip()
+        if segmento in CATEGORIA_PRINCIPAL:
+            return CATEGORIA_PRINCIPAL[segmento]
+    return cat
+
+
+def bench_categorias(args):
+    from categorias import principal_de, sin_mapear
+
+    df_hist, _ = historial_sintetico(args.productos, args.dias)
+    rutas = df_hist["categoria"]
+    print(f"Histórico: {len(rutas)} filas, {rutas.nunique()} rutas distintas\n")
+    t_ref, ref = _cronometrar(lambda: rutas.apply(a_principal_referencia))
+    t_new, new = _cronometrar(principal_de, rutas, repeticiones=3)
+    t_cat, _ = _cronometrar(principal_de, rutas.astype("category"), repeticiones=3)
+    print(f"  .apply(a_principal)           {t_ref * 1000:8.1f} ms")
+    print(f"  principal_de                  {t_new * 1000:8.1f} ms   ({t_ref / t_new:.0f}x)")
+    print(f"  principal_de (categórica)     {t_cat * 1000:8.1f} ms   ({t_ref / t_cat:.0f}x)")
+    print(f"  resultado idéntico: {ref.equals(new)} | sin mapear: {sin_mapear(rutas)}")
+
+
+# ── BENCH: AGREGACIÓN POR CATEGORÍA ──────────────────────────────────────────
+def calcular_variacion_cats_referencia(df_var, nivel="cat_principal"):
+    """calcular_variacion_cats previa: groupby con tres lambdas y orden por .map."""
+    from categorias import ORDEN_CATS
+    resumen = df_var.groupby(nivel, observed=True).agg(
+        variacion_pct_promedio=("diff_pct", "mean"),
+        productos_subieron=("diff_pct", lambda x: (x > 0).sum()),
+        productos_bajaron=("diff_pct", lambda x: (x < 0).sum()),
+        productos_sin_cambio=("diff_pct", lambda x: (x == 0).sum()),
+        total_productos=("diff_pct", "count"),
+    ).reset_index()
+    resumen = resumen.rename(columns={nivel: "categoria"})
+    resumen["variacion_pct_promedio"] = resumen["variacion_pct_promedio"].round(2)
+    orden = {cat: i for i, cat in enumerate(ORDEN_CATS)}
+    resumen["_ord"] = resumen["categoria"].map(lambda x: orden.get(x, 999))
+    return resumen.sort_values("_ord", kind="stable").drop(columns="_ord")
+
+
+def bench_agregacion(args):
+    from analizar_precios import calcular_variacion_cats
+    from categorias import ORDEN_CATS
+
+    rng = np.random.default_rng(0)
+    n = args.productos
+    diff = np.round(np.where(rng.random(n) < 0.6, 0.0, rng.normal(0, 8, n)), 2)
+    print(f"{n} productos\n")
+    for g in (int(x) for x in args.grupos.split(",")):
+        nombres = (ORDEN_CATS + [f"Subcategoría {i:03d}" for i in range(g)])[:g]
+        dv = pd.DataFrame({"cat_principal": np.array(nombres, dtype=object)[rng.integers(0, g, n)],
+                           "diff_pct": diff})
+        t_ref, ref = _cronometrar(calcular_variacion_cats_referencia, dv, repeticiones=5)
+        t_new, new = _cronometrar(calcular_variacion_cats, dv, repeticiones=5)
+        igual = ref.to_dict("records") == new.to_dict("records")
+        print(f"  {g:5d} grupos: lambdas {t_ref * 1000:7.1f} ms | bincount {t_new * 1000:6.1f} ms "
+              f"({t_ref / t_new:.0f}x) | idénticos: {igual}")
+
+
+# ── BENCH: SUBMUESTREO DE SERIES ─────────────────────────────────────────────
+def bench_submuestreo(args):
+    import json
+    import submuestreo
+    from analizar_precios import _serie_acumulada
+
+    rng = np.random.default_rng(0)
+    hoy = datetime.now()
+    fechas = [int((hoy - timedelta(days=d)).strftime("%Y%m%d")) for d in range(args.dias, -1, -1)]
+    series = []
+    for _ in range(8):
+        var = np.round(rng.normal(0.08, 0.4, len(fechas)), 2)
+        var[rng.integers(1, len(fechas), 3)] += rng.choice([-12.0, 12.0], 3)   # picos sueltos
+        series.append(_serie_acumulada(fechas, var.tolist()))
+    bytes_completo = len(json.dumps(series))
+    print(f"8 series × {len(fechas)} puntos → {args.puntos} puntos por serie\n")
+    print(f"  completo       {bytes_completo / 1024:7.1f} KB")
+    for metodo in ("minmax", "lttb"):
+        t, red = _cronometrar(lambda: [submuestreo.reducir(s, args.puntos, metodo) for s in series], repeticiones=5)
+        extremos = all(max(p["pct"] for p in r) == max(p["pct"] for p in s) and
+                       min(p["pct"] for p in r) == min(p["pct"] for p in s) for r, s in zip(red, series))
+        print(f"  {metodo:<8}       {len(json.dumps(red)) / 1024:7.1f} KB   {t * 1000:6.1f} ms   "
+              f"máximos y mínimos conservados: {extremos}")
+
+
+# ── BENCH: BUSCADOR DE PRODUCTOS (generar_web) ───────────────────────────────
+def bench_productos(args):
+    import generar_web
+    import historial
+
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        historial.DIR_HISTORIAL = tmp / "historial"
+        generar_web.DIR_DOCS = tmp / "docs"
+        generar_web.DIR_DATOS_WEB = tmp / "docs" / "datos"
+        df_hist, _ = historial_sintetico(args.productos, args.dias)
+        t_arma, _ = _cronometrar(lambda: [historial.escribir_dia(d, f) for f, d in df_hist.groupby("fecha")])
+        print(f"Histórico sintético: {len(df_hist)} filas, {len(historial.fechas())} días "
+              f"(armado en {t_arma:.1f} s)\n")
+
+        t, productos = _cronometrar(generar_web.escribir_productos_web)
+        print(f"  escribir_productos_web       {t:7.2f} s")
+        for titulo, rutas in (("fragmentos del buscador", productos["indice"].values()),
+                              ("archivos por producto", (generar_web.DIR_DATOS_WEB / "productos").iterdir())):
+            kb = sorted((generar_web.DIR_DOCS / r).stat().st_size / 1024 for r in rutas)
+            print(f"  {titulo:28s} {len(kb)} de {kb[0]:.1f}–{kb[-1]:.1f} KB "
+                  f"(promedio {sum(kb) / len(kb):.1f} KB, total {sum(kb):.0f} KB)")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("historial", help="escritura/lectura: CSV reescrito vs. particiones por día")
+    p.add_argument("--productos", type=int, default=14000)
+    p.add_argument("--dias", type=int, default=365)
+    p.set_defaults(func=bench_historial)
+
+    p = sub.add_parser("snapshots", help="búsqueda de snapshots: máscara completa vs. índice de fechas")
+    p.add_argument("--productos", type=int, default=14000)
+    p.add_argument("--dias", type=int, default=365)
+    p.set_defaults(func=bench_snapshots)
+
+    p = sub.add_parser("graficos", help="generar_graficos_data: merges por día vs. matriz vectorizada")
+    p.add_argument("--productos", type=int, default=5000)
+    p.add_argument("--dias", type=int, default=200)
+    p.set_defaults(func=bench_graficos)
+
+    p = sub.add_parser("indice", help="graficos.json: índice diario completo vs. incremental")
+    p.add_argument("--productos", type=int, default=14000)
+    p.add_argument("--dias", type=int, default=365)
+    p.set_defaults(func=bench_indice)
+
+    p = sub.add_parser("horizontes", help="comparaciones de main(): merge por horizonte vs. lookup por plu_id")
+    p.add_argument("--productos", type=int, default=14000)
+    p.add_argument("--dias", type=int, default=365)
+    p.set_defaults(func=bench_horizontes)
+
+    p = sub.add_parser("rankings", help="rankings: orden completo vs. selección parcial")
+    p.add_argument("--productos", type=int, default=14000)
+    p.add_argument("--horizontes", type=int, default=5)
+    p.set_defaults(func=bench_rankings)
+
+    p = sub.add_parser("categorias", help="categoría principal: apply por fila vs. una vez por ruta")
+    p.add_argument("--productos", type=int, default=14000)
+    p.add_argument("--dias", type=int, default=365)
+    p.set_defaults(func=bench_categorias)
+
+    p = sub.add_parser("agregacion", help="variación por categoría: lambdas vs. bincount")
+    p.add_argument("--productos", type=int, default=14000)
+    p.add_argument("--grupos", default="7,300")
+    p.set_defaults(func=bench_agregacion)
+
+    p = sub.add_parser("submuestreo", help="series largas: completas vs. minmax / lttb")
+    p.add_argument("--dias", type=int, default=1095)
+    p.add_argument("--puntos", type=int, default=240)
+    p.set_defaults(func=bench_submuestreo)
+
+    p = sub.add_parser("productos", help="buscador de generar_web: pasada por el histórico y tamaños")
+    p.add_argument("--productos", type=int, default=14000)
+    p.add_argument("--dias", type=int, default=365)
+    p.set_defaults(func=bench_productos)
+
+    args = ap.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,665 @@
+"""
+benchmark_scraper.py
+====================
+Benchmarks del scraper contra un servidor Endeca falso local
+(no toca cotodigital3.com.ar).
+
+El servidor stub responde /N-{code}?Nrpp=..&No=..&format=json con la misma
+forma que el browse real: el bloque {totalNumRecs, records} anidado dentro
+de contents[0], y cada record con los atributos que lee extraer_producto.
+
+Uso:
+  python benchmark_scraper.py motores [--productos 20000] [--latencia 0.05] [--errores 0.05]
+      Compara los motores "threads" y "async": tiempo total, RSS pico,
+      latencias y reintentos. Cada motor corre en un subproceso para medir
+      su RSS por separado. --errores inyecta 429/503 para probar el control AIMD.
+
+  python benchmark_scraper.py paginas [--cap 250] [--tamanos 50 100 250 500]
+      Requests por categoría y tiempo total de crawl para distintos Nrpp,
+      contra un stub que recorta Nrpp a --cap; muestra qué detecta detectar_nrpp.
+
+  python benchmark_scraper.py localizador [--fixtures DIR]
+      Costo por página de ubicar el bloque de resultados: búsqueda recursiva
+      completa vs. ruta memorizada, sobre respuestas guardadas o sintéticas.
+
+  python benchmark_scraper.py json [--fixtures DIR]
+      Decodificación + extracción por página: json stdlib, orjson y streaming
+      con ijson (tiempo y memoria pico por página).
+
+  python benchmark_scraper.py extractor [--records 15000]
+      extraer_producto previo (referencia) vs. el extractor compilado.
+
+  python benchmark_scraper.py memoria [--records 14000]
+      Memoria retenida por el catálogo: un dict por producto vs. Producto.
+
+  python benchmark_scraper.py salida [--productos 20000 80000] [--compresion gz]
+      Crawl + escritura: lista completa en memoria y guardar() al final
+      (CSV + JSON indentado, como antes) vs. SalidaCatalogo incremental, sin
+      y con Parquet (pyarrow suma un costo fijo de memoria al primer lote).
+      Tiempo total y RSS pico en un subproceso por combinación.
+
+  python benchmark_scraper.py carga [--records 14000]
+      Snapshot de un día: tamaño en disco y tiempo de pd.read_csv vs.
+      pd.read_parquet (lo que hace cargar_csvs_hoy).
+"""
+
+import argparse
+import json
+import random
+import re
+import resource
+import subprocess
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+CATS_STUB = ["Almacén", "Frescos", "Congelados", "Bebidas Sin Alcohol", "Limpieza"]
+
+
+# ── DATOS FALSOS ─────────────────────────────────────────────────────────────
+def record_falso(i, cat_nombre):
+    """Un record Endeca con los atributos que usa extraer_producto."""
+    rnd = random.Random(i)
+    precio = round(rnd.uniform(300, 20000), 2)
+    descuentos = []
+    if rnd.random() < 0.3:
+        descuentos = [{
+            "textoDescuento": rnd.choice(["2x1", "70% 2da", "Precio Especial"]),
+            "precioDescuento": f"${precio * 0.8:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
+            "textoPrecioRegular": "Precio Regular",
+        }]
+    return {
+        "records": [{
+            "attributes": {
+                "product.repositoryId":       [f"prod{i:08d}"],
+                "product.eanPrincipal":       [str(7790000000000 + i)],
+                "product.displayName":        [f"Producto De Prueba {i}"],
+                "product.MARCA":              [rnd.choice(["COTO", "ARCOR", "LA SERENISIMA", "MOLTO"])],
+                "allAncestors.displayName":   ["CotoDigital", cat_nombre, f"Sub {i % 7}"],
+                "record.id":                  [f"sku{i:08d}"],
+                "product.largeImage.url":     [f"https://static.cotodigital3.com.ar/{i}.jpg"],
+                "product.unidades.descUnidad": [rnd.choice(["KGS", "LTS", "UNI"])],
+                "product.cFormato":           ["Unidad"],
+                "product.unidades.esPesable": ["0"],
+                "sku.activePrice":            [f"{precio:.2f}"],
+                "sku.dtoPrice":               [json.dumps({"precioSinImp": round(precio / 1.21, 2)})],
+                "sku.referencePrice":         [f"{precio * 2:.2f}"],
+                "product.dtoDescuentos":      [json.dumps(descuentos)],
+            }
+        }]
+    }
+
+
+def respuesta_falsa(n_code, offset, nrpp, total, cap_nrpp=None):
+    """Respuesta completa de una página del browse, con el anidamiento real."""
+    n = min(nrpp, cap_nrpp) if cap_nrpp else nrpp
+    base = sum(ord(c) * 7919 for c in n_code) * 100000
+    cat = n_code
+    records = [record_falso(base + j, cat) for j in range(offset, min(offset + n, total))]
+    return {
+        "@type": "Page",
+        "contents": [{
+            "@type": "TwoColumnPage",
+            "header": [{"@type": "Header", "contents": []}],
+            "secondaryContent": [{
+                "@type": "GuidedNavigation",
+                "navigation": [{
+                    "@type": "RefinementMenu",
+                    "dimensionName": dim,
+                    "refinements": [{"label": f"{dim} {k}", "count": k,
+                                     "navigationState": f"?N={k}", "properties": {}}
+                                    for k in range(60)],
+                } for dim in ("Marca", "Categoría", "Precio", "Descuento", "Envase")],
+            }],
+            "Main": [
+                {"@type": "Breadcrumbs", "refinementCrumbs": []},
+                {"@type": "ResultsList", "contents": [{
+                    "@type": "ResultsList",
+                    "sortOptions": [{"label": "Relevancia"}],
+                    "totalNumRecs": total,
+                    "firstRecNum": offset + 1,
+                    "lastRecNum": offset + len(records),
+                    "recsPerPage": n,
+                    "records": records,
+                }]},
+            ],
+        }],
+    }
+
+
+# ── SERVIDOR STUB ────────────────────────────────────────────────────────────
+def levantar_stub(totales, latencia=0.0, cap_nrpp=None, tasa_error=0.0):
+    """
+    Levanta el servidor stub en un thread y devuelve (server, base_browse).
+    totales: {n_code: totalNumRecs}. cap_nrpp: máximo Nrpp que "honra".
+    tasa_error: fracción de requests que responden 429 (con Retry-After) o 503.
+    """
+    cache = {}
+    contador = {"requests": 0, "errores": 0}
+    rnd = random.Random(0)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            m = re.search(r"/N-(\w+)\?Nrpp=(\d+)&No=(\d+)", self.path)
+            if not m:
+                self.send_error(404)
+                return
+            code, nrpp, no = m.group(1), int(m.group(2)), int(m.group(3))
+            clave = (code, nrpp, no)
+            with lock:
+                contador["requests"] += 1
+                body = cache.get(clave)
+                error = tasa_error and rnd.random() < tasa_error
+                if error:
+                    contador["errores"] += 1
+            if error:
+                status = rnd.choice([429, 503])
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if body is None:
+                body = json.dumps(respuesta_falsa(code, no, nrpp, totales.get(code, 0), cap_nrpp)).encode()
+                with lock:
+                    cache[clave] = body
+            if latencia:
+                time.sleep(latencia)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer.daemon_threads = True
+    ThreadingHTTPServer.request_queue_size = 1024
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    srv.contador = contador
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_port}/sitios/cdigi/browse/_"
+
+
+def categorias_stub(n_productos, n_cats=12):
+    """Reparte n_productos en categorías de tamaños desparejos (como el catálogo real)."""
+    pesos = [2 ** (i % 5) for i in range(n_cats)]
+    cats, totales = [], {}
+    for i, p in enumerate(pesos):
+        code = f"stub{i}"
+        totales[code] = max(1, n_productos * p // sum(pesos))
+        cats.append({"n": code, "nombre": CATS_STUB[i % len(CATS_STUB)]})
+    return cats, totales
+
+
+def rss_pico_mb():
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# ── BENCH: MOTORES ───────────────────────────────────────────────────────────
+def _correr_motor(args):
+    """Subproceso: corre un motor contra el stub y emite JSON con las métricas."""
+    import logging
+    import coto_base
+    logging.getLogger("coto_base").setLevel(logging.WARNING)
+    coto_base.BASE_BROWSE = args.base
+    cats = json.loads(args.cats)
+    rss_antes = rss_pico_mb()
+    t0 = time.perf_counter()
+    prods = coto_base.scrape_categorias(cats, max_workers=args.concurrencia or None, motor=args.motor,
+                                        nrpp=coto_base.NRPP)
+    dt = time.perf_counter() - t0
+    st = coto_base.CONTROL.stats()
+    print(json.dumps({"motor": args.motor, "productos": len(prods), "segundos": round(dt, 2),
+                      "reintentos": st["reintentos"], "perdidas": st["paginas_perdidas"],
+                      "p50_ms": st["latencia_p50_ms"], "p95_ms": st["latencia_p95_ms"],
+                      "concurrencia_max": st["concurrencia_max"],
+                      "rss_pico_mb": round(rss_pico_mb(), 1),
+                      "rss_base_mb": round(rss_antes, 1)}))
+
+
+def bench_motores(args):
+    cats, totales = categorias_stub(args.productos)
+    srv, base = levantar_stub(totales, latencia=args.latencia, tasa_error=args.errores)
+    print(f"Stub: {len(cats)} categorías, {sum(totales.values())} productos, "
+          f"latencia {args.latencia*1000:.0f} ms/request, errores {args.errores:.0%}\n")
+
+    for motor, conc in (("threads", args.workers), ("async", args.concurrencia)):
+        srv.contador["requests"] = 0
+        out = subprocess.run(
+            [sys.executable, __file__, "_motor", "--motor", motor, "--base", base,
+             "--cats", json.dumps(cats), "--concurrencia", str(conc)],
+            capture_output=True, text=True, check=True,
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"  {motor:8s} conc={conc or 'aimd':<5} {r['productos']:>7d} prods | "
+              f"{r['segundos']:>6.2f} s | RSS pico {r['rss_pico_mb']:.0f} MB | "
+              f"{srv.contador['requests']} requests | p50 {r['p50_ms']} ms p95 {r['p95_ms']} ms | "
+              f"reintentos {r['reintentos']} | perdidas {r['perdidas']} | "
+              f"conc. máx {r['concurrencia_max']}")
+    srv.shutdown()
+
+
+# ── BENCH: TAMAÑO DE PÁGINA ──────────────────────────────────────────────────
+def bench_paginas(args):
+    import logging
+    import coto_base
+    logging.getLogger("coto_base").setLevel(logging.WARNING)
+
+    cats, totales = categorias_stub(args.productos)
+    srv, base = levantar_stub(totales, latencia=args.latencia, cap_nrpp=args.cap)
+    coto_base.BASE_BROWSE = base
+    print(f"Stub: {len(cats)} categorías, {sum(totales.values())} productos, "
+          f"latencia {args.latencia*1000:.0f} ms/request, Nrpp máximo del server {args.cap}\n")
+
+    # Pre-generar las respuestas del stub para no medir su costo de serializar
+    for nrpp in args.tamanos:
+        coto_base.scrape_categorias(cats, nrpp=nrpp)
+
+    for nrpp in args.tamanos:
+        srv.contador["requests"] = 0
+        t0 = time.perf_counter()
+        prods = coto_base.scrape_categorias(cats, nrpp=nrpp)
+        dt = time.perf_counter() - t0
+        req = srv.contador["requests"]
+        print(f"  Nrpp={nrpp:<4d} {len(prods):>7d} prods | {req:>5d} requests "
+              f"({req / len(cats):.1f}/categoría) | {dt:6.2f} s")
+
+    mayor = max(cats, key=lambda c: totales[c["n"]])["n"]
+    srv.contador["requests"] = 0
+    print(f"\n  detectar_nrpp() → {coto_base.detectar_nrpp(mayor)} "
+          f"({srv.contador['requests']} requests de sondeo)")
+    srv.shutdown()
+
+
+# ── BENCH: LOCALIZADOR DE RESULTADOS ─────────────────────────────────────────
+def cargar_fixtures(directorio=None, n=200):
+    """Respuestas guardadas (*.json en `directorio`) o, si no hay, sintéticas del stub."""
+    if directorio:
+        return [json.loads(p.read_text(encoding="utf-8")) for p in sorted(Path(directorio).glob("*.json"))]
+    return [respuesta_falsa(f"fix{i % 10}", (i // 10) * 50, 50, 5000) for i in range(n)]
+
+
+def _medir(fn, datos, repeticiones):
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        for d in datos:
+            fn(d)
+    return (time.perf_counter() - t0) / (repeticiones * len(datos))
+
+
+def bench_localizador(args):
+    import coto_base
+
+    datos = cargar_fixtures(args.fixtures)
+    print(f"{len(datos)} respuestas ({'fixtures' if args.fixtures else 'sintéticas'})\n")
+
+    completa = _medir(lambda d: coto_base._buscar_resultados(d["contents"][0]), datos, args.repeticiones)
+    loc = coto_base.LocalizadorResultados()
+    memo = _medir(loc.buscar, datos, args.repeticiones)
+
+    print(f"  búsqueda completa : {completa * 1e6:8.2f} µs/página")
+    print(f"  ruta memorizada   : {memo * 1e6:8.2f} µs/página  ({completa / memo:.0f}x)")
+    print(f"  ruta: {loc.ruta} | aciertos {loc.aciertos} | búsquedas completas {loc.busquedas}")
+
+
+# ── BENCH: DECODIFICACIÓN JSON ───────────────────────────────────────────────
+def bench_json(args):
+    import io
+    import tracemalloc
+    import coto_base
+
+    datos = cargar_fixtures(args.fixtures) if args.fixtures else \
+        [respuesta_falsa(f"fix{i}", 0, args.nrpp, args.nrpp) for i in range(20)]
+    cuerpos = [json.dumps(d).encode() for d in datos]
+    ruta = coto_base.LocalizadorResultados()
+    ruta.buscar(datos[0])
+    mb = sum(len(c) for c in cuerpos) / len(cuerpos) / 1e6
+    print(f"{len(cuerpos)} páginas, {mb:.2f} MB/página promedio\n")
+
+    def completo(loads):
+        def fn(cuerpo):
+            data = loads(cuerpo)
+            main = ruta.buscar(data)
+            return [coto_base.extraer_producto(r, "x") for r in main["records"]]
+        return fn
+
+    def streaming(cuerpo):
+        return coto_base._leer_stream(coto_base.ijson.parse(io.BytesIO(cuerpo), use_float=True), ruta.ruta, "x")
+
+    modos = [("json (stdlib)", completo(json.loads))]
+    if coto_base.orjson:
+        modos.append(("orjson", completo(coto_base.orjson.loads)))
+    if coto_base.ijson:
+        modos.append(("streaming (ijson)", streaming))
+
+    print("  solo decodificar:")
+    for nombre, loads in (("json (stdlib)", json.loads), ("orjson", coto_base.orjson and coto_base.orjson.loads)):
+        if loads:
+            print(f"    {nombre:18s} {_medir(loads, cuerpos, 5) * 1000:7.2f} ms/página")
+
+    print("  decodificar + extraer productos:")
+    for nombre, fn in modos:
+        dt = _medir(fn, cuerpos, 1)
+        tracemalloc.start()
+        fn(bytes(cuerpos[-1]))
+        pico = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        print(f"    {nombre:18s} {dt * 1000:7.2f} ms/página | pico {pico:6.2f} MB/página")
+
+
+# ── BENCH: EXTRACTOR DE PRODUCTOS ────────────────────────────────────────────
+def extraer_producto_referencia(rec_outer, cat_nombre):
+    """extraer_producto tal como era antes del extractor compilado (referencia)."""
+    from datetime import datetime
+    from coto_base import _parse_precio
+
+    rec   = rec_outer.get("records", [{}])[0]
+    attrs = rec.get("attributes", {})
+
+    def get1(key, default=""):
+        v = attrs.get(key, [default])
+        return v[0] if isinstance(v, list) else v
+
+    plu = get1("product.repositoryId").replace("prod", "")
+    ean = get1("product.eanPrincipal")
+    nombre = get1("product.displayName")
+    marca  = (get1("product.MARCA") or get1("product.brand")).title()
+
+    cat_parts = [c for c in attrs.get("allAncestors.displayName", [])
+                 if c not in ("CotoDigital", "")]
+    cat_full  = " > ".join(reversed(cat_parts)) if cat_parts else cat_nombre
+
+    record_id = get1("record.id")
+    url_prod  = (f"https://www.cotodigital3.com.ar/sitios/cdigi/producto/_/R-{record_id}"
+                 if record_id else "")
+    imagen    = get1("product.largeImage.url") or get1("product.mediumImage.url")
+
+    desc_unidad = get1("product.unidades.descUnidad")
+    c_formato   = get1("product.cFormato", "").strip()
+    es_pesable  = get1("product.unidades.esPesable") == "1"
+
+    try:
+        precio_regular = float(get1("sku.activePrice") or 0) or None
+    except Exception:
+        precio_regular = None
+
+    try:
+        dp = json.loads(get1("sku.dtoPrice") or "{}")
+    except Exception:
+        dp = {}
+    precio_sin_imp = dp.get("precioSinImp")
+
+    try:
+        precio_x_unidad = float(get1("sku.referencePrice") or 0) or None
+    except Exception:
+        precio_x_unidad = None
+
+    if precio_x_unidad:
+        if desc_unidad in ("KGS", "GRM"):
+            unidad_label = "por 100 Gramos"
+        elif desc_unidad in ("LTS", "LIT"):
+            unidad_label = "por Lt"
+        else:
+            unidad_label = f"por {c_formato or desc_unidad or 'unidad'}"
+    else:
+        unidad_label = ""
+
+    try:
+        descuentos = json.loads(get1("product.dtoDescuentos", "[]"))
+    except Exception:
+        descuentos = []
+
+    promo_texto = promo_regular = ""
+    precio_actual = precio_regular
+
+    if descuentos:
+        d = descuentos[0]
+        promo_texto   = (d.get("textoDescuento") or d.get("textoLlevando") or "").strip()
+        promo_regular = (d.get("textoPrecioRegular") or "").strip()
+        precio_dto = _parse_precio(d.get("precioDescuento"))
+        if precio_dto:
+            precio_actual = precio_dto
+
+    return {
+        "supermercado":    "coto",
+        "plu":             plu,
+        "ean":             ean,
+        "nombre":          nombre,
+        "marca":           marca,
+        "categoria":       cat_full,
+        "precio_actual":   precio_actual,
+        "precio_regular":  precio_regular,
+        "precio_sin_imp":  precio_sin_imp,
+        "precio_x_unidad": precio_x_unidad,
+        "unidad_label":    unidad_label,
+        "unidad":          desc_unidad,
+        "es_pesable":      es_pesable,
+        "promo_texto":     promo_texto,
+        "promo_regular":   promo_regular,
+        "imagen":          imagen,
+        "url":             url_prod,
+        "fecha":           datetime.now().strftime("%Y-%m-%d %H:%M"),
+    }
+
+
+def bench_extractor(args):
+    import coto_base
+
+    cats = ["Almacén > Golosinas", "Frescos > Lácteos", "Limpieza > Lavado"]
+    records = [record_falso(i, cats[i % 3]) for i in range(args.records)]
+    print(f"{len(records)} records\n")
+
+    def correr(fn):
+        t0 = time.perf_counter()
+        out = [fn(r, "x") for r in records]
+        return time.perf_counter() - t0, out
+
+    coto_base.fecha_corrida(reiniciar=True)
+    t_ref, ref = correr(extraer_producto_referencia)
+    t_new, new = correr(coto_base.extraer_producto)
+    iguales = all({**a, "fecha": ""} == {**b.a_dict(), "fecha": ""} for a, b in zip(ref, new))
+
+    print(f"  referencia (get1 + json.loads + strftime por record): {t_ref:6.3f} s "
+          f"({t_ref / len(records) * 1e6:.1f} µs/record)")
+    print(f"  extractor compilado                                 : {t_new:6.3f} s "
+          f"({t_new / len(records) * 1e6:.1f} µs/record)  {t_ref / t_new:.1f}x")
+    print(f"  resultados idénticos: {iguales} | cache JSON: {coto_base._json_attr.cache_info()}")
+
+
+# ── BENCH: MEMORIA DEL CATÁLOGO ──────────────────────────────────────────────
+def _memoria(fn, records):
+    import gc
+    import tracemalloc
+    gc.collect()
+    tracemalloc.start()
+    out = [fn(r, "x") for r in records]
+    actual = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return actual, out
+
+
+def bench_memoria(args):
+    import coto_base
+
+    # Catálogo "real": pocas categorías/marcas/unidades repetidas en miles de filas
+    records = [record_falso(i, CATS_STUB[i % len(CATS_STUB)]) for i in range(args.records)]
+    print(f"{len(records)} productos\n")
+
+    mem_dict, ref = _memoria(extraer_producto_referencia, records)
+    coto_base.fecha_corrida(reiniciar=True)
+    mem_prod, new = _memoria(coto_base.extraer_producto, records)
+
+    print(f"  dict por producto (antes)      : {mem_dict / 1e6:6.1f} MB  ({mem_dict / len(ref):.0f} B/producto)")
+    print(f"  Producto __slots__ + internado : {mem_prod / 1e6:6.1f} MB  ({mem_prod / len(new):.0f} B/producto)"
+          f"  -{(1 - mem_prod / mem_dict) * 100:.0f}%")
+
+
+# ── BENCH: ESCRITURA DE SALIDAS ──────────────────────────────────────────────
+def guardar_referencia(todos, output_dir, nombre_archivo):
+    """guardar() previo: todo el catálogo en memoria, CSV + JSON indentado."""
+    import csv
+    from coto_base import CAMPOS
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(output_dir / f"{nombre_archivo}.csv", "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(CAMPOS)
+        writer.writerows(p.a_tupla() for p in todos)
+    with open(output_dir / f"{nombre_archivo}.json", "w", encoding="utf-8") as f:
+        json.dump([p.a_dict() for p in todos], f, ensure_ascii=False, indent=2)
+
+
+def _correr_salida(args):
+    """Subproceso: crawl contra el stub + escritura, en modo lista o sink."""
+    import logging
+    import tempfile
+    import coto_base
+    logging.getLogger("coto_base").setLevel(logging.WARNING)
+    coto_base.BASE_BROWSE = args.base
+    cats = json.loads(args.cats)
+    destino = Path(tempfile.mkdtemp())
+    t0 = time.perf_counter()
+    if args.modo == "lista":
+        unicos = coto_base.deduplicar(coto_base.scrape_categorias(cats, nrpp=coto_base.NRPP))
+        guardar_referencia(unicos, destino, "bench")
+        n = len(unicos)
+    else:
+        with coto_base.SalidaCatalogo(destino, "bench", args.compresion,
+                                      parquet=args.modo == "parquet") as salida:
+            coto_base.scrape_categorias(cats, nrpp=coto_base.NRPP, salida=salida)
+        n = salida.n_productos
+    dt = time.perf_counter() - t0
+    mb = sum(f.stat().st_size for f in destino.iterdir()) / 1e6
+    print(json.dumps({"productos": n, "segundos": round(dt, 2), "disco_mb": round(mb, 1),
+                      "rss_pico_mb": round(rss_pico_mb(), 1)}))
+
+
+def bench_salida(args):
+    for n_productos in args.productos:
+        cats, totales = categorias_stub(n_productos)
+        srv, base = levantar_stub(totales, latencia=args.latencia)
+        print(f"Stub: {n_productos} productos, latencia {args.latencia*1000:.0f} ms/request")
+        for modo in ("lista", "sink", "parquet"):
+            out = subprocess.run(
+                [sys.executable, __file__, "_salida", "--modo", modo, "--base", base,
+                 "--cats", json.dumps(cats), "--compresion", args.compresion],
+                capture_output=True, text=True, check=True,
+            )
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            etiqueta = {"lista": "lista + guardar (antes)",
+                        "sink": f"SalidaCatalogo {args.compresion or ''}",
+                        "parquet": "SalidaCatalogo + Parquet"}[modo]
+            print(f"  {etiqueta:26s} {r['productos']:>7d} prods | {r['segundos']:>6.2f} s | "
+                  f"RSS pico {r['rss_pico_mb']:.0f} MB | disco {r['disco_mb']:.1f} MB")
+        srv.shutdown()
+        print()
+
+
+# ── BENCH: CARGA DEL SNAPSHOT ────────────────────────────────────────────────
+def bench_carga(args):
+    import tempfile
+    import logging
+    import pandas as pd
+    import coto_base
+    from analizar_precios import _leer_snapshot
+    logging.getLogger("coto_base").setLevel(logging.WARNING)
+
+    coto_base.fecha_corrida(reiniciar=True)
+    prods = [coto_base.extraer_producto(record_falso(i, CATS_STUB[i % len(CATS_STUB)]), "x")
+             for i in range(args.records)]
+    destino = Path(tempfile.mkdtemp())
+    coto_base.guardar(prods, destino, "bench", parquet=True)
+    print(f"{len(prods)} productos\n")
+
+    for ext in ("csv", "parquet"):
+        archivo = str(next(destino.glob(f"*.{ext}")))
+        t = _medir(_leer_snapshot, [archivo], args.repeticiones)
+        df = _leer_snapshot(archivo)
+        print(f"  {ext:8s} {Path(archivo).stat().st_size / 1e6:6.2f} MB | {t * 1000:7.1f} ms/carga | "
+              f"plu {df['plu'].dtype} | memoria df {df.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+    # antes: read_csv sin dtypes (plu llegaba como int64)
+    archivo = str(next(destino.glob("*.csv")))
+    t = _medir(lambda a: pd.read_csv(a, encoding="utf-8-sig"), [archivo], args.repeticiones)
+    print(f"  {'csv (sin dtypes, antes)':8s} {t * 1000:7.1f} ms/carga | "
+          f"plu {pd.read_csv(archivo, encoding='utf-8-sig')['plu'].dtype}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("motores", help="threads vs async: tiempo y RSS pico")
+    p.add_argument("--productos", type=int, default=20000)
+    p.add_argument("--latencia", type=float, default=0.05, help="segundos por request en el stub")
+    p.add_argument("--workers", type=int, default=0, help="concurrencia fija del motor threads (0 = AIMD)")
+    p.add_argument("--concurrencia", type=int, default=0, help="concurrencia fija del motor async (0 = AIMD)")
+    p.add_argument("--errores", type=float, default=0.0, help="fracción de respuestas 429/503 del stub")
+    p.set_defaults(func=bench_motores)
+
+    p = sub.add_parser("paginas", help="requests y tiempo de crawl según Nrpp")
+    p.add_argument("--productos", type=int, default=20000)
+    p.add_argument("--latencia", type=float, default=0.05, help="segundos por request en el stub")
+    p.add_argument("--cap", type=int, default=250, help="Nrpp máximo que honra el stub")
+    p.add_argument("--tamanos", type=int, nargs="+", default=[50, 100, 250, 500])
+    p.set_defaults(func=bench_paginas)
+
+    p = sub.add_parser("localizador", help="costo por página de ubicar {totalNumRecs, records}")
+    p.add_argument("--fixtures", help="directorio con respuestas Endeca guardadas (*.json)")
+    p.add_argument("--repeticiones", type=int, default=50)
+    p.set_defaults(func=bench_localizador)
+
+    p = sub.add_parser("json", help="CPU y memoria pico por página según backend JSON")
+    p.add_argument("--fixtures", help="directorio con respuestas Endeca guardadas (*.json)")
+    p.add_argument("--nrpp", type=int, default=250, help="records por página sintética")
+    p.set_defaults(func=bench_json)
+
+    p = sub.add_parser("extractor", help="extraer_producto: referencia vs extractor compilado")
+    p.add_argument("--records", type=int, default=15000)
+    p.set_defaults(func=bench_extractor)
+
+    p = sub.add_parser("memoria", help="memoria del catálogo: dicts vs Producto")
+    p.add_argument("--records", type=int, default=14000)
+    p.set_defaults(func=bench_memoria)
+
+    p = sub.add_parser("salida", help="escritura de salidas: lista + guardar vs. sink incremental")
+    p.add_argument("--productos", type=int, nargs="+", default=[20000, 80000])
+    p.add_argument("--latencia", type=float, default=0.02, help="segundos por request en el stub")
+    p.add_argument("--compresion", default="", help="'', 'gz' o 'zst' para el sink")
+    p.set_defaults(func=bench_salida)
+
+    p = sub.add_parser("carga", help="snapshot de un día: CSV vs. Parquet")
+    p.add_argument("--records", type=int, default=14000)
+    p.add_argument("--repeticiones", type=int, default=10)
+    p.set_defaults(func=bench_carga)
+
+    p = sub.add_parser("_salida")   # interno: crawl + escritura en un subproceso
+    p.add_argument("--modo")
+    p.add_argument("--base")
+    p.add_argument("--cats")
+    p.add_argument("--compresion", default="")
+    p.set_defaults(func=_correr_salida)
+
+    p = sub.add_parser("_motor")   # interno: un motor en un subproceso
+    p.add_argument("--motor")
+    p.add_argument("--base")
+    p.add_argument("--cats")
+    p.add_argument("--concurrencia", type=int)
+    p.set_defaults(func=_correr_motor)
+
+    args = ap.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+cache_build.py
+==============
+Cache de construcción para las etapas que se pueden repetir sin datos
+nuevos (analizar_precios.py --solo-graficos y generar_web.py).
+
+Cada etapa calcula una huella (sha256) de sus entradas: el contenido de los
+archivos que lee, el código que la genera y lo que dependa del día. Al
+terminar registra esa huella junto con el sha256 de cada archivo que
+escribió. En la próxima corrida, si la huella es la misma y las salidas
+siguen intactas, la etapa no hace nada.
+
+Se usa el contenido y no la fecha de modificación porque actions/checkout
+deja todos los archivos con la hora del checkout.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+def hash_archivo(ruta):
+    """sha256 del contenido de un archivo (hex)."""
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def huella(entradas, extra=()):
+    """
+    Huella de un conjunto de archivos (ruta + contenido; los que no existen
+    cuentan como ausentes) y de valores extra (fecha, opciones...).
+    """
+    h = hashlib.sha256()
+    for ruta in sorted(Path(r).as_posix() for r in entradas):
+        h.update(ruta.encode() + b"\0")
+        h.update((hash_archivo(ruta) if os.path.exists(ruta) else "-").encode() + b"\0")
+    for valor in extra:
+        h.update(repr(valor).encode() + b"\0")
+    return h.hexdigest()
+
+
+def _leer(archivo_cache):
+    try:
+        with open(archivo_cache, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def al_dia(archivo_cache, etapa, clave):
+    """True si `etapa` ya se construyó con `clave` y sus salidas no cambiaron."""
+    estado = _leer(archivo_cache).get(etapa)
+    if not estado or estado.get("clave") != clave:
+        return False
+    return all(os.path.exists(r) and hash_archivo(r) == h
+               for r, h in estado.get("salidas", {}).items())
+
+
+def registrar(archivo_cache, etapa, clave, salidas):
+    """Guarda la huella de `etapa` y el sha256 de sus salidas (tmp + rename)."""
+    cache = _leer(archivo_cache)
+    cache[etapa] = {
+        "clave": clave,
+        "salidas": {Path(r).as_posix(): hash_archivo(r) for r in sorted(salidas) if os.path.exists(r)},
+    }
+    archivo_cache = Path(archivo_cache)
+    archivo_cache.parent.mkdir(parents=True, exist_ok=True)
+    tmp = archivo_cache.with_name(archivo_cache.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, archivo_cache)
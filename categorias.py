@@ -0,0 +1,136 @@
+"""
+categorias.py
+=============
+Mapeo de la categoría scrapeada (ruta tipo "Golosinas > Chocolates") a la
+categoría principal que se publica (Almacén, Frescos, Congelados, Bebidas
+Con Alcohol, Bebidas Sin Alcohol, Limpieza, Cuidado Personal). Lo usan
+analizar_precios, historial y generar_web.
+
+Un catálogo o un año de histórico tienen unos pocos cientos de rutas
+distintas repetidas en cientos de miles de filas: principal_de() resuelve
+cada ruta distinta una sola vez (la búsqueda por segmento está
+memoizada) y reparte el resultado por código. sin_mapear() lista las
+rutas que no caen en ninguna principal, que se publican tal cual.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Mapeo de subcategoria → categoria principal
+# Cualquier categoria que no esté acá se muestra tal cual
+CATEGORIA_PRINCIPAL = {
+    # ALIMENTOS
+    "Golosinas":                  "Almacén",
+    "Panadería":                  "Almacén",
+    "Snacks":                     "Almacén",
+    "Cereales":                   "Almacén",
+    "Endulzantes":                "Almacén",
+    "Aderezos Y Salsas":          "Almacén",
+    "Infusiones":                 "Almacén",
+    "Conservas":                  "Almacén",
+    "Harinas":                    "Almacén",
+    "Encurtidos":                 "Almacén",
+    "Mermeladas Y Dulces":        "Almacén",
+    "Salsas Y Puré De Tomate":   "Almacén",
+    "Aceites Y Condimentos":      "Almacén",
+    "Alimento Bebés Y Niños":     "Almacén",
+    "Arroz Y Legumbres":          "Almacén",
+    "Especias":                   "Almacén",
+    "Pasta Seca Y Rellenas":      "Almacén",
+    "Repostería":                 "Almacén",
+    "Sopas Y Saborizantes":       "Almacén",
+    "Rebozador Y Pan Rallado":    "Almacén",
+    "Leche En Polvo":             "Almacén",
+    "Suplementos Dietarios":      "Almacén",
+    # FRESCOS
+    "Lácteos":                    "Frescos",
+    "Fiambres":                   "Frescos",
+    "Quesos":                     "Frescos",
+    "Carnicería":                 "Frescos",
+    "Aves":                       "Frescos",
+    "Pastas Frescas Y Tapas":     "Frescos",
+    "Comidas Elaboradas":         "Frescos",
+    "Frutas Y Verduras":          "Frescos",
+    "Pescadería":                 "Frescos",
+    "Huevos":                     "Frescos",
+    # CONGELADOS
+    "Pescadería Congelada":       "Congelados",
+    "Nuggets Y Bocaditos":        "Congelados",
+    "Hamburguesas Y Milanesas":   "Congelados",
+    "Papas Congeladas":           "Congelados",
+    "Helados Y Postres":          "Congelados",
+    "Comidas Congeladas":         "Congelados",
+    "Vegetales Congelados":       "Congelados",
+    "Frutas Congeladas":          "Congelados",
+    # BEBIDAS
+    "Bebidas Con Alcohol":        "Bebidas Con Alcohol",
+    "Bebidas Sin Alcohol":        "Bebidas Sin Alcohol",
+    # LIMPIEZA
+    "Lavado":                     "Limpieza",
+    "Accesorios De Limpieza":     "Limpieza",
+    "Desodorantes De Ambiente":   "Limpieza",
+    "Limpieza De Baño":           "Limpieza",
+    "Limpieza De Cocina":         "Limpieza",
+    "Limpieza De Pisos Y Superficies": "Limpieza",
+    "Lavandinas":                 "Limpieza",
+    # PERFUMERIA / CUIDADO PERSONAL
+    "Cuidado Del Cabello":        "Cuidado Personal",
+    "Higiene Personal":           "Cuidado Personal",
+    "Desodorantes Y Antitranspirantes": "Cuidado Personal",
+    "Pañales E Incontinencia":    "Cuidado Personal",
+    "Cuidado Personal":           "Cuidado Personal",
+    "Cuidado Bucal":              "Cuidado Personal",
+    "Protección Femenina":        "Cuidado Personal",
+    "Cuidado De La Piel":         "Cuidado Personal",
+    "Accesorios Perfumería":      "Cuidado Personal",
+}
+
+# Orden de display de categorías principales
+ORDEN_CATS = [
+    "Almacén", "Frescos", "Congelados",
+    "Bebidas Con Alcohol", "Bebidas Sin Alcohol",
+    "Limpieza", "Cuidado Personal",
+]
+
+
+@lru_cache(maxsize=None)
+def _buscar(cat):
+    """Categoría principal del primer segmento mapeado de la ruta, o None."""
+    for segmento in cat.split('>'):
+        segmento = segmento.strip()
+        if segmento in CATEGORIA_PRINCIPAL:
+            return CATEGORIA_PRINCIPAL[segmento]
+    return None
+
+
+def a_principal(cat):
+    """Devuelve la categoría principal para una subcategoría (busca en cada segmento de la ruta)."""
+    cat = str(cat).strip()
+    return _buscar(cat) or cat
+
+
+def _por_unica(categorias):
+    """(códigos, únicas): cada fila → su posición en las rutas distintas (NaN → -1)."""
+    return pd.factorize(pd.Series(categorias, copy=False))
+
+
+def principal_de(categorias):
+    """
+    Serie de rutas → Serie de categorías principales (mismo índice), igual
+    a categorias.apply(a_principal) pero resolviendo cada ruta una vez.
+    """
+    s = pd.Series(categorias, copy=False)
+    codigos, unicas = _por_unica(s)
+    # La última entrada es la de NaN (código -1)
+    principales = pd.Series([a_principal(c) for c in unicas] + [a_principal(np.nan)])
+    return principales.take(codigos).set_axis(s.index)
+
+
+def sin_mapear(categorias):
+    """{ruta: filas} de las rutas sin categoría principal, de más a menos filas."""
+    codigos, unicas = _por_unica(categorias)
+    filas = np.bincount(codigos[codigos >= 0], minlength=len(unicas))
+    faltan = {c: int(n) for c, n in zip(unicas, filas) if _buscar(str(c).strip()) is None}
+    return dict(sorted(faltan.items(), key=lambda kv: -kv[1]))
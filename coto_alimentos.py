@@ -7,9 +7,8 @@ Uso: python coto_alimentos.py
 """
 import sys
 sys.path.insert(0, str(__import__('pathlib').Path(__file__).parent))
-from coto_base import scrape_categoria, guardar, log, MAX_WORKERS
+from coto_base import scrape_categorias, SalidaCatalogo, log, log_stats_conexiones
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
 
 # N-codes obtenidos navegando el árbol endeca en vivo
 # Solo se obtienen productos con stock vigente (filtro automático del endeca)
@@ -60,38 +59,17 @@ CATEGORIAS = [
     {"n": "14w51iy",  "nombre": "Frutas Congeladas"},     # 25
 ]
 
+# Excluir la raíz "Almacén" para no duplicar
+CATEGORIAS_SCRAPE = [c for c in CATEGORIAS if c["n"] != "8pub5z"]
+
 OUTPUT_DIR = Path("output_alimentos")
 
 if __name__ == "__main__":
-    # Excluir la raíz "Almacén" para no duplicar
-    cats_sin_raiz = [c for c in CATEGORIAS if c["n"] != "8pub5z"]
-
-    # ── Todas las categorías en paralelo ─────────────────────────────────────
-    resultados = {}   # n_code → lista de productos
-
-    def scrape_cat(cat):
-        prods = scrape_categoria(cat["n"], cat["nombre"])
-        return cat["n"], prods
-
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
-        futures = {ex.submit(scrape_cat, cat): cat for cat in cats_sin_raiz}
-        for future in futures:
-            n_code, prods = future.result()
-            resultados[n_code] = prods
-
-    # Acumular en el orden original de CATEGORIAS
-    todos = []
-    for cat in cats_sin_raiz:
-        todos.extend(resultados[cat["n"]])
-        log.info(f"  acumulado: {len(todos)}")
-
-    # Deduplicar por PLU (puede haber solapamiento entre subcategorías hermanas)
-    vistos = set()
-    unicos = []
-    for p in todos:
-        if p["plu"] not in vistos:
-            vistos.add(p["plu"])
-            unicos.append(p)
+    # ── Todas las categorías en el scheduler global, escritas a medida que llegan
+    # (el sink deduplica por PLU: hay solapamiento entre subcategorías hermanas)
+    with SalidaCatalogo(OUTPUT_DIR, "coto_alimentos") as salida:
+        scrape_categorias(CATEGORIAS_SCRAPE, salida=salida)
 
-    log.info(f"\nTotal alimentos: {len(unicos)} productos únicos ({len(todos)} con duplicados)")
-    guardar(unicos, OUTPUT_DIR, "coto_alimentos")
+    log.info(f"\nTotal alimentos: {salida.n_productos} productos únicos "
+             f"({salida.n_productos + salida.n_duplicados} con duplicados)")
+    log_stats_conexiones()
@@ -1,76 +1,588 @@
 """
 coto_base.py – Motor genérico de scraping para Coto Digital
-Requiere: requests, selectolax
+Requiere: requests
+
+Todas las requests salen por una única requests.Session con pool de
+conexiones keep-alive (POOL_POR_HOST por host), así las ~300 páginas
+de una corrida reusan las conexiones TCP/TLS en vez de abrir una por página.
+
+Motores de crawl (COTO_MOTOR):
+  threads → un pool global de MAX_WORKERS threads (default)
+  async   → corutinas asyncio acotadas por semáforo (requiere aiohttp)
+
+JSON: se decodifica con orjson si está instalado (si no, json de stdlib).
+Salidas: CSV + JSON escritos en forma incremental por SalidaCatalogo
+(opcionalmente comprimidos con COTO_COMPRESION=gz|zst; con COTO_NDJSON=1
+el JSON sale como NDJSON), más un snapshot Parquet tipado si pyarrow está
+instalado.
+Con COTO_STREAMING=1 (requiere ijson) las páginas se parsean en streaming:
+sólo se arman los items de `records` y `totalNumRecs` de la ruta memorizada
+y el resto de la respuesta se descarta. No es más rápido ni usa menos
+memoria que orjson (benchmark_scraper.py json: ~3x más lento y más pico
+por página), así que el default es orjson; queda como opción.
 """
 
-import json, csv, time, logging, re
-from urllib.request import urlopen, Request
-from urllib.error import HTTPError, URLError
+import json, csv, time, logging, re, os
+import gzip
+import asyncio
 from pathlib import Path
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import ssl
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import threading
+from sys import intern
 import random
+import heapq
+from email.utils import parsedate_to_datetime
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson   # backend JSON rápido (opcional)
+except ImportError:
+    orjson = None
+
+try:
+    import ijson    # parseo incremental (opcional, modo streaming)
+except ImportError:
+    ijson = None
+
+try:
+    import zstandard   # compresión zstd de las salidas (opcional)
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow as pa            # snapshot columnar en Parquet (opcional)
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%H:%M:%S")
 log = logging.getLogger(__name__)
 
 BASE_BROWSE  = "https://www.cotodigital3.com.ar/sitios/cdigi/browse/_"
-NRPP         = 50
-MAX_WORKERS  = 20   # workers paralelos
+NRPP         = 50     # tamaño de página seguro (fallback)
+NRPP_CANDIDATOS = (500, 250, 100, 50)   # se prueban de mayor a menor
+NRPP_SONDA   = "8pub5z"   # Almacén raíz (~5000 prods): alcanza para ver el tope
+NRPP_CACHE   = Path(os.getenv("COTO_NRPP_CACHE", "data/nrpp.json"))
+NRPP_TTL_HORAS = 24 * 7
+MAX_WORKERS  = int(os.getenv("COTO_MAX_WORKERS", "20"))   # concurrencia inicial
+MAX_CONCURRENCIA = int(os.getenv("COTO_MAX_CONCURRENCIA", "64"))   # techo del control AIMD
+MIN_CONCURRENCIA = 2
+POOL_POR_HOST = MAX_CONCURRENCIA   # conexiones keep-alive por host (una por worker)
+TIMEOUT      = 20
+REINTENTOS   = 6      # intentos por página antes de darla por perdida
+BACKOFF_MAX  = 60     # segundos
+
+# Motor de crawl: "threads" (pool de MAX_WORKERS) o "async" (asyncio + aiohttp)
+MOTOR        = os.getenv("COTO_MOTOR", "threads")
+CONCURRENCIA_ASYNC = int(os.getenv("COTO_CONCURRENCIA", "100"))   # requests en vuelo (motor async)
 
-SSL_CTX = ssl.create_default_context()
-SSL_CTX.check_hostname = False
-SSL_CTX.verify_mode = ssl.CERT_NONE
+JSON_BACKEND = "orjson" if orjson else "json"
+json_loads   = orjson.loads if orjson else json.loads
+# Parseo en streaming con ijson: opcional, más lento que orjson (ver docstring)
+STREAMING    = os.getenv("COTO_STREAMING", "0") == "1"
+
+# Compresión de CSV/JSON de salida: "" (ninguna), "gz" o "zst" (requiere zstandard)
+COMPRESION   = os.getenv("COTO_COMPRESION", "")
+# JSON de salida como NDJSON (<nombre>_<ts>.jsonl, un producto por línea) en vez de array
+NDJSON       = os.getenv("COTO_NDJSON", "0") == "1"
+# Snapshot Parquet tipado junto al CSV (si pyarrow está instalado; COTO_PARQUET=0 lo apaga)
+PARQUET      = pa is not None and os.getenv("COTO_PARQUET", "1") == "1"
+LOTE_PARQUET = 8192   # filas por row group
+
+# El certificado de cotodigital3 no siempre valida: se mantiene sin verificar
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0",
     "Accept": "application/json",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
     "Referer": "https://www.cotodigital3.com.ar/",
 }
 
 
-def get_json(url, retries=3):
-    for i in range(retries):
-        try:
-            req = Request(url, headers=HEADERS)
-            with urlopen(req, context=SSL_CTX, timeout=20) as r:
-                return json.loads(r.read())
-        except (HTTPError, URLError) as e:
-            log.warning(f"  intento {i+1}: {e}  url={url[:80]}")
-            time.sleep(2 ** i)
-    return None
+# ── TRANSPORTE HTTP ──────────────────────────────────────────────────────────
+_sesion = None
+_sesion_lock = threading.Lock()
 
 
-def _find_results(data):
+def _crear_sesion(pool_por_host=None):
+    """Sesión requests con pool de conexiones keep-alive compartido entre threads."""
+    pool = pool_por_host or POOL_POR_HOST
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool, pool_block=True)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers.update(HEADERS)
+    s.verify = False
+    return s
+
+
+def get_sesion():
+    """Devuelve la sesión global (se crea una sola vez, thread-safe)."""
+    global _sesion
+    if _sesion is None:
+        with _sesion_lock:
+            if _sesion is None:
+                _sesion = _crear_sesion()
+    return _sesion
+
+
+def cerrar_sesion():
+    """Cierra las conexiones del pool (para tests / fin de corrida)."""
+    global _sesion
+    with _sesion_lock:
+        if _sesion is not None:
+            _sesion.close()
+            _sesion = None
+
+
+def stats_conexiones():
     """
-    Busca recursivamente el dict con 'totalNumRecs' y 'records'
-    dentro de data["contents"][0].
+    Contadores por host del pool de urllib3:
+      nuevas     → conexiones abiertas (cada una = 1 handshake TCP+TLS)
+      requests   → requests enviados por esas conexiones
+      reusadas   → requests que viajaron por una conexión ya abierta
     """
-    if not data:
+    stats = {}
+    if _sesion is None:
+        return stats
+    for adapter in set(_sesion.adapters.values()):
+        for key in adapter.poolmanager.pools.keys():
+            pool = adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}:{pool.port}"
+            d = stats.setdefault(host, {"nuevas": 0, "requests": 0, "reusadas": 0})
+            d["nuevas"]   += pool.num_connections
+            d["requests"] += pool.num_requests
+            d["reusadas"] += max(pool.num_requests - pool.num_connections, 0)
+    return stats
+
+
+def log_stats_conexiones():
+    for host, d in stats_conexiones().items():
+        log.info(f"  HTTP {host}: {d['requests']} requests | "
+                 f"{d['nuevas']} conexiones nuevas | {d['reusadas']} reusadas")
+
+
+# ── CONTROL DE CONCURRENCIA (AIMD) ───────────────────────────────────────────
+class ControlAIMD:
+    """
+    Control de concurrencia AIMD (additive increase / multiplicative decrease)
+    alimentado por las respuestas del servidor, compartido por ambos motores.
+
+    - Cada respuesta OK con latencia estable (EWMA <= 1.5x la mejor vista)
+      suma 1/limite al límite → +1 request en vuelo por "ronda" completa.
+    - 429 / 5xx / timeout / error de conexión → límite a la mitad (a lo sumo
+      una vez por segundo, para no colapsar por una ráfaga de errores).
+    - Latencia degradada (EWMA > 2.5x la mejor) → recorte suave de 10%.
+    - Retry-After del servidor pausa todos los envíos hasta esa hora.
+
+    Guarda estadísticas de la corrida: requests/s, latencias p50/p95,
+    reintentos, errores por tipo y páginas perdidas.
+    """
+
+    def __init__(self, inicial=None, minimo=None, maximo=None):
+        self.inicial = inicial or MAX_WORKERS
+        self.minimo  = minimo or MIN_CONCURRENCIA
+        self.maximo  = maximo or MAX_CONCURRENCIA
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self, inicial=None, maximo=None):
+        with self._lock:
+            if inicial:
+                self.inicial = inicial
+            if maximo:
+                self.maximo = maximo
+            self.limite = float(min(max(self.inicial, self.minimo), self.maximo))
+            self.en_vuelo = 0
+            self.pausa_hasta = 0.0
+            self._ewma = None
+            self._mejor = None
+            self._ultimo_recorte = 0.0
+            self.t0 = time.monotonic()
+            self.latencias = []
+            self.limite_min = self.limite_max = self.limite
+            self.contadores = {"requests": 0, "ok": 0, "reintentos": 0,
+                               "http_429": 0, "http_5xx": 0, "timeouts": 0,
+                               "errores_red": 0, "http_otros": 0, "paginas_perdidas": 0}
+
+    # ── Admisión ─────────────────────────────────────────────────────────────
+    def puede_enviar(self):
+        return self.en_vuelo < int(self.limite) and time.monotonic() >= self.pausa_hasta
+
+    def espera(self):
+        """Segundos hasta que se levante la pausa por Retry-After (0 si no hay)."""
+        return max(self.pausa_hasta - time.monotonic(), 0.0)
+
+    def inicio(self):
+        with self._lock:
+            self.en_vuelo += 1
+            self.contadores["requests"] += 1
+
+    # ── Retroalimentación ────────────────────────────────────────────────────
+    def exito(self, latencia):
+        with self._lock:
+            self.en_vuelo -= 1
+            self.contadores["ok"] += 1
+            self.latencias.append(latencia)
+            self._ewma = latencia if self._ewma is None else 0.8 * self._ewma + 0.2 * latencia
+            self._mejor = self._ewma if self._mejor is None else min(self._mejor, self._ewma)
+
+            if self._ewma <= 1.5 * self._mejor:
+                self.limite = min(self.limite + 1.0 / self.limite, self.maximo)
+            elif self._ewma > 2.5 * self._mejor:
+                self._recortar(0.9)
+            self._actualizar_rango()
+
+    def congestion(self, tipo, retry_after=None):
+        """tipo: 'http_429' | 'http_5xx' | 'timeouts' | 'errores_red'."""
+        with self._lock:
+            self.en_vuelo -= 1
+            self.contadores[tipo] += 1
+            self._recortar(0.5)
+            if retry_after:
+                self.pausa_hasta = max(self.pausa_hasta, time.monotonic() + retry_after)
+            self._actualizar_rango()
+
+    def fallo(self):
+        """Error no reintentable (4xx distinto de 429): no toca el límite."""
+        with self._lock:
+            self.en_vuelo -= 1
+            self.contadores["http_otros"] += 1
+
+    def reintento(self):
+        with self._lock:
+            self.contadores["reintentos"] += 1
+
+    def perdida(self):
+        with self._lock:
+            self.contadores["paginas_perdidas"] += 1
+
+    def _recortar(self, factor):
+        ahora = time.monotonic()
+        if ahora - self._ultimo_recorte < 1.0:
+            return
+        self._ultimo_recorte = ahora
+        self.limite = max(self.limite * factor, self.minimo)
+
+    def _actualizar_rango(self):
+        self.limite_min = min(self.limite_min, self.limite)
+        self.limite_max = max(self.limite_max, self.limite)
+
+    # ── Estadísticas ─────────────────────────────────────────────────────────
+    def stats(self):
+        with self._lock:
+            dur = time.monotonic() - self.t0
+            lat = sorted(self.latencias)
+            contadores = dict(self.contadores)
+            limites = (self.limite, self.limite_min, self.limite_max)
+
+        def pct(p):
+            return round(lat[min(int(len(lat) * p), len(lat) - 1)] * 1000, 1) if lat else None
+
+        return {
+            **contadores,
+            "segundos":       round(dur, 2),
+            "requests_seg":   round(contadores["requests"] / dur, 2) if dur else None,
+            "latencia_p50_ms": pct(0.50),
+            "latencia_p95_ms": pct(0.95),
+            "concurrencia_final": int(limites[0]),
+            "concurrencia_min":   int(limites[1]),
+            "concurrencia_max":   int(limites[2]),
+        }
+
+    def log_stats(self):
+        st = self.stats()
+        log.info(f"  FETCH: {st['requests']} requests en {st['segundos']} s "
+                 f"({st['requests_seg']} req/s) | p50 {st['latencia_p50_ms']} ms "
+                 f"p95 {st['latencia_p95_ms']} ms")
+        log.info(f"  FETCH: reintentos {st['reintentos']} | 429 {st['http_429']} | "
+                 f"5xx {st['http_5xx']} | timeouts {st['timeouts']} | red {st['errores_red']} | "
+                 f"páginas perdidas {st['paginas_perdidas']}")
+        log.info(f"  FETCH: concurrencia final {st['concurrencia_final']} "
+                 f"(rango {st['concurrencia_min']}–{st['concurrencia_max']})")
+
+
+CONTROL = ControlAIMD()
+
+
+def _parse_retry_after(valor):
+    """Retry-After en segundos o como fecha HTTP → segundos (o None)."""
+    if not valor:
+        return None
+    try:
+        return max(float(valor), 0.0)
+    except ValueError:
+        pass
+    try:
+        dt = parsedate_to_datetime(valor)
+        return max(dt.timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
         return None
 
-    def _search(obj):
-        if isinstance(obj, dict):
-            if "totalNumRecs" in obj and "records" in obj:
-                return obj
-            for v in obj.values():
-                r = _search(v)
-                if r is not None:
-                    return r
-        elif isinstance(obj, list):
-            for item in obj:
-                r = _search(item)
-                if r is not None:
-                    return r
+
+def _backoff(intento, retry_after=None):
+    """Espera antes del próximo intento: Retry-After si vino, si no exponencial con jitter."""
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX)
+    return min(2 ** intento, BACKOFF_MAX) * random.uniform(0.5, 1.0)
+
+
+class _PaginaStream(tuple):
+    """(productos, total) armados en streaming, en lugar del JSON completo."""
+    __slots__ = ()
+
+    def __new__(cls, productos, total):
+        return super().__new__(cls, (productos, total))
+
+
+class _ArmadorRecords:
+    """
+    Consume eventos ijson (prefix, event, value) y arma sólo los items de
+    records y el valor de totalNumRecs del bloque en `ruta` (la de
+    LocalizadorResultados); el resto de la respuesta se descarta a medida
+    que pasa.
+
+    El prefix de ijson dice "item" para cualquier posición de una lista, así
+    que un bloque hermano con la misma forma (otro elemento de Main, por
+    ejemplo) daría el mismo prefix. Por eso se cuentan las posiciones de las
+    listas que atraviesa la ruta y sólo se toma lo que está en los índices
+    memorizados.
+    """
+
+    def __init__(self, ruta):
+        claves = []
+        self._listas = {}      # prefix de cada lista de la ruta → su nivel
+        self._esperado = []    # índice memorizado en cada nivel
+        for paso in ruta:
+            if isinstance(paso, int):
+                self._listas[".".join(claves)] = len(self._esperado)
+                self._esperado.append(paso)
+                claves.append("item")
+            else:
+                claves.append(paso)
+        self._items = {p + ".item" if p else "item": n for p, n in self._listas.items()}
+        self._pos = [-1] * len(self._esperado)
+        self._en_ruta = not self._esperado
+        prefijo = ".".join(claves)
+        self.p_total = prefijo + ".totalNumRecs"
+        self.p_rec   = prefijo + ".records.item"
+        self.total = None
+        self._builder = None
+        self._nivel = 0
+
+    def _posicion(self, prefix, event):
+        """Lleva la cuenta de posiciones en las listas de la ruta."""
+        cambio = False
+        if event == "start_array" and prefix in self._listas:
+            self._pos[self._listas[prefix]] = -1
+            cambio = True
+        if prefix in self._items and event not in ("map_key", "end_map", "end_array"):
+            self._pos[self._items[prefix]] += 1
+            cambio = True
+        if cambio:
+            self._en_ruta = self._pos == self._esperado
+
+    def evento(self, prefix, event, value):
+        """Procesa un evento; devuelve un record cuando se completa, si no None."""
+        if self._builder is None:
+            self._posicion(prefix, event)
+            if not self._en_ruta:
+                return None
+            if prefix == self.p_rec and event == "start_map":
+                self._builder = ijson.ObjectBuilder()
+                self._nivel = 0
+            else:
+                if prefix == self.p_total and event == "number":
+                    self.total = int(value)
+                return None
+        b = self._builder
+        b.event(event, value)
+        if event in ("start_map", "start_array"):
+            self._nivel += 1
+        elif event in ("end_map", "end_array"):
+            self._nivel -= 1
+            if self._nivel == 0:
+                self._builder = None
+                return b.value
         return None
 
-    try:
-        root = data["contents"][0]
-    except (KeyError, IndexError):
+
+def _ruta_stream():
+    """Ruta del bloque de resultados, si el modo streaming está activo y ya se conoce."""
+    ruta = _LOCALIZADOR.ruta
+    if not (STREAMING and ijson and ruta):
+        return None
+    return ruta
+
+
+def _leer_stream(eventos, ruta, cat_nombre):
+    """Productos y total desde eventos ijson; None si el bloque no estaba en la ruta."""
+    armador = _ArmadorRecords(ruta)
+    productos = []
+    for prefix, event, value in eventos:
+        rec = armador.evento(prefix, event, value)
+        if rec is not None:
+            productos.append(extraer_producto(rec, cat_nombre))
+    if armador.total is None:
         return None
+    return _PaginaStream(productos, armador.total)
+
+
+_ERRORES_CUERPO = (ValueError, OSError, requests.RequestException, urllib3.exceptions.HTTPError) \
+    + ((ijson.JSONError,) if ijson else ())
+
+
+def _pedir(url, ruta=None, cat_nombre=None):
+    """
+    Un solo intento de GET, reportando el resultado a CONTROL.
+    Devuelve (data, reintentable, retry_after).
+
+    Con `ruta` (modo streaming) la respuesta se parsea incrementalmente y
+    data es un _PaginaStream (productos, total) en vez del JSON completo.
+    """
+    CONTROL.inicio()
+    t0 = time.monotonic()
+    try:
+        r = get_sesion().get(url, timeout=TIMEOUT, stream=ruta is not None)
+    except requests.Timeout as e:
+        CONTROL.congestion("timeouts")
+        log.warning(f"  timeout: {e}  url={url[:80]}")
+        return None, True, None
+    except requests.RequestException as e:
+        CONTROL.congestion("errores_red")
+        log.warning(f"  error de red: {e}  url={url[:80]}")
+        return None, True, None
+
+    with r:
+        if r.status_code == 429 or r.status_code >= 500:
+            retry_after = _parse_retry_after(r.headers.get("Retry-After"))
+            CONTROL.congestion("http_429" if r.status_code == 429 else "http_5xx", retry_after)
+            log.warning(f"  HTTP {r.status_code} (Retry-After={retry_after})  url={url[:80]}")
+            return None, True, retry_after
+        if r.status_code >= 400:
+            CONTROL.fallo()
+            log.warning(f"  HTTP {r.status_code}  url={url[:80]}")
+            return None, False, None
+
+        try:
+            if ruta:
+                r.raw.decode_content = True
+                data = _leer_stream(ijson.parse(r.raw, use_float=True), ruta, cat_nombre)
+            else:
+                data = json_loads(r.content)
+        except _ERRORES_CUERPO as e:
+            CONTROL.congestion("errores_red")
+            log.warning(f"  respuesta inválida/incompleta: {e}  url={url[:80]}")
+            return None, True, None
+
+    CONTROL.exito(time.monotonic() - t0)
+    if ruta and data is None:
+        # La ruta memorizada no aplica a esta respuesta: re-aprender con el JSON completo
+        log.warning(f"  WARNING: bloque de resultados fuera de la ruta {ruta}; se reintenta sin streaming")
+        _LOCALIZADOR.ruta = None
+        return None, True, 0
+    return data, False, None
+
+
+def get_json(url, retries=REINTENTOS):
+    """GET con reintentos (backoff exponencial / Retry-After). Para uso fuera del scheduler."""
+    for i in range(retries):
+        espera = CONTROL.espera()
+        if espera:
+            time.sleep(espera)
+        data, reintentable, retry_after = _pedir(url)
+        if data is not None or not reintentable:
+            return data
+        if i + 1 < retries:
+            CONTROL.reintento()
+            time.sleep(_backoff(i, retry_after))
+    CONTROL.perdida()
+    log.error(f"  ERROR: sin respuesta tras {retries} intentos  url={url[:80]}")
+    return None
+
 
-    return _search(root)
+def _buscar_resultados(obj, ruta=()):
+    """
+    Búsqueda recursiva completa del dict con 'totalNumRecs' y 'records'.
+    Devuelve (dict, ruta) donde ruta es la tupla de claves/índices desde obj,
+    o (None, None) si no está.
+    """
+    if isinstance(obj, dict):
+        if "totalNumRecs" in obj and "records" in obj:
+            return obj, ruta
+        for k, v in obj.items():
+            r, camino = _buscar_resultados(v, ruta + (k,))
+            if r is not None:
+                return r, camino
+    elif isinstance(obj, list):
+        for i, item in enumerate(obj):
+            r, camino = _buscar_resultados(item, ruta + (i,))
+            if r is not None:
+                return r, camino
+    return None, None
+
+
+class LocalizadorResultados:
+    """
+    Localiza el bloque {totalNumRecs, records} recordando el camino.
+
+    La estructura de la respuesta Endeca es la misma en todas las páginas:
+    la primera vez se hace la búsqueda completa dentro de contents[0] y se
+    guarda la ruta de claves/índices; las siguientes se baja directo por esa
+    ruta. Si la ruta no lleva a un bloque válido se vuelve a buscar completo
+    (y se reemplaza la ruta).
+    """
+
+    def __init__(self):
+        self.ruta = None
+        self.aciertos = 0
+        self.busquedas = 0
+
+    def buscar(self, data):
+        if not data:
+            return None
+
+        ruta = self.ruta
+        if ruta is not None:
+            obj = data
+            try:
+                for paso in ruta:
+                    obj = obj[paso]
+            except (KeyError, IndexError, TypeError):
+                obj = None
+            if isinstance(obj, dict) and "totalNumRecs" in obj and "records" in obj:
+                self.aciertos += 1
+                return obj
+
+        self.busquedas += 1
+        try:
+            root = data["contents"][0]
+        except (KeyError, IndexError, TypeError):
+            return None
+        obj, camino = _buscar_resultados(root)
+        if obj is not None:
+            self.ruta = ("contents", 0) + camino
+        return obj
+
+
+_LOCALIZADOR = LocalizadorResultados()
+
+
+def _find_results(data):
+    """
+    Devuelve el dict con 'totalNumRecs' y 'records' dentro de
+    data["contents"][0] (ruta memorizada, ver LocalizadorResultados).
+    """
+    return _LOCALIZADOR.buscar(data)
 
 
 def _parse_precio(texto):
@@ -88,48 +600,149 @@ def _parse_precio(texto):
         return None
 
 
-def extraer_producto(rec_outer, cat_nombre):
-    rec   = rec_outer.get("records", [{}])[0]
-    attrs = rec.get("attributes", {})
+# ── EXTRACCIÓN DE PRODUCTOS ──────────────────────────────────────────────────
+CAMPOS = [
+    "supermercado", "plu", "ean", "nombre", "marca", "categoria",
+    "precio_actual", "precio_regular", "precio_sin_imp",
+    "precio_x_unidad", "unidad_label", "unidad", "es_pesable",
+    "promo_texto", "promo_regular", "imagen", "url", "fecha",
+]
+
+
+class Producto:
+    """
+    Registro compacto de un producto: __slots__ con los CAMPOS (sin __dict__
+    por instancia) y los strings categóricos internados, así las ~14k filas
+    de una corrida comparten un único objeto por categoría, marca, unidad,
+    texto de promo, etc.
+
+    Se usa en todo el pipeline (scraping, dedupe, guardar); a_dict() sólo
+    donde hace falta un dict (JSON). p["campo"] funciona por compatibilidad.
+    """
+
+    __slots__ = tuple(CAMPOS)
+
+    def __init__(self, *valores):
+        for campo, valor in zip(CAMPOS, valores):
+            setattr(self, campo, valor)
 
-    def get1(key, default=""):
-        v = attrs.get(key, [default])
-        return v[0] if isinstance(v, list) else v
+    def __getitem__(self, campo):
+        return getattr(self, campo)
 
-    plu = get1("product.repositoryId").replace("prod", "")
-    ean = get1("product.eanPrincipal")
-    nombre = get1("product.displayName")
-    marca  = (get1("product.MARCA") or get1("product.brand")).title()
+    def a_tupla(self):
+        return tuple(getattr(self, c) for c in CAMPOS)
 
-    cat_parts = [c for c in attrs.get("allAncestors.displayName", [])
-                 if c not in ("CotoDigital", "")]
-    cat_full  = " > ".join(reversed(cat_parts)) if cat_parts else cat_nombre
+    def a_dict(self):
+        return dict(zip(CAMPOS, self.a_tupla()))
 
-    record_id = get1("record.id")
-    url_prod  = (f"https://www.cotodigital3.com.ar/sitios/cdigi/producto/_/R-{record_id}"
-                 if record_id else "")
-    imagen    = get1("product.largeImage.url") or get1("product.mediumImage.url")
+    def __eq__(self, otro):
+        return isinstance(otro, Producto) and self.a_tupla() == otro.a_tupla()
 
-    desc_unidad = get1("product.unidades.descUnidad")
-    c_formato   = get1("product.cFormato", "").strip()
-    es_pesable  = get1("product.unidades.esPesable") == "1"
+    __hash__ = None
 
+    def __repr__(self):
+        return f"Producto(plu={self.plu!r}, nombre={self.nombre!r})"
+
+
+# Atributos Endeca que lee extraer_producto: (variable local, clave).
+# Cada atributo viene como lista de un elemento; se toma el primero.
+SPEC_ATRIBUTOS = (
+    ("plu",         "product.repositoryId"),
+    ("ean",         "product.eanPrincipal"),
+    ("nombre",      "product.displayName"),
+    ("marca",       "product.MARCA"),
+    ("brand",       "product.brand"),
+    ("record_id",   "record.id"),
+    ("img_grande",  "product.largeImage.url"),
+    ("img_mediana", "product.mediumImage.url"),
+    ("desc_unidad", "product.unidades.descUnidad"),
+    ("c_formato",   "product.cFormato"),
+    ("pesable",     "product.unidades.esPesable"),
+    ("active_price", "sku.activePrice"),
+    ("dto_price",   "sku.dtoPrice"),
+    ("ref_price",   "sku.referencePrice"),
+    ("descuentos",  "product.dtoDescuentos"),
+)
+
+
+def _compilar_lector(spec):
+    """
+    Convierte la spec en una función attrs -> tupla de valores: las claves
+    se arman una sola vez y cada record hace un attrs.get por atributo, sin
+    recorrer la spec. Atributo ausente → "".
+    """
+    claves = tuple(clave for _, clave in spec)
+    vacios = ("",) * len(claves)
+
+    def _leer_atributos(attrs):
+        return tuple([v[0] if v.__class__ is list else v
+                      for v in map(attrs.get, claves, vacios)])
+
+    return _leer_atributos
+
+
+_leer_atributos = _compilar_lector(SPEC_ATRIBUTOS)
+
+_fecha_corrida = None
+
+
+def fecha_corrida(reiniciar=False):
+    """Timestamp "YYYY-mm-dd HH:MM" de la corrida: se calcula una sola vez."""
+    global _fecha_corrida
+    if reiniciar or _fecha_corrida is None:
+        _fecha_corrida = datetime.now().strftime("%Y-%m-%d %H:%M")
+    return _fecha_corrida
+
+
+@lru_cache(maxsize=8192)
+def _json_attr(texto):
+    """
+    Decodifica un atributo JSON embebido (sku.dtoPrice, product.dtoDescuentos).
+    Cacheado: los payloads de promos se repiten muchísimo. El resultado se
+    comparte entre records, así que sólo se lee, nunca se modifica.
+    """
     try:
-        precio_regular = float(get1("sku.activePrice") or 0) or None
-    except Exception:
-        precio_regular = None
+        return json_loads(texto)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _categoria_desde_ancestros(ancestros):
+    cat_parts = [c for c in ancestros if c not in ("CotoDigital", "")]
+    return intern(" > ".join(reversed(cat_parts)))
+
+
+@lru_cache(maxsize=8192)
+def _titulo(marca):
+    return intern(marca.title())
+
+
+def extraer_producto(rec_outer, cat_nombre):
+    rec   = rec_outer.get("records", [{}])[0]
+    attrs = rec.get("attributes", {})
+
+    (plu, ean, nombre, marca, brand, record_id, img_grande, img_mediana,
+     desc_unidad, c_formato, pesable, active_price, dto_price, ref_price,
+     descuentos) = _leer_atributos(attrs)
+
+    ancestros = attrs.get("allAncestors.displayName")
+    cat_full  = (_categoria_desde_ancestros(tuple(ancestros)) if ancestros else "") or cat_nombre
 
     try:
-        dp = json.loads(get1("sku.dtoPrice") or "{}")
-    except Exception:
-        dp = {}
-    precio_sin_imp = dp.get("precioSinImp")
+        precio_regular = float(active_price or 0) or None
+    except (TypeError, ValueError):
+        precio_regular = None
+
+    dp = _json_attr(dto_price) if dto_price else None
+    precio_sin_imp = dp.get("precioSinImp") if isinstance(dp, dict) else None
 
     try:
-        precio_x_unidad = float(get1("sku.referencePrice") or 0) or None
-    except Exception:
+        precio_x_unidad = float(ref_price or 0) or None
+    except (TypeError, ValueError):
         precio_x_unidad = None
 
+    c_formato = c_formato.strip()
     if precio_x_unidad:
         if desc_unidad in ("KGS", "GRM"):
             unidad_label = "por 100 Gramos"
@@ -140,14 +753,10 @@ def extraer_producto(rec_outer, cat_nombre):
     else:
         unidad_label = ""
 
-    try:
-        descuentos = json.loads(get1("product.dtoDescuentos", "[]"))
-    except Exception:
-        descuentos = []
-
     promo_texto = promo_regular = ""
     precio_actual = precio_regular
 
+    descuentos = _json_attr(descuentos) if descuentos else None
     if descuentos:
         d = descuentos[0]
         promo_texto   = (d.get("textoDescuento") or d.get("textoLlevando") or "").strip()
@@ -156,33 +765,119 @@ def extraer_producto(rec_outer, cat_nombre):
         if precio_dto:
             precio_actual = precio_dto
 
-    return {
-        "supermercado":    "coto",
-        "plu":             plu,
-        "ean":             ean,
-        "nombre":          nombre,
-        "marca":           marca,
-        "categoria":       cat_full,
-        "precio_actual":   precio_actual,
-        "precio_regular":  precio_regular,
-        "precio_sin_imp":  precio_sin_imp,
-        "precio_x_unidad": precio_x_unidad,
-        "unidad_label":    unidad_label,
-        "unidad":          desc_unidad,
-        "es_pesable":      es_pesable,
-        "promo_texto":     promo_texto,
-        "promo_regular":   promo_regular,
-        "imagen":          imagen,
-        "url":             url_prod,
-        "fecha":           datetime.now().strftime("%Y-%m-%d %H:%M"),
-    }
+    return Producto(
+        "coto",
+        plu.replace("prod", ""),
+        ean,
+        nombre,
+        _titulo(marca or brand),
+        cat_full,
+        precio_actual,
+        precio_regular,
+        precio_sin_imp,
+        precio_x_unidad,
+        intern(unidad_label),
+        intern(desc_unidad),
+        pesable == "1",
+        intern(promo_texto),
+        intern(promo_regular),
+        img_grande or img_mediana,
+        (f"https://www.cotodigital3.com.ar/sitios/cdigi/producto/_/R-{record_id}"
+         if record_id else ""),
+        _fecha_corrida or fecha_corrida(),
+    )
 
 
-def _fetch_page(args):
-    """Worker: descarga una página y devuelve (n_code, offset, records, total)."""
-    n_code, offset, cat_nombre = args
-    url  = f"{BASE_BROWSE}/N-{n_code}?Nrpp={NRPP}&No={offset}&format=json"
-    data = get_json(url)
+# ── TAMAÑO DE PÁGINA (Nrpp) ──────────────────────────────────────────────────
+_nrpp_corrida = None   # Nrpp que usa la corrida actual (None → NRPP)
+
+
+def _url_pagina(n_code, offset, nrpp=None):
+    nrpp = nrpp or _nrpp_corrida or NRPP
+    return f"{BASE_BROWSE}/N-{n_code}?Nrpp={nrpp}&No={offset}&format=json"
+
+
+def _leer_cache_nrpp():
+    try:
+        with open(NRPP_CACHE, encoding="utf-8") as f:
+            c = json.load(f)
+        edad = datetime.now() - datetime.fromisoformat(c["fecha"])
+        if edad.total_seconds() < NRPP_TTL_HORAS * 3600 and int(c["nrpp"]) >= NRPP:
+            return int(c["nrpp"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _guardar_cache_nrpp(nrpp):
+    try:
+        NRPP_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        with open(NRPP_CACHE, "w", encoding="utf-8") as f:
+            json.dump({"nrpp": nrpp, "fecha": datetime.now().isoformat(timespec="seconds")}, f)
+    except OSError as e:
+        log.warning(f"  WARNING: no se pudo guardar {NRPP_CACHE}: {e}")
+
+
+def detectar_nrpp(n_code=None):
+    """
+    Busca el Nrpp más grande que honra el endpoint: pide la página 0 de una
+    categoría grande con cada candidato (de mayor a menor) y compara cuántos
+    records vinieron contra min(Nrpp, totalNumRecs).
+      - Si vinieron todos → ese Nrpp se honra.
+      - Si vinieron menos → el server lo recorta: el tope es len(records).
+      - Si falla (timeout, 5xx) → se prueba el candidato siguiente.
+    Nunca devuelve menos que NRPP.
+    """
+    n_code = n_code or NRPP_SONDA
+    for cand in NRPP_CANDIDATOS:
+        if cand <= NRPP:
+            break
+        data = get_json(_url_pagina(n_code, 0, cand), retries=2)
+        main = _find_results(data)
+        if main is None:
+            continue
+        n, total = len(main.get("records", [])), int(main.get("totalNumRecs", 0))
+        if n >= min(cand, total) and total > NRPP:
+            return cand
+        if NRPP <= n < min(cand, total):
+            return n
+    return NRPP
+
+
+def nrpp_para_corrida():
+    """Nrpp a usar: COTO_NRPP si está, si no el cacheado en disco (TTL), si no se detecta."""
+    if os.getenv("COTO_NRPP"):
+        return int(os.getenv("COTO_NRPP"))
+    nrpp = _leer_cache_nrpp()
+    if nrpp:
+        return nrpp
+    nrpp = detectar_nrpp()
+    log.info(f"  Nrpp detectado: {nrpp}")
+    _guardar_cache_nrpp(nrpp)
+    return nrpp
+
+
+def _offsets_restantes(n_records_p0, total, nrpp):
+    """
+    Offsets a pedir después de la página 0. Si la página 0 trajo menos de lo
+    pedido (el server recortó Nrpp para esta categoría), se avanza de a lo que
+    realmente vino para no saltear productos.
+    """
+    paso = nrpp
+    if n_records_p0 < min(nrpp, total):
+        log.warning(f"  WARNING: Nrpp={nrpp} recortado a {n_records_p0} por el server")
+        paso = n_records_p0
+    return range(paso, total, paso)
+
+
+def _leer_pagina(data, n_code, offset, cat_nombre):
+    """Extrae (n_code, offset, productos, total) de la respuesta de una página."""
+    if isinstance(data, _PaginaStream):
+        productos, total = data
+        if not productos:
+            log.warning(f"  WARNING {cat_nombre}: 0 registros en offset {offset} (totalNumRecs={total})")
+        return n_code, offset, productos, total
+
     if not data:
         log.warning(f"  WARNING {cat_nombre}: sin respuesta en offset {offset}")
         return n_code, offset, [], 0
@@ -202,67 +897,585 @@ def _fetch_page(args):
     if not records:
         log.warning(f"  WARNING {cat_nombre}: 0 registros en offset {offset} (totalNumRecs={total})")
 
-    return n_code, offset, records, total
+    return n_code, offset, [extraer_producto(r, cat_nombre) for r in records], total
+
+
+def _fetch_page(args):
+    """
+    Worker: un intento de descarga de una página, ya convertida a productos.
+    Devuelve (n_code, offset, productos, total, reintentar, retry_after).
+    """
+    n_code, offset, cat_nombre = args
+    data, reintentable, retry_after = _pedir(_url_pagina(n_code, offset), _ruta_stream(), cat_nombre)
+    if data is None and reintentable:
+        return n_code, offset, [], 0, True, retry_after
+    return (*_leer_pagina(data, n_code, offset, cat_nombre), False, None)
+
+
+def _entregar(paginas, conteo, n_code, offset, productos, salida=None, restantes=()):
+    """
+    Destino de cada página descargada: sin `salida` se guarda para _acumular;
+    con `salida` se le entrega en el momento con su posición (orden de la
+    categoría en `categorias`, offset) y, si es la página 0, los offsets que
+    faltan de su categoría, y sólo se lleva la cuenta.
+    """
+    conteo[n_code] = conteo.get(n_code, 0) + len(productos)
+    if salida is None:
+        paginas[n_code][offset] = productos
+    else:
+        i = list(paginas).index(n_code)
+        salida.agregar(productos, orden=(i, offset), siguientes=[(i, off) for off in restantes])
+
+
+def _acumular(categorias, paginas, totales, agrupar=False):
+    """
+    Productos en el orden de `categorias`, y por offset dentro de cada una.
+    Con agrupar=True devuelve {n_code: [productos]} en vez de una lista plana.
+    """
+    todos = []
+    por_cat = {}
+    for cat in categorias:
+        n_code = cat["n"]
+        prods = por_cat.setdefault(n_code, [])
+        if n_code not in totales:
+            continue
+        for off in sorted(paginas[n_code]):
+            prods.extend(paginas[n_code][off])
+        todos.extend(prods)
+        log.info(f"  acumulado: {len(todos)}")
+    return por_cat if agrupar else todos
+
+
+def scrape_categorias(categorias, max_workers=None, motor=None, agrupar=False, nrpp=None,
+                      salida=None):
+    """
+    Scrapea una lista de categorías [{"n": ..., "nombre": ...}] y devuelve
+    la lista de productos acumulada en el orden de `categorias` (y dentro de
+    cada una, en orden de offset). Sin deduplicar.
+
+    motor: "threads" (default) o "async"; si es None se toma de MOTOR
+    (variable de entorno COTO_MOTOR).
+    max_workers: fija la concurrencia inicial y máxima; si es None el
+    control AIMD arranca en MAX_WORKERS y puede subir hasta el techo del motor.
+    agrupar: si es True devuelve {n_code: [productos]} en vez de la lista plana.
+    nrpp: tamaño de página; si es None se usa nrpp_para_corrida().
+    salida: un SalidaCatalogo; cada página se le entrega apenas llega (la
+    salida la escribe en el orden de `categorias` y offset) y no se retiene
+    acá, así que la lista devuelta queda vacía.
+    """
+    global _nrpp_corrida
+    motor = motor or MOTOR
+    if motor not in ("threads", "async"):
+        raise ValueError(f"motor desconocido: {motor!r} (usar 'threads' o 'async')")
+
+    techo = max_workers or (CONCURRENCIA_ASYNC if motor == "async" else MAX_CONCURRENCIA)
+    CONTROL.reiniciar(inicial=max_workers or MAX_WORKERS, maximo=techo)
+    _nrpp_corrida = nrpp or nrpp_para_corrida()
+    fecha_corrida(reiniciar=True)
+    log.info(f"  Crawl: motor {motor}, Nrpp {_nrpp_corrida}, {len(categorias)} categorías")
+
+    if motor == "async":
+        todos = scrape_categorias_async(categorias, concurrencia=techo, agrupar=agrupar,
+                                        salida=salida)
+    else:
+        todos = _scrape_threads(categorias, techo, agrupar=agrupar, salida=salida)
+    CONTROL.log_stats()
+    return todos
+
+
+def _scrape_threads(categorias, max_workers, agrupar=False, salida=None):
+    """
+    Scheduler global de crawl: un único pool de threads y una única cola de
+    jobs (n_code, offset) compartida por todas las categorías.
+
+    Se encolan primero las páginas 0 de cada categoría; al llegar cada una,
+    su totalNumRecs genera los offsets restantes en la misma cola, así una
+    categoría grande se reparte entre todos los workers en vez de quedar
+    corriendo sola al final. Cuántas páginas hay en vuelo lo decide CONTROL.
+    La cola sale por (orden de la categoría, offset): las páginas llegan
+    casi en el orden en que SalidaCatalogo las escribe y pocas quedan
+    esperando en memoria a una anterior.
+
+    Las páginas con 429/5xx/timeout no duermen en el worker: vuelven a una
+    cola de espera con su hora de reintento (Retry-After o backoff) y el
+    thread queda libre para otra página.
+    """
+    nombres = {c["n"]: c["nombre"] for c in categorias}
+    paginas = {c["n"]: {} for c in categorias}   # n_code → {offset: productos}
+    conteo  = {}
+    totales = {}
+    nrpp = _nrpp_corrida or NRPP
+
+    if salida is not None:
+        salida.esperar((i, 0) for i in range(len(paginas)))
+
+    posicion = {n: i for i, n in enumerate(paginas)}
+    cola = []        # heap de ((orden de categoría, offset), job); job = (n_code, offset, nombre, intento)
+
+    def encolar(job):
+        heapq.heappush(cola, ((posicion[job[0]], job[1]), job))
+
+    for c in categorias:
+        encolar((c["n"], 0, c["nombre"], 0))
+    esperando = []   # heap de (listo_en, seq, job)
+    en_vuelo = {}    # future → job
+    seq = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        while cola or en_vuelo or esperando:
+            ahora = time.monotonic()
+            while esperando and esperando[0][0] <= ahora:
+                encolar(heapq.heappop(esperando)[2])
+
+            while cola and len(en_vuelo) < int(CONTROL.limite) and not CONTROL.espera():
+                job = heapq.heappop(cola)[1]
+                en_vuelo[ex.submit(_fetch_page, job[:3])] = job
+
+            # Despertar por la próxima página que termine o el próximo reintento listo
+            proximo = [CONTROL.espera()] if CONTROL.espera() else []
+            if esperando:
+                proximo.append(max(esperando[0][0] - ahora, 0))
+            if cola and not en_vuelo and not proximo:
+                proximo.append(0.05)
+            if not en_vuelo:
+                time.sleep(min(proximo) if proximo else 0)
+                continue
+
+            hechos, _ = wait(list(en_vuelo), timeout=min(proximo) if proximo else None,
+                             return_when=FIRST_COMPLETED)
+            for future in hechos:
+                n_code, offset, cat_nombre, intento = en_vuelo.pop(future)
+                _, _, productos, total, reintentar, retry_after = future.result()
+
+                if reintentar:
+                    if intento + 1 < REINTENTOS:
+                        CONTROL.reintento()
+                        seq += 1
+                        heapq.heappush(esperando, (time.monotonic() + _backoff(intento, retry_after),
+                                                   seq, (n_code, offset, cat_nombre, intento + 1)))
+                        continue
+                    CONTROL.perdida()
+                    log.error(f"  ERROR {cat_nombre}: offset {offset} perdido tras {REINTENTOS} intentos")
+
+                restantes = _offsets_restantes(len(productos), total, nrpp) \
+                    if offset == 0 and productos else ()
+                _entregar(paginas, conteo, n_code, offset, productos, salida, restantes)
+
+                if offset == 0:
+                    # ── Página 0: descubrir total y encolar el resto ─────────
+                    log.info(f"-> {cat_nombre} (N-{n_code}) | {len(productos)}/{total}")
+                    if not productos:
+                        continue
+                    totales[n_code] = total
+                    for off in restantes:
+                        encolar((n_code, off, cat_nombre, 0))
+                else:
+                    log.info(f"  {cat_nombre} offset {offset} | {conteo[n_code]}/{totales.get(n_code, '?')}")
+
+    if salida is not None:
+        return {} if agrupar else []
+    return _acumular(categorias, paginas, totales, agrupar)
+
+
+# ── MOTOR ASYNCIO ────────────────────────────────────────────────────────────
+def scrape_categorias_async(categorias, concurrencia=None, agrupar=False, salida=None):
+    """
+    Igual que el scheduler de threads pero con corutinas sobre aiohttp:
+    cada página es una corutina; un asyncio.Semaphore pone el techo de
+    requests en vuelo y, por debajo de él, CONTROL ajusta la concurrencia
+    efectiva. Permite miles de requests concurrentes sin un thread por cada
+    una. Requiere aiohttp (dependencia opcional, sólo para este motor).
+    """
+    return asyncio.run(_scrape_async(categorias, concurrencia or CONCURRENCIA_ASYNC, agrupar, salida))
+
+
+async def _leer_stream_async(eventos, ruta, cat_nombre):
+    """Versión async de _leer_stream (eventos de ijson.parse_async)."""
+    armador = _ArmadorRecords(ruta)
+    productos = []
+    async for prefix, event, value in eventos:
+        rec = armador.evento(prefix, event, value)
+        if rec is not None:
+            productos.append(extraer_producto(rec, cat_nombre))
+    if armador.total is None:
+        return None
+    return _PaginaStream(productos, armador.total)
+
+
+async def _pedir_async(sesion, url, ruta=None, cat_nombre=None):
+    """Versión async de _pedir: un intento, reportado a CONTROL."""
+    import aiohttp
+    CONTROL.inicio()
+    t0 = time.monotonic()
+    try:
+        async with sesion.get(url) as r:
+            if r.status == 429 or r.status >= 500:
+                retry_after = _parse_retry_after(r.headers.get("Retry-After"))
+                CONTROL.congestion("http_429" if r.status == 429 else "http_5xx", retry_after)
+                log.warning(f"  HTTP {r.status} (Retry-After={retry_after})  url={url[:80]}")
+                return None, True, retry_after
+            if r.status >= 400:
+                CONTROL.fallo()
+                log.warning(f"  HTTP {r.status}  url={url[:80]}")
+                return None, False, None
+            if ruta:
+                data = await _leer_stream_async(ijson.parse_async(r.content, use_float=True),
+                                                ruta, cat_nombre)
+            else:
+                data = json_loads(await r.read())
+    except asyncio.TimeoutError:
+        CONTROL.congestion("timeouts")
+        log.warning(f"  timeout  url={url[:80]}")
+        return None, True, None
+    except (aiohttp.ClientError,) + _ERRORES_CUERPO as e:
+        CONTROL.congestion("errores_red")
+        log.warning(f"  error de red: {e!r}  url={url[:80]}")
+        return None, True, None
+    CONTROL.exito(time.monotonic() - t0)
+    if ruta and data is None:
+        log.warning(f"  WARNING: bloque de resultados fuera de la ruta {ruta}; se reintenta sin streaming")
+        _LOCALIZADOR.ruta = None
+        return None, True, 0
+    return data, False, None
+
+
+class _SemaforoPrioridad:
+    """
+    Semáforo de asyncio que, con todos los lugares ocupados, despierta
+    primero al de menor prioridad (no al que llegó antes): el motor async
+    pide las páginas por (orden de la categoría, offset), como la cola del
+    motor de threads. `lugares` es una función: la capacidad puede seguir
+    al límite de CONTROL.
+    """
+
+    def __init__(self, lugares):
+        self._lugares = lugares
+        self._en_uso = 0
+        self._espera = []   # heap de (prioridad, seq, future)
+        self._seq = 0
+
+    async def tomar(self, prioridad):
+        if self._en_uso < self._lugares() and not self._espera:
+            self._en_uso += 1
+            return
+        self._seq += 1
+        turno = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._espera, (prioridad, self._seq, turno))
+        try:
+            await turno
+        except asyncio.CancelledError:
+            if turno.done() and not turno.cancelled():
+                self.soltar()   # el lugar ya era suyo: se pasa al siguiente
+            raise
+
+    def soltar(self):
+        self._en_uso -= 1
+        while self._espera and self._en_uso < self._lugares():
+            turno = heapq.heappop(self._espera)[2]
+            if not turno.done():
+                self._en_uso += 1
+                turno.set_result(None)
+
+
+async def _scrape_async(categorias, concurrencia, agrupar=False, salida=None):
+    import aiohttp
+
+    paginas = {c["n"]: {} for c in categorias}
+    conteo  = {}
+    totales = {}
+    nrpp = _nrpp_corrida or NRPP
+    posicion = {n: i for i, n in enumerate(paginas)}
+    sem = _SemaforoPrioridad(lambda: min(concurrencia, int(CONTROL.limite)))
+    if salida is not None:
+        salida.esperar((i, 0) for i in range(len(paginas)))
+
+    conector = aiohttp.TCPConnector(limit=concurrencia, limit_per_host=concurrencia, ssl=False)
+    timeout  = aiohttp.ClientTimeout(total=TIMEOUT)
+    async with aiohttp.ClientSession(headers=HEADERS, connector=conector, timeout=timeout) as sesion:
+
+        async def get_json_async(url, cat_nombre, prioridad):
+            for intento in range(REINTENTOS):
+                await sem.tomar(prioridad)
+                try:
+                    while not CONTROL.puede_enviar():
+                        await asyncio.sleep(max(CONTROL.espera(), 0.005))
+                    data, reintentable, retry_after = await _pedir_async(
+                        sesion, url, _ruta_stream(), cat_nombre)
+                finally:
+                    sem.soltar()
+                if data is not None or not reintentable:
+                    return data
+                if intento + 1 < REINTENTOS:
+                    CONTROL.reintento()
+                    await asyncio.sleep(_backoff(intento, retry_after))
+            CONTROL.perdida()
+            log.error(f"  ERROR: sin respuesta tras {REINTENTOS} intentos  url={url[:80]}")
+            return None
+
+        async def fetch(n_code, offset, cat_nombre):
+            data = await get_json_async(_url_pagina(n_code, offset), cat_nombre,
+                                        (posicion[n_code], offset))
+            _, _, productos, total = _leer_pagina(data, n_code, offset, cat_nombre)
+            restantes = _offsets_restantes(len(productos), total, nrpp) \
+                if offset == 0 and productos else ()
+            _entregar(paginas, conteo, n_code, offset, productos, salida, restantes)
+            return productos, total, restantes
+
+        async def scrape_cat(cat):
+            n_code, cat_nombre = cat["n"], cat["nombre"]
+            productos, total, restantes = await fetch(n_code, 0, cat_nombre)
+            log.info(f"-> {cat_nombre} (N-{n_code}) | {len(productos)}/{total}")
+            if not productos:
+                return
+            totales[n_code] = total
+            await asyncio.gather(*(fetch(n_code, off, cat_nombre) for off in restantes))
+            log.info(f"  {cat_nombre} | {conteo[n_code]}/{total}")
+
+        await asyncio.gather(*(scrape_cat(c) for c in categorias))
+
+    if salida is not None:
+        return {} if agrupar else []
+    return _acumular(categorias, paginas, totales, agrupar)
 
 
 def scrape_categoria(n_code, cat_nombre):
     """Scrapea todas las páginas de una categoría usando N-code Endeca."""
-    log.info(f"-> {cat_nombre} (N-{n_code})")
+    return scrape_categorias([{"n": n_code, "nombre": cat_nombre}])
 
-    # ── Página 0: obtener total ───────────────────────────────────────────────
-    _, _, records_p0, total = _fetch_page((n_code, 0, cat_nombre))
-    if not records_p0:
-        return []
 
-    todos = [extraer_producto(r, cat_nombre) for r in records_p0]
-    log.info(f"  offset 0 | {len(todos)}/{total}")
+def deduplicar(productos):
+    """Deduplica por PLU conservando la primera aparición."""
+    vistos = set()
+    unicos = []
+    for p in productos:
+        if p.plu not in vistos:
+            vistos.add(p.plu)
+            unicos.append(p)
+    return unicos
 
-    if total <= NRPP:
-        return todos
 
-    # ── Páginas restantes en paralelo ─────────────────────────────────────────
-    offsets = list(range(NRPP, total, NRPP))
-    page_args = [(n_code, off, cat_nombre) for off in offsets]
+def _abrir_salida(ruta: Path, modo: str, compresion: str, **kw):
+    """open() según la compresión: "" → archivo plano, "gz" → gzip, "zst" → zstandard."""
+    if compresion == "gz":
+        return gzip.open(ruta, modo, compresslevel=6, **kw)
+    if compresion == "zst":
+        if zstandard is None:
+            raise RuntimeError("COTO_COMPRESION=zst requiere el paquete zstandard")
+        return zstandard.open(ruta, modo, **kw)
+    if compresion:
+        raise ValueError(f"compresión desconocida: {compresion!r} (usar '', 'gz' o 'zst')")
+    return open(ruta, modo, **kw)
 
-    # Guardar resultados indexados por offset para mantener orden
-    paginas = {}
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
-        futures = {ex.submit(_fetch_page, args): args[1] for args in page_args}
-        for future in as_completed(futures):
-            _, offset, records, _ = future.result()
-            paginas[offset] = records
-            log.info(f"  offset {offset} | {len(todos) + sum(len(v) for v in paginas.values())}/{total}")
 
-    # Agregar en orden de offset
-    for off in offsets:
-        for rec in paginas.get(off, []):
-            todos.append(extraer_producto(rec, cat_nombre))
+if orjson:
+    def _linea_json(d):
+        return orjson.dumps(d) + b"\n"
+else:
+    def _linea_json(d):
+        return (json.dumps(d, ensure_ascii=False) + "\n").encode("utf-8")
 
-    return todos
 
+def _esquema_parquet():
+    """
+    Tipos del snapshot Parquet: plu/ean como string (nunca int), precios
+    float64 y los campos de pocos valores distintos como diccionario.
+    """
+    dic = pa.dictionary(pa.int32(), pa.string())
+    tipos = {
+        "supermercado": dic, "marca": dic, "categoria": dic,
+        "unidad_label": dic, "unidad": dic, "promo_texto": dic, "fecha": dic,
+        "precio_actual": pa.float64(), "precio_regular": pa.float64(),
+        "precio_sin_imp": pa.float64(), "precio_x_unidad": pa.float64(),
+        "es_pesable": pa.bool_(),
+    }
+    return pa.schema([(c, tipos.get(c, pa.string())) for c in CAMPOS])
 
-CAMPOS = [
-    "supermercado", "plu", "ean", "nombre", "marca", "categoria",
-    "precio_actual", "precio_regular", "precio_sin_imp",
-    "precio_x_unidad", "unidad_label", "unidad", "es_pesable",
-    "promo_texto", "promo_regular", "imagen", "url", "fecha",
-]
 
+def _a_float(v):
+    try:
+        return float(v) if v not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _lote_parquet(filas, esquema):
+    """RecordBatch a partir de una lista de tuplas en orden de CAMPOS."""
+    columnas = list(zip(*filas)) or [()] * len(CAMPOS)
+    arrays = []
+    for campo, col in zip(esquema, columnas):
+        if pa.types.is_dictionary(campo.type):
+            arrays.append(pa.array(col, pa.string()).dictionary_encode())
+        elif pa.types.is_floating(campo.type):
+            arrays.append(pa.array([_a_float(v) for v in col], campo.type))
+        else:
+            arrays.append(pa.array(col, campo.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=esquema)
 
-def guardar(todos, output_dir: Path, nombre_archivo: str):
-    output_dir.mkdir(exist_ok=True)
-    ts = datetime.now().strftime("%Y%m%d_%H%M")
-    ruta_csv  = output_dir / f"{nombre_archivo}_{ts}.csv"
-    ruta_json = output_dir / f"{nombre_archivo}_{ts}.json"
 
-    with open(ruta_csv, "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.DictWriter(f, fieldnames=CAMPOS)
-        writer.writeheader()
-        writer.writerows(todos)
+class SalidaCatalogo:
+    """
+    Escritura incremental del catálogo: agregar() recibe lotes de productos
+    (una página, por ejemplo) mientras el crawl sigue y los vuelca a
+    <nombre>_<ts>.csv y <nombre>_<ts>.json (array, mismo formato que el
+    json.dump de siempre), con compresión opcional (COTO_COMPRESION o el
+    parámetro `compresion`). Con `ndjson` (default NDJSON) el JSON sale como
+    <nombre>_<ts>.jsonl, un producto por línea. Con `parquet` (default
+    PARQUET) escribe además <nombre>_<ts>.parquet, un row group cada
+    LOTE_PARQUET filas.
+
+    Las páginas se escriben en el orden de su posición (categoría, offset),
+    no en el de llegada: scrape_categorias declara con esperar() qué páginas
+    vienen y cada una se escribe en cuanto llegaron todas las anteriores;
+    mientras tanto queda en memoria. Así la escritura sigue pisando la espera
+    de red y con `deduplicar` queda la primera aparición de cada PLU en orden
+    de categorías, igual que al acumular, sin importar el orden de llegada.
+    Un lote sin posición, o con una ya escrita, se escribe en el momento.
+
+    Los archivos se escriben como .tmp y se renombran recién en cerrar():
+    una corrida cortada no deja un CSV a medias con el nombre definitivo.
+
+        with SalidaCatalogo(OUTPUT_DIR, "coto_bebidas") as salida:
+            scrape_categorias(CATEGORIAS, salida=salida)
+        ruta = salida.ruta_csv
+    """
+
+    def __init__(self, output_dir: Path, nombre_archivo: str, compresion=None, deduplicar=True,
+                 parquet=None, ndjson=None):
+        self.compresion = COMPRESION if compresion is None else compresion
+        self.ndjson = NDJSON if ndjson is None else ndjson
+        ext = f".{self.compresion}" if self.compresion else ""
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        ts = datetime.now().strftime("%Y%m%d_%H%M")
+        self.ruta_csv  = output_dir / f"{nombre_archivo}_{ts}.csv{ext}"
+        self.ruta_json = output_dir / f"{nombre_archivo}_{ts}.{'jsonl' if self.ndjson else 'json'}{ext}"
+        self.ruta_parquet = output_dir / f"{nombre_archivo}_{ts}.parquet" if (
+            PARQUET if parquet is None else parquet) else None
+        rutas = [r for r in (self.ruta_csv, self.ruta_json, self.ruta_parquet) if r]
+        self._tmp = {r: r.with_name(r.name + ".tmp") for r in rutas}
+
+        self._f_csv  = _abrir_salida(self._tmp[self.ruta_csv], "wt", self.compresion,
+                                     newline="", encoding="utf-8-sig")
+        self._f_json = _abrir_salida(self._tmp[self.ruta_json], "wb", self.compresion)
+        self._csv = csv.writer(self._f_csv)
+        self._csv.writerow(CAMPOS)
+        self._lote = []
+        self._parquet = None
+        if self.ruta_parquet:
+            if pa is None:
+                raise RuntimeError("la salida Parquet requiere pyarrow")
+            self._esquema = _esquema_parquet()
+            self._parquet = pq.ParquetWriter(self._tmp[self.ruta_parquet], self._esquema,
+                                             compression="zstd")
+        self._vistos = set() if deduplicar else None
+        self._cola = []           # heap de posiciones declaradas y todavía no escritas
+        self._esperadas = set()
+        self._pendientes = {}     # posición → filas llegadas antes que las anteriores
+        self._ultima = None       # última posición escrita
+        self.n_productos = 0
+        self.n_duplicados = 0
+
+    def esperar(self, ordenes):
+        """Declara posiciones de páginas por venir (se ignoran las ya escritas)."""
+        for orden in ordenes:
+            if orden not in self._esperadas and (self._ultima is None or orden > self._ultima):
+                self._esperadas.add(orden)
+                heapq.heappush(self._cola, orden)
+
+    def agregar(self, productos, orden=None, siguientes=()):
+        """
+        Agrega el lote de la posición `orden` y declara `siguientes` (p. ej.
+        los offsets que faltan, al llegar la página 0 de una categoría).
+        """
+        self.esperar(siguientes)
+        filas = [p.a_tupla() for p in productos]
+        if orden is None or (self._ultima is not None and orden <= self._ultima):
+            self._escribir(filas)
+            return
+        self.esperar((orden,))
+        self._pendientes.setdefault(orden, []).extend(filas)
+        while self._cola and self._cola[0] in self._pendientes:
+            orden = heapq.heappop(self._cola)
+            self._esperadas.discard(orden)
+            self._ultima = orden
+            self._escribir(self._pendientes.pop(orden))
+
+    def _escribir(self, filas):
+        if self._vistos is not None:
+            i_plu = CAMPOS.index("plu")
+            nuevas = []
+            for fila in filas:
+                if fila[i_plu] in self._vistos:
+                    self.n_duplicados += 1
+                    continue
+                self._vistos.add(fila[i_plu])
+                nuevas.append(fila)
+            filas = nuevas
+        self._csv.writerows(filas)
+        if self.ndjson:
+            self._f_json.write(b"".join(_linea_json(dict(zip(CAMPOS, f))) for f in filas))
+        elif filas:
+            # Items de un array con indent=2: cada uno indentado 2 más, separados por ",\n"
+            items = (json.dumps(dict(zip(CAMPOS, f)), ensure_ascii=False, indent=2)
+                     .replace("\n", "\n  ") for f in filas)
+            self._f_json.write(((",\n  " if self.n_productos else "[\n  ")
+                                + ",\n  ".join(items)).encode("utf-8"))
+        self.n_productos += len(filas)
+        if self._parquet is not None:
+            self._lote.extend(filas)
+            if len(self._lote) >= LOTE_PARQUET:
+                self._volcar_lote()
+
+    def _volcar_lote(self):
+        self._parquet.write_batch(_lote_parquet(self._lote, self._esquema))
+        self._lote = []
+
+    def _cerrar_archivos(self):
+        self._f_csv.close()
+        self._f_json.close()
+        if self._parquet is not None:
+            self._parquet.close()
+
+    def cerrar(self):
+        """Cierra y publica los archivos con su nombre definitivo. Devuelve la ruta del CSV."""
+        # Páginas que esperaban a otras que nunca llegaron
+        for orden in sorted(self._pendientes):
+            self._escribir(self._pendientes.pop(orden))
+        if not self.ndjson:
+            self._f_json.write(b"\n]" if self.n_productos else b"[]")
+        if self._lote or (self._parquet is not None and self.n_productos == 0):
+            self._volcar_lote()
+        self._cerrar_archivos()
+        for ruta, tmp in self._tmp.items():
+            os.replace(tmp, ruta)
+        log.info(f"OK CSV  -> {self.ruta_csv}  ({self.n_productos} prods"
+                 + (f", {self.n_duplicados} duplicados descartados)" if self.n_duplicados else ")"))
+        log.info(f"OK JSON -> {self.ruta_json}")
+        if self.ruta_parquet:
+            log.info(f"OK PARQUET -> {self.ruta_parquet}")
+        return self.ruta_csv
+
+    def abortar(self):
+        """Cierra y borra los temporales sin publicar nada."""
+        self._cerrar_archivos()
+        for tmp in self._tmp.values():
+            tmp.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *_):
+        if tipo is None:
+            self.cerrar()
+        else:
+            self.abortar()
+        return False
 
-    with open(ruta_json, "w", encoding="utf-8") as f:
-        json.dump(todos, f, ensure_ascii=False, indent=2)
 
-    log.info(f"OK CSV  -> {ruta_csv}  ({len(todos)} prods)")
-    log.info(f"OK JSON -> {ruta_json}")
-    return ruta_csv
+def guardar(todos, output_dir: Path, nombre_archivo: str, compresion=None, parquet=None,
+            ndjson=None):
+    """Escribe una lista ya armada de productos (CSV + JSON + Parquet) vía SalidaCatalogo."""
+    with SalidaCatalogo(output_dir, nombre_archivo, compresion, deduplicar=False,
+                        parquet=parquet, ndjson=ndjson) as salida:
+        salida.agregar(todos)
+    return salida.ruta_csv
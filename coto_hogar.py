@@ -6,9 +6,8 @@ Uso: python coto_hogar.py
 """
 import sys
 sys.path.insert(0, str(__import__('pathlib').Path(__file__).parent))
-from coto_base import scrape_categoria, guardar, log, MAX_WORKERS
+from coto_base import scrape_categorias, SalidaCatalogo, log, log_stats_conexiones
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
 
 CATEGORIAS = [
     # ── LIMPIEZA ──────────────────────────────────────────────────────────────
@@ -34,24 +33,9 @@ CATEGORIAS = [
 OUTPUT_DIR = Path("output_hogar")
 
 if __name__ == "__main__":
-    resultados = {}
+    # Escritura incremental, deduplicando por PLU
+    with SalidaCatalogo(OUTPUT_DIR, "coto_hogar") as salida:
+        scrape_categorias(CATEGORIAS, salida=salida)
 
-    def scrape_cat(cat):
-        prods = scrape_categoria(cat["n"], cat["nombre"])
-        return cat["n"], prods
-
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
-        for n_code, prods in ex.map(scrape_cat, CATEGORIAS):
-            resultados[n_code] = prods
-
-    todos = []
-    for cat in CATEGORIAS:
-        todos.extend(resultados[cat["n"]])
-        log.info(f"  acumulado: {len(todos)}")
-
-    # Deduplicar por PLU
-    vistos = set()
-    unicos = [p for p in todos if p["plu"] not in vistos and not vistos.add(p["plu"])]
-
-    log.info(f"\nTotal hogar: {len(unicos)} productos únicos")
-    guardar(unicos, OUTPUT_DIR, "coto_hogar")
+    log.info(f"\nTotal hogar: {salida.n_productos} productos únicos")
+    log_stats_conexiones()
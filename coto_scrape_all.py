@@ -0,0 +1,77 @@
+"""
+Coto Digital — Scraper COMPLETO (bebidas + alimentos + hogar)
+Un solo proceso y un solo crawl: las CATEGORIAS de las tres familias
+entran juntas al scheduler de coto_base y el resultado, deduplicado por
+PLU entre las tres familias, pasa en memoria a analizar_precios.
+
+Sigue escribiendo los archivos por familia en outputs/output_<familia>/
+(mismos nombres y mismo contenido que los scrapers individuales, cada uno
+deduplicado sólo dentro de su familia) por compatibilidad.
+
+Uso: python coto_scrape_all.py [--sin-analisis]
+"""
+import sys
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPT_DIR))
+from coto_base import scrape_categorias, guardar, log, log_stats_conexiones, CAMPOS
+import coto_bebidas
+import coto_alimentos
+import coto_hogar
+
+# Mismo orden que corría el workflow: define quién "gana" un PLU repetido en el análisis
+FAMILIAS = [
+    ("bebidas",   coto_bebidas.CATEGORIAS),
+    ("alimentos", coto_alimentos.CATEGORIAS_SCRAPE),
+    ("hogar",     coto_hogar.CATEGORIAS),
+]
+
+DIR_OUTPUTS = SCRIPT_DIR / "outputs"
+
+
+def scrape_todo():
+    """
+    Crawlea las tres familias en un solo pool. Devuelve (unicos, por_familia):
+    {familia: [productos]} deduplicado por PLU dentro de cada familia (como
+    los scrapers individuales) y la lista global deduplicada entre todas,
+    donde cada PLU queda con la primera familia en que apareció.
+    """
+    categorias = [cat for _, cats in FAMILIAS for cat in cats]
+    por_cat = scrape_categorias(categorias, agrupar=True)
+
+    vistos = set()
+    unicos = []
+    por_familia = {}
+    total = 0
+    for familia, cats in FAMILIAS:
+        prods_familia = por_familia.setdefault(familia, [])
+        vistos_familia = set()
+        for cat in cats:
+            for p in por_cat.get(cat["n"], []):
+                total += 1
+                if p.plu in vistos_familia:
+                    continue
+                vistos_familia.add(p.plu)
+                prods_familia.append(p)
+                if p.plu not in vistos:
+                    vistos.add(p.plu)
+                    unicos.append(p)
+        log.info(f"  {familia}: {len(prods_familia)} productos únicos")
+
+    log.info(f"\nTotal: {len(unicos)} productos únicos ({total} con duplicados)")
+    return unicos, por_familia
+
+
+if __name__ == "__main__":
+    unicos, por_familia = scrape_todo()
+
+    for familia, prods in por_familia.items():
+        guardar(prods, DIR_OUTPUTS / f"output_{familia}", f"coto_{familia}")
+    log_stats_conexiones()
+
+    if "--sin-analisis" not in sys.argv:
+        import pandas as pd
+        import analizar_precios
+        analizar_precios.main(df_raw=pd.DataFrame.from_records(
+            [p.a_tupla() for p in unicos], columns=CAMPOS))
@@ -8,90 +8,70 @@ Cambios:
 - Graficos en % (base 100 = primer punto = 0%)
 - Categorias principales solamente (no subcategorias)
 - Tabla de variacion por categoria principal
+- Series largas reducidas a submuestreo.PUNTOS_POR_SERIE puntos (por si
+  graficos.json viene de una corrida sin reducir)
+- Series y rankings en archivos aparte (docs/datos/), uno por período ×
+  categoría y uno por ranking, listados en docs/datos/manifiesto.json. El
+  HTML sólo trae el resumen y el manifiesto; la página baja 7d al cargar y
+  el resto cuando se elige otro período, categoría o ranking.
+  Con WEB_COMPRESION=gz,br se dejan además copias .gz / .br de cada
+  archivo (br requiere el paquete brotli) para servidores que las sirvan
+  precomprimidas (gzip_static / brotli_static); la página pide el .json.
+- Buscador de productos: el índice de búsqueda partido por las primeras
+  letras de cada palabra en docs/datos/buscador/<letras>.<hash>.json
+  (listados en el manifiesto) y la historia de precios de cada producto en
+  docs/datos/productos/<N>.<hash>.json, repartidos por hash del PLU. Una
+  búsqueda baja sólo el fragmento de una de sus palabras; ver un producto,
+  el fragmento de su PLU y su archivo (unos KB cada uno).
+  Sale de una sola pasada por data/historial/ (historial.recorrer).
+- Los archivos de docs/datos/ llevan el hash del contenido en el nombre
+  (se pueden cachear sin vencimiento; el manifiesto e index.html no).
+  Si data/*.json, el histórico, el código y la fecha son los de la
+  corrida anterior no se regenera nada (docs/.cache_build.json).
 """
 
+import gzip
+import hashlib
 import json
+import os
+import re
+import unicodedata
+import zlib
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import cache_build
+import historial
+from categorias import ORDEN_CATS, a_principal
+from submuestreo import reducir
+
+try:
+    import brotli   # copias .br de los archivos de datos (opcional)
+except ImportError:
+    brotli = None
 
 DIR_DATA = Path("data")
 DIR_DOCS = Path("docs")
+DIR_DATOS_WEB = DIR_DOCS / "datos"
+# Huella de la última generación (ver cache_build.py)
+CACHE_BUILD   = DIR_DOCS / ".cache_build.json"
 
-# Mapeo de subcategoria → categoria principal
-# Cualquier categoria que no esté acá se muestra tal cual
-CATEGORIA_PRINCIPAL = {
-    # ALIMENTOS
-    "Golosinas":                  "Almacén",
-    "Panadería":                  "Almacén",
-    "Snacks":                     "Almacén",
-    "Cereales":                   "Almacén",
-    "Endulzantes":                "Almacén",
-    "Aderezos Y Salsas":          "Almacén",
-    "Infusiones":                 "Almacén",
-    "Conservas":                  "Almacén",
-    "Harinas":                    "Almacén",
-    "Encurtidos":                 "Almacén",
-    "Mermeladas Y Dulces":        "Almacén",
-    "Salsas Y Puré De Tomate":   "Almacén",
-    "Aceites Y Condimentos":      "Almacén",
-    "Alimento Bebés Y Niños":     "Almacén",
-    "Arroz Y Legumbres":          "Almacén",
-    "Especias":                   "Almacén",
-    "Pasta Seca Y Rellenas":      "Almacén",
-    "Repostería":                 "Almacén",
-    "Sopas Y Saborizantes":       "Almacén",
-    "Rebozador Y Pan Rallado":    "Almacén",
-    "Leche En Polvo":             "Almacén",
-    "Suplementos Dietarios":      "Almacén",
-    # FRESCOS
-    "Lácteos":                    "Frescos",
-    "Fiambres":                   "Frescos",
-    "Quesos":                     "Frescos",
-    "Carnicería":                 "Frescos",
-    "Aves":                       "Frescos",
-    "Pastas Frescas Y Tapas":     "Frescos",
-    "Comidas Elaboradas":         "Frescos",
-    "Frutas Y Verduras":          "Frescos",
-    "Pescadería":                 "Frescos",
-    "Huevos":                     "Frescos",
-    # CONGELADOS
-    "Pescadería Congelada":       "Congelados",
-    "Nuggets Y Bocaditos":        "Congelados",
-    "Hamburguesas Y Milanesas":   "Congelados",
-    "Papas Congeladas":           "Congelados",
-    "Helados Y Postres":          "Congelados",
-    "Comidas Congeladas":         "Congelados",
-    "Vegetales Congelados":       "Congelados",
-    "Frutas Congeladas":          "Congelados",
-    # BEBIDAS
-    "Bebidas Con Alcohol":        "Bebidas Con Alcohol",
-    "Bebidas Sin Alcohol":        "Bebidas Sin Alcohol",
-    # LIMPIEZA
-    "Lavado":                     "Limpieza",
-    "Accesorios De Limpieza":     "Limpieza",
-    "Desodorantes De Ambiente":   "Limpieza",
-    "Limpieza De Baño":           "Limpieza",
-    "Limpieza De Cocina":         "Limpieza",
-    "Limpieza De Pisos Y Superficies": "Limpieza",
-    "Lavandinas":                 "Limpieza",
-    # PERFUMERIA / CUIDADO PERSONAL
-    "Cuidado Del Cabello":        "Cuidado Personal",
-    "Higiene Personal":           "Cuidado Personal",
-    "Desodorantes Y Antitranspirantes": "Cuidado Personal",
-    "Pañales E Incontinencia":    "Cuidado Personal",
-    "Cuidado Personal":           "Cuidado Personal",
-    "Cuidado Bucal":              "Cuidado Personal",
-    "Protección Femenina":        "Cuidado Personal",
-    "Cuidado De La Piel":         "Cuidado Personal",
-    "Accesorios Perfumería":      "Cuidado Personal",
-}
-
-# Orden de display de categorías principales
-ORDEN_CATS = [
-    "Almacén", "Frescos", "Congelados",
-    "Bebidas Con Alcohol", "Bebidas Sin Alcohol",
-    "Limpieza", "Cuidado Personal",
-]
+# Entradas de la página: los JSON de analizar_precios y el código que los arma
+ENTRADAS = ["resumen.json", "graficos.json", "ranking_dia.json", "ranking_mes.json", "ranking_anio.json"]
+CODIGO   = [Path(__file__).with_name(m) for m in (
+    "generar_web.py", "historial.py", "categorias.py", "submuestreo.py")]
+
+# Copias precomprimidas de cada archivo de datos: "" (ninguna), "gz", "br" o "gz,br"
+COMPRESION = [c for c in os.getenv("WEB_COMPRESION", "").split(",") if c]
+
+# Historia por producto: archivos por hash del PLU y días hacia atrás (None = todo)
+ARCHIVOS_PRODUCTOS = 256
+DIAS_PRODUCTOS     = 365
+# Índice de búsqueda: un fragmento por inicial; las que reúnen más productos
+# que esto se parten por las dos primeras letras
+FILAS_POR_FRAGMENTO = 1000
 
 
 def leer_json(nombre):
@@ -102,16 +82,6 @@ def leer_json(nombre):
     return None
 
 
-def a_principal(cat):
-    """Devuelve la categoría principal para una subcategoría (busca en cada segmento de la ruta)."""
-    cat = str(cat).strip()
-    for segmento in cat.split('>'):
-        segmento = segmento.strip()
-        if segmento in CATEGORIA_PRINCIPAL:
-            return CATEGORIA_PRINCIPAL[segmento]
-    return cat
-
-
 def agrupar_graficos_por_principal(graficos):
     """
     El nuevo analizar_precios.py ya genera graficos.json con:
@@ -211,9 +181,234 @@ def agrupar_cats_dia(cats_dia):
     return resultado
 
 
+# ── ARCHIVOS DE DATOS (docs/datos/) ──────────────────────────────────────────
+def _slug(texto):
+    """'Bebidas Con Alcohol' → 'bebidas-con-alcohol' (sin acentos, apto para URL)."""
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "-", texto.lower()).strip("-") or "x"
+
+
+def _escribir_dato(nombre, datos, con_hash=True):
+    """
+    Escribe docs/datos/<nombre> (JSON compacto) y sus copias comprimidas;
+    devuelve la ruta relativa a docs/. Con con_hash el nombre lleva el hash
+    del contenido (graficos_7d_total.<hash>.json): el navegador lo puede
+    cachear para siempre y, si ya existe, no se vuelve a escribir.
+    """
+    contenido = json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if con_hash:
+        base, _, ext = nombre.rpartition(".")
+        nombre = f"{base}.{hashlib.sha256(contenido).hexdigest()[:10]}.{ext}"
+    ruta = DIR_DATOS_WEB / nombre
+    if not (con_hash and ruta.exists()):
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        ruta.write_bytes(contenido)
+    for c in COMPRESION:
+        copia = Path(f"{ruta}.{c}")
+        if con_hash and copia.exists():
+            continue
+        if c == "gz":
+            copia.write_bytes(gzip.compress(contenido, 9, mtime=0))
+        elif c == "br":
+            if brotli is None:
+                raise RuntimeError("WEB_COMPRESION=br requiere el paquete brotli")
+            copia.write_bytes(brotli.compress(contenido))
+        else:
+            raise ValueError(f"compresión desconocida: {c!r} (usar 'gz' y/o 'br')")
+    return ruta.relative_to(DIR_DOCS).as_posix()
+
+
+def _borrar_viejos(directorio, vigentes):
+    """Borra de `directorio` los archivos que no están en `vigentes` (rutas relativas a docs/) ni son sus copias comprimidas."""
+    if not directorio.exists():
+        return
+    nombres = {Path(r).name for r in vigentes}
+    nombres |= {f"{n}.{c}" for n in nombres for c in COMPRESION}
+    for ruta in directorio.iterdir():
+        if ruta.is_file() and ruta.name not in nombres:
+            ruta.unlink()
+
+
+def escribir_datos_web(graficos_agrupados, rankings):
+    """
+    Parte los gráficos y rankings en archivos chicos en docs/datos/ y
+    devuelve el manifiesto {periodos: {p: {total, categorias: {cat: ruta}}},
+    rankings: {nombre: ruta}, productos: {indice: {letras: ruta}, rutas: ruta}},
+    que también queda en docs/datos/manifiesto.json.
+    Borra los archivos de una generación anterior que ya no figuran.
+    """
+    DIR_DATOS_WEB.mkdir(parents=True, exist_ok=True)
+    manifiesto = {"periodos": {}, "rankings": {}}
+    for periodo, datos in graficos_agrupados.items():
+        p = _slug(periodo)
+        manifiesto["periodos"][periodo] = {
+            "total": _escribir_dato(f"graficos_{p}_total.json", reducir(datos["total"])),
+            "categorias": {cat: _escribir_dato(f"graficos_{p}_{_slug(cat)}.json", reducir(serie))
+                           for cat, serie in datos["categorias"].items()},
+        }
+    for nombre, filas in rankings.items():
+        manifiesto["rankings"][nombre] = _escribir_dato(f"ranking_{nombre}.json", filas)
+    manifiesto["productos"] = escribir_productos_web()
+    _borrar_viejos(DIR_DATOS_WEB, [*_rutas(manifiesto), _escribir_dato("manifiesto.json", manifiesto, con_hash=False)])
+    return manifiesto
+
+
+def _archivo_producto(plu):
+    """Archivo de docs/datos/productos/ de un PLU (hash estable, no el hash() de Python)."""
+    return zlib.crc32(str(plu).encode()) % ARCHIVOS_PRODUCTOS
+
+
+def _palabras(texto):
+    """Palabras normalizadas (minúsculas, sin acentos) para el índice de búsqueda."""
+    return [p for p in _slug(texto).split("-") if len(p) > 1]
+
+
+def _cambios_de_precio(desde):
+    """
+    Una pasada por las particiones del histórico (de a una) quedándose sólo
+    con los cambios de precio_regular de cada producto. Devuelve
+    (plu_id, fecha, precio en centavos) de cada cambio —el primer precio
+    visto cuenta como cambio— y {plu_id: última fecha vista}.
+    """
+    n_ids = int(historial.leer_dimension()["plu_id"].max()) + 1
+    ultimo = np.full(n_ids, -1, dtype=np.int64)
+    visto = np.zeros(n_ids, dtype=np.int32)
+    ids, fechas, precios = [], [], []
+    for fecha, df in historial.recorrer(desde=desde, columnas=["plu_id", "precio_regular"]):
+        precio = df["precio_regular"].to_numpy(dtype=float, na_value=np.nan)
+        ok = ~np.isnan(precio)
+        plu_id = df["plu_id"].to_numpy(np.int64)[ok]
+        precio = np.round(precio[ok]).astype(np.int64)
+        cambio = ultimo[plu_id] != precio
+        ids.append(plu_id[cambio])
+        precios.append(precio[cambio])
+        fechas.append(np.full(int(cambio.sum()), int(fecha), dtype=np.int32))
+        ultimo[plu_id] = precio
+        visto[plu_id] = int(fecha)
+    if not ids:
+        return np.array([], np.int64), np.array([], np.int32), np.array([], np.int64), visto
+    return np.concatenate(ids), np.concatenate(fechas), np.concatenate(precios), visto
+
+
+def escribir_productos_web():
+    """
+    Buscador de productos: índice fragmentado + historia de precios por producto.
+
+    docs/datos/buscador/<letras>.<hash>.json, un fragmento por inicial (o por
+    dos letras si la inicial reúne más de FILAS_POR_FRAGMENTO productos):
+      plu, nombre, marca, archivo → productos con alguna palabra del
+                        fragmento (columnas paralelas, orden por nombre);
+                        archivo = N del archivo con su historia
+      palabras, filas → palabras normalizadas de nombre/marca/PLU ordenadas
+                        (búsqueda por prefijo con bisección) y las filas de
+                        cada una, en diferencias (1ª fila, salto, salto...)
+    docs/datos/productos_rutas.<hash>.json: ruta (con hash) del archivo N
+    docs/datos/productos/<N>.<hash>.json: {plu: {"c": [[fecha, precio], ...], "h": fecha}}
+      c → cambios de precio regular (fecha int YYYYMMDD, precio en pesos);
+          entre cambios el precio se mantiene
+      h → último día en que se vio el producto
+
+    Devuelve {"indice": {letras: ruta}, "rutas": ruta} (rutas relativas a
+    docs/) para el manifiesto; None si no hay histórico.
+    """
+    if not historial.fechas():
+        return None
+    desde = None
+    if DIAS_PRODUCTOS:
+        desde = (datetime.now() - timedelta(days=DIAS_PRODUCTOS)).strftime("%Y%m%d")
+        desde = historial.fecha_en_o_antes(desde) or desde
+    plu_id, fecha, precio, visto = _cambios_de_precio(desde)
+
+    # Atributos: la versión más reciente de cada producto visto en el período
+    dim = historial.leer_dimension().groupby("plu_id", sort=False).tail(1)
+    dim = dim[visto[dim["plu_id"].to_numpy()] > 0]
+    dim = dim.sort_values(["nombre", "plu"], kind="stable").reset_index(drop=True)
+    plu_de = dict(zip(dim["plu_id"], dim["plu"]))
+
+    # Historia: cambios agrupados por producto y repartidos por archivo
+    orden = np.lexsort((fecha, plu_id))
+    plu_id, fecha, precio = plu_id[orden], fecha[orden], precio[orden]
+    cortes = np.flatnonzero(np.diff(plu_id)) + 1
+    por_archivo = {}
+    for ini, fin in zip(np.r_[0, cortes], np.r_[cortes, len(plu_id)]):
+        if ini == fin or plu_id[ini] not in plu_de:
+            continue
+        plu = plu_de[plu_id[ini]]
+        por_archivo.setdefault(_archivo_producto(plu), {})[plu] = {
+            "c": [[int(f), int(p) / 100] for f, p in zip(fecha[ini:fin], precio[ini:fin])],
+            "h": int(visto[plu_id[ini]]),
+        }
+    rutas = {n: _escribir_dato(f"productos/{n}.json", productos) for n, productos in por_archivo.items()}
+    _borrar_viejos(DIR_DATOS_WEB / "productos", rutas.values())
+
+    # Índice de búsqueda, partido por las primeras letras de cada palabra
+    filas_por_palabra = {}
+    for fila, (plu, nombre, marca) in enumerate(zip(dim["plu"], dim["nombre"], dim["marca"])):
+        for palabra in {str(plu), *_palabras(nombre), *_palabras(marca)}:
+            filas_por_palabra.setdefault(palabra, []).append(fila)
+    columnas = {
+        "plu":     np.array(dim["plu"].tolist(), dtype=object),
+        "nombre":  np.array(dim["nombre"].fillna("").astype(str).tolist(), dtype=object),
+        "marca":   np.array(dim["marca"].fillna("").astype(str).tolist(), dtype=object),
+        "archivo": np.array([_archivo_producto(p) for p in dim["plu"]]),
+    }
+    indice = {letras: _escribir_dato(f"buscador/{letras}.json",
+                                     _fragmento_indice(palabras, filas_por_palabra, columnas))
+              for letras, palabras in _fragmentos(filas_por_palabra).items()}
+    _borrar_viejos(DIR_DATOS_WEB / "buscador", indice.values())
+    return {
+        "indice": indice,
+        "rutas":  _escribir_dato("productos_rutas.json", [rutas.get(n) for n in range(ARCHIVOS_PRODUCTOS)]),
+    }
+
+
+def _fragmentos(filas_por_palabra):
+    """{letras: [palabras]}: por inicial, o por dos letras si la inicial tiene muchos productos."""
+    por_inicial = {}
+    for palabra in sorted(filas_por_palabra):
+        por_inicial.setdefault(palabra[0], []).append(palabra)
+    fragmentos = {}
+    for inicial, palabras in por_inicial.items():
+        filas = set().union(*(filas_por_palabra[p] for p in palabras))
+        if len(filas) <= FILAS_POR_FRAGMENTO:
+            fragmentos[inicial] = palabras
+        else:
+            for p in palabras:
+                fragmentos.setdefault(p[:2], []).append(p)
+    return fragmentos
+
+
+def _fragmento_indice(palabras, filas_por_palabra, columnas):
+    """Fragmento del buscador: los productos de `palabras` y sus filas renumeradas."""
+    filas = np.unique(np.concatenate([filas_por_palabra[p] for p in palabras]))
+    return {
+        **{c: valores[filas].tolist() for c, valores in columnas.items()},
+        "palabras": palabras,
+        "filas":    [np.diff(np.searchsorted(filas, filas_por_palabra[p]), prepend=0).tolist()
+                     for p in palabras],
+    }
+
+
+def _rutas(manifiesto):
+    for p in manifiesto["periodos"].values():
+        yield p["total"]
+        yield from p["categorias"].values()
+    yield from manifiesto["rankings"].values()
+    if manifiesto.get("productos"):
+        yield manifiesto["productos"]["rutas"]
+
+
 def main():
     DIR_DOCS.mkdir(exist_ok=True)
 
+    # La ventana de DIAS_PRODUCTOS se cuenta desde hoy: la fecha es parte de la huella
+    clave = cache_build.huella(
+        [*(DIR_DATA / e for e in ENTRADAS), *historial.archivos(), *CODIGO],
+        extra=(datetime.now().strftime("%Y%m%d"), COMPRESION))
+    if cache_build.al_dia(CACHE_BUILD, "web", clave):
+        print(f"✅ Sin cambios desde la última generación: {DIR_DOCS / 'index.html'} queda como está")
+        return
+
     resumen   = leer_json("resumen.json") or {}
     graficos  = leer_json("graficos.json") or {}
     rank_dia  = leer_json("ranking_dia.json") or []
@@ -247,11 +442,14 @@ def main():
         if v < 0: return "#22c55e"
         return "#888"
 
-    # Serializar datos para JS
-    graficos_js  = json.dumps(graficos_agrupados, ensure_ascii=False)
-    rank_dia_js  = json.dumps(rank_dia[:20], ensure_ascii=False)
-    rank_mes_js  = json.dumps(rank_mes[:20], ensure_ascii=False)
-    rank_anio_js = json.dumps(rank_anio[:20], ensure_ascii=False)
+    # Series y rankings van a docs/datos/; al HTML sólo el manifiesto
+    manifiesto = escribir_datos_web(graficos_agrupados, {
+        "dia":      rank_dia[:20],
+        "mes":      rank_mes[:20],
+        "anio":     rank_anio[:20],
+        "baja_dia": resumen.get("ranking_baja_dia", [])[:10],
+    })
+    manifiesto_js = json.dumps(manifiesto, ensure_ascii=False)
 
     # Generar filas de categorias (ya agrupadas)
     filas_cats = ""
@@ -389,6 +587,28 @@ def main():
   .grid2 {{ display: grid; grid-template-columns: 1fr 1fr; gap: 1.5rem; }}
   @media (max-width: 700px) {{ .grid2 {{ grid-template-columns: 1fr; }} }}
 
+  .buscador {{
+    width: 100%;
+    padding: 0.6rem 0.9rem;
+    border-radius: 8px;
+    border: 1px solid var(--border);
+    background: var(--surface);
+    color: var(--text);
+    font-size: 0.9rem;
+  }}
+  .resultados {{ display: flex; flex-direction: column; margin-top: 0.5rem; }}
+  .resultado {{
+    text-align: left;
+    padding: 0.5rem 0.8rem;
+    border: none;
+    border-bottom: 1px solid var(--border);
+    background: transparent;
+    color: var(--text);
+    cursor: pointer;
+    font-size: 0.85rem;
+  }}
+  .resultado:hover {{ background: rgba(255,255,255,0.04); }}
+
   footer {{
     text-align: center;
     padding: 2rem;
@@ -509,6 +729,21 @@ def main():
     </div>
   </div>
 
+  <!-- BUSCADOR DE PRODUCTOS -->
+  <div class="section">
+    <div class="section-title">🔎 Buscar producto</div>
+    <input id="buscador" class="buscador" type="search" autocomplete="off"
+           placeholder="Nombre, marca o PLU…" oninput="buscar(this.value)">
+    <div id="resultados" class="resultados"></div>
+    <div id="producto" style="display:none;margin-top:1rem">
+      <div id="producto-titulo" style="font-weight:700"></div>
+      <div id="producto-sub" style="font-size:0.75rem;color:var(--muted);margin:0.2rem 0 0.8rem"></div>
+      <div class="chart-container" style="height:220px">
+        <canvas id="chartProducto"></canvas>
+      </div>
+    </div>
+  </div>
+
 </div>
 
 <footer>
@@ -517,16 +752,27 @@ def main():
 </footer>
 
 <script>
-const GRAFICOS = {graficos_js};
-const RANK_DIA  = {rank_dia_js};
-const RANK_MES  = {rank_mes_js};
-const RANK_ANIO = {rank_anio_js};
-const RANK_BAJA = {json.dumps(resumen.get('ranking_baja_dia', [])[:10], ensure_ascii=False)};
+const MANIFIESTO = {manifiesto_js};
 
 let periodoActual = '7d';
 let chartGeneral = null;
 let chartCat = null;
 let catActual = null;
+let rankingActual = null;
+
+// ── DATOS BAJO DEMANDA ───────────────────────────────────────────────────────
+// Cada serie / ranking es un archivo de datos/ que se baja la primera vez
+// que hace falta; las respuestas (o sus promesas) quedan cacheadas.
+const DATOS = {{}};
+function cargar(ruta) {{
+  if (!ruta) return Promise.resolve(null);
+  if (!DATOS[ruta]) {{
+    DATOS[ruta] = fetch(ruta)
+      .then(r => r.ok ? r.json() : null)
+      .catch(() => null);
+  }}
+  return DATOS[ruta];
+}}
 
 // ── GRAFICO GENERAL EN % ─────────────────────────────────────────────────────
 function cambiarPeriodo(periodo, btn) {{
@@ -537,8 +783,9 @@ function cambiarPeriodo(periodo, btn) {{
   renderSelectorCats(periodo);
 }}
 
-function renderChartGeneral(periodo) {{
-  const datos = GRAFICOS[periodo]?.total || [];
+async function renderChartGeneral(periodo) {{
+  const datos = (await cargar(MANIFIESTO.periodos[periodo]?.total)) || [];
+  if (periodo !== periodoActual) return;   // se eligió otro período mientras bajaba
   const labels = datos.map(d => d.fecha);
   const values = datos.map(d => d.pct);          // YA en %
 
@@ -586,7 +833,7 @@ function renderChartGeneral(periodo) {{
 function renderSelectorCats(periodo) {{
   // Usar categorías del JSON; si no hay, mostrar las 7 principales igual
   const CATS_DEFAULT = ['Almacén','Frescos','Congelados','Bebidas Con Alcohol','Bebidas Sin Alcohol','Limpieza','Cuidado Personal'];
-  const catsJSON = Object.keys(GRAFICOS[periodo]?.categorias || {{}});
+  const catsJSON = Object.keys(MANIFIESTO.periodos[periodo]?.categorias || {{}});
   const cats = catsJSON.length ? catsJSON : CATS_DEFAULT;
   const cont = document.getElementById('selectorCat');
   cont.innerHTML = '';
@@ -606,8 +853,9 @@ function renderSelectorCats(periodo) {{
   renderChartCat(periodo, catActual);
 }}
 
-function renderChartCat(periodo, cat) {{
-  const datos = GRAFICOS[periodo]?.categorias?.[cat] || [];
+async function renderChartCat(periodo, cat) {{
+  const datos = (await cargar(MANIFIESTO.periodos[periodo]?.categorias?.[cat])) || [];
+  if (periodo !== periodoActual || cat !== catActual) return;
   const labels = datos.map(d => d.fecha);
   const values = datos.map(d => d.pct);          // YA en %
 
@@ -651,13 +899,17 @@ function renderChartCat(periodo, cat) {{
 }}
 
 // ── RANKINGS ─────────────────────────────────────────────────────────────────
-function mostrarRanking(periodo, btn) {{
+async function mostrarRanking(periodo, btn) {{
+  rankingActual = periodo;
   document.querySelectorAll('.rank-tab').forEach(t => t.classList.remove('active'));
   btn.classList.add('active');
-  const mapas = {{ dia: RANK_DIA, mes: RANK_MES, anio: RANK_ANIO }};
-  const data = mapas[periodo] || [];
-  renderTablaRanking('tabla-sube', data, false);
-  if (periodo === 'dia') renderTablaRanking('tabla-baja', RANK_BAJA, true);
+  const [data, baja] = await Promise.all([
+    cargar(MANIFIESTO.rankings[periodo]),
+    periodo === 'dia' ? cargar(MANIFIESTO.rankings.baja_dia) : null,
+  ]);
+  if (periodo !== rankingActual) return;
+  renderTablaRanking('tabla-sube', data || [], false);
+  if (periodo === 'dia') renderTablaRanking('tabla-baja', baja || [], true);
   else document.getElementById('tabla-baja').innerHTML = '<tr><td colspan="4" style="color:var(--muted);text-align:center;padding:1rem">Solo disponible para hoy</td></tr>';
 }}
 
@@ -682,10 +934,120 @@ function renderTablaRanking(id, data, esBaja) {{
   }}).join('');
 }}
 
+// ── BUSCADOR DE PRODUCTOS ────────────────────────────────────────────────────
+// El índice (palabras ordenadas → filas) está partido por las primeras
+// letras de cada palabra (MANIFIESTO.productos.indice): una búsqueda baja
+// sólo el fragmento de su palabra más larga y las demás se buscan en los
+// productos de ese fragmento. La historia de un producto sale de su archivo
+// en datos/productos/ al elegirlo.
+let busqueda = '';
+let chartProducto = null;
+
+function palabras(texto) {{
+  return texto.normalize('NFKD').replace(/[^\x00-\x7f]/g, '').toLowerCase()
+    .split(/[^a-z0-9]+/).filter(p => p.length > 1);
+}}
+
+function fragmento(palabra) {{
+  const indice = MANIFIESTO.productos.indice;
+  return cargar(indice[palabra.slice(0, 2)] || indice[palabra[0]]);
+}}
+
+function filasConPrefijo(frag, prefijo) {{
+  const ps = frag.palabras;
+  let lo = 0, hi = ps.length;
+  while (lo < hi) {{ const m = (lo + hi) >> 1; if (ps[m] < prefijo) lo = m + 1; else hi = m; }}
+  const filas = new Set();
+  for (let i = lo; i < ps.length && ps[i].startsWith(prefijo); i++) {{
+    let f = 0;
+    frag.filas[i].forEach(d => filas.add(f += d));   // vienen en diferencias
+  }}
+  return filas;
+}}
+
+async function buscar(texto) {{
+  busqueda = texto;
+  const cont = document.getElementById('resultados');
+  const consulta = palabras(texto);
+  if (!consulta.length || !MANIFIESTO.productos) {{ cont.innerHTML = ''; return; }}
+  const clave = consulta.reduce((a, b) => b.length > a.length ? b : a);
+  const frag = await fragmento(clave);
+  if (texto !== busqueda) return;
+  const otras = consulta.filter(p => p !== clave);
+  const orden = (frag ? [...filasConPrefijo(frag, clave)] : [])
+    .filter(fila => {{
+      const ps = palabras(`${{frag.plu[fila]}} ${{frag.nombre[fila]}} ${{frag.marca[fila]}}`);
+      return otras.every(q => ps.some(p => p.startsWith(q)));
+    }})
+    .sort((a, b) => a - b).slice(0, 20);
+  cont.innerHTML = '';
+  if (!orden.length) {{ cont.textContent = 'Sin resultados'; return; }}
+  orden.forEach(fila => {{
+    const btn = document.createElement('button');
+    btn.className = 'resultado';
+    btn.textContent = `${{frag.nombre[fila]}} · ${{frag.marca[fila]}} · PLU ${{frag.plu[fila]}}`;
+    btn.onclick = () => {{ location.hash = 'plu=' + frag.plu[fila]; }};
+    cont.appendChild(btn);
+  }});
+}}
+
+async function mostrarProducto(plu) {{
+  if (!MANIFIESTO.productos) return;
+  const frag = await fragmento(plu);
+  const fila = frag ? frag.plu.indexOf(plu) : -1;
+  if (fila < 0) return;
+  const rutas = await cargar(MANIFIESTO.productos.rutas);
+  const datos = rutas && await cargar(rutas[frag.archivo[fila]]);
+  const prod = datos && datos[plu];
+  if (!prod) return;
+
+  // Cambios de precio → serie escalonada hasta el último día visto
+  const iso = f => `${{String(f).slice(0, 4)}}-${{String(f).slice(4, 6)}}-${{String(f).slice(6, 8)}}`;
+  const puntos = prod.c.map(([f, p]) => ({{ x: iso(f), y: p }}));
+  const ultimo = prod.c[prod.c.length - 1];
+  if (prod.h > ultimo[0]) puntos.push({{ x: iso(prod.h), y: ultimo[1] }});
+
+  document.getElementById('producto').style.display = '';
+  document.getElementById('producto-titulo').textContent = frag.nombre[fila];
+  document.getElementById('producto-sub').textContent =
+    `${{frag.marca[fila]}} · PLU ${{plu}} · $${{ultimo[1].toLocaleString('es-AR')}} (visto por última vez ${{iso(prod.h)}})`;
+  if (chartProducto) chartProducto.destroy();
+  chartProducto = new Chart(document.getElementById('chartProducto').getContext('2d'), {{
+    type: 'line',
+    data: {{
+      labels: puntos.map(p => p.x),
+      datasets: [{{
+        data: puntos.map(p => p.y),
+        borderColor: '#f59e0b',
+        borderWidth: 2,
+        pointRadius: 0,
+        stepped: true,
+      }}]
+    }},
+    options: {{
+      responsive: true,
+      maintainAspectRatio: false,
+      plugins: {{ legend: {{ display: false }} }},
+      scales: {{
+        x: {{ ticks: {{ color: '#64748b', maxTicksLimit: 6 }}, grid: {{ color: '#2a2d3a' }} }},
+        y: {{ ticks: {{ color: '#64748b', callback: v => '$' + v.toLocaleString('es-AR') }}, grid: {{ color: '#2a2d3a' }} }}
+      }}
+    }}
+  }});
+}}
+
+// #plu=<PLU>: cada producto tiene su URL
+function productoDesdeURL() {{
+  const m = location.hash.match(/plu=([^&]+)/);
+  if (m) mostrarProducto(decodeURIComponent(m[1]));
+}}
+window.addEventListener('hashchange', productoDesdeURL);
+
 // ── INIT ─────────────────────────────────────────────────────────────────────
 renderChartGeneral('7d');
 renderSelectorCats('7d');
 mostrarRanking('dia', document.querySelector('.rank-tab'));
+productoDesdeURL();
 </script>
 </body>
 </html>"""
@@ -693,6 +1055,7 @@ mostrarRanking('dia', document.querySelector('.rank-tab'));
     ruta = DIR_DOCS / "index.html"
     with open(ruta, "w", encoding="utf-8") as f:
         f.write(html)
+    cache_build.registrar(CACHE_BUILD, "web", clave, [ruta, *(r for r in DIR_DATOS_WEB.rglob("*") if r.is_file())])
     print(f"✅ Web generada: {ruta}")
 
 
@@ -0,0 +1,432 @@
+"""
+historial.py
+============
+Histórico de precios particionado por día (reemplaza a precios_compacto.csv),
+separado en una dimensión de productos y una tabla de hechos angosta.
+
+ALMACENAMIENTO (data/historial/):
+  productos.parquet
+    → Dimensión: una fila por versión de los atributos de cada PLU
+    → Columnas: plu_id (int32), plu, nombre, marca, categoria, cat_principal,
+                desde, hasta (int32 YYYYMMDD: primer y último día vistos así)
+  precios/YYYYMMDD.parquet
+    → Hechos: una partición por día, una fila por producto
+    → Columnas: plu_id (int32), fecha (int32 YYYYMMDD),
+                precio_actual, precio_regular (int32, en centavos)
+  (sin pyarrow los mismos archivos van como .csv.gz)
+
+El nombre/marca/categoría de un PLU se guarda una vez por versión y no una
+vez por día. Los precios van en centavos enteros: ocupan lo mismo que un
+float32 pero no pierden centavos en precios de seis cifras.
+
+Escribir un día sólo toca su partición (tmp + rename) y la dimensión:
+correrlo dos veces deja los mismos archivos. Los días se escriben en orden
+de fecha. Leer acepta un rango de fechas y sólo abre las particiones del
+rango; los atributos se unen después, sólo donde hacen falta.
+
+Migración única desde data/precios_compacto.csv (o desde las particiones
+anchas data/historial/YYYYMMDD.parquet):
+  python historial.py --migrar
+"""
+
+import os
+import sys
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from categorias import principal_de
+
+try:
+    import pyarrow   # noqa: F401  (motor de to_parquet/read_parquet)
+except ImportError:
+    pyarrow = None
+
+DIR_DATA         = Path("data")
+DIR_HISTORIAL    = DIR_DATA / "historial"
+PRECIOS_COMPACTO = DIR_DATA / "precios_compacto.csv"
+
+ATRIBUTOS   = ["plu", "nombre", "marca", "categoria", "cat_principal"]
+PRECIOS     = ["precio_actual", "precio_regular"]
+EXT_PARQUET = ".parquet"
+EXT_CSV     = ".csv.gz"
+FORMATO     = EXT_PARQUET if pyarrow is not None else EXT_CSV
+
+
+def _dir_precios():
+    return DIR_HISTORIAL / "precios"
+
+
+def _ruta_dimension():
+    """productos.parquet (o .csv.gz); si existen ambos gana el Parquet."""
+    for ext in ((EXT_PARQUET, EXT_CSV) if pyarrow is not None else (EXT_CSV,)):
+        ruta = DIR_HISTORIAL / f"productos{ext}"
+        if ruta.exists():
+            return ruta
+    return DIR_HISTORIAL / f"productos{FORMATO}"
+
+
+def _particiones_en(directorio):
+    """{fecha "YYYYMMDD": ruta} de un directorio de particiones diarias."""
+    out = {}
+    if not directorio.exists():
+        return out
+    for ruta in sorted(directorio.iterdir()):
+        fecha, _, ext = ruta.name.partition(".")
+        ext = "." + ext
+        if len(fecha) != 8 or not fecha.isdigit() or ext not in (EXT_PARQUET, EXT_CSV):
+            continue
+        if ext == EXT_PARQUET and pyarrow is None:
+            continue
+        if fecha not in out or ext == EXT_PARQUET:
+            out[fecha] = ruta
+    return out
+
+
+def particiones():
+    """{fecha "YYYYMMDD": ruta} de las particiones de precios."""
+    return _particiones_en(_dir_precios())
+
+
+def archivos():
+    """Todos los archivos del histórico (dimensión + particiones), para huellas de cache."""
+    dim = _ruta_dimension()
+    return ([dim] if dim.exists() else []) + [particiones()[f] for f in sorted(particiones())]
+
+
+def fechas():
+    """Fechas disponibles, ordenadas."""
+    return sorted(particiones())
+
+
+def fecha_en_o_antes(fecha_str):
+    """La partición más reciente <= fecha_str (o None)."""
+    fs = fechas()
+    i = bisect_right(fs, fecha_str)
+    return fs[i - 1] if i else None
+
+
+# ── LECTURA / ESCRITURA DE ARCHIVOS ──────────────────────────────────────────
+def _leer_archivo(ruta, columnas=None):
+    if ruta.name.endswith(EXT_PARQUET):
+        return pd.read_parquet(ruta, columns=columnas)
+    return pd.read_csv(ruta, usecols=columnas, dtype={"plu": str, "fecha": str})
+
+
+def _escribir_archivo(df, ruta):
+    """Escritura atómica (tmp + rename) en el formato que indica la extensión."""
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_name(ruta.name + ".tmp")
+    if ruta.name.endswith(EXT_PARQUET):
+        df.to_parquet(tmp, index=False, compression="zstd")
+    else:
+        df.to_csv(tmp, index=False, compression="gzip")
+    os.replace(tmp, ruta)
+    return ruta
+
+
+def _a_centavos(serie):
+    """Precio en pesos → int32 en centavos (nulos se mantienen nulos)."""
+    return pd.array(np.round(pd.to_numeric(serie, errors="coerce").to_numpy(float) * 100),
+                    dtype="Int32")
+
+
+def _a_pesos(serie):
+    return serie.to_numpy(dtype=float, na_value=np.nan) / 100
+
+
+# ── DIMENSIÓN DE PRODUCTOS ───────────────────────────────────────────────────
+def leer_dimension():
+    """Todas las versiones de productos, ordenadas por (plu_id, desde)."""
+    ruta = _ruta_dimension()
+    if not ruta.exists():
+        return pd.DataFrame({
+            "plu_id": pd.Series(dtype="int32"),
+            **{c: pd.Series(dtype=object) for c in ATRIBUTOS},
+            "desde": pd.Series(dtype="int32"), "hasta": pd.Series(dtype="int32"),
+        })
+    dim = _leer_archivo(ruta)
+    dim["plu"] = dim["plu"].astype(str)
+    for c in ("plu_id", "desde", "hasta"):
+        dim[c] = dim[c].astype("int32")
+    return dim.sort_values(["plu_id", "desde"], kind="stable").reset_index(drop=True)
+
+
+def _actualizar_dimension(dim, df_dia, fecha):
+    """
+    Registra los atributos de df_dia vistos en `fecha` (int YYYYMMDD).
+    Devuelve (dim actualizada, plu_id de cada fila de df_dia).
+
+    Por PLU se toma la versión vigente en `fecha` (la de mayor desde <= fecha):
+    si los atributos coinciden se extiende su `hasta`; si cambiaron se abre
+    una versión nueva (o se corrige la del mismo día si es un re-run).
+    """
+    attrs = [c for c in ATRIBUTOS if c != "plu"]
+    dia = df_dia[ATRIBUTOS].astype(object).reset_index(drop=True)
+
+    ids = dict(zip(dim["plu"], dim["plu_id"]))
+    siguiente = int(dim["plu_id"].max()) + 1 if len(dim) else 0
+    nuevos = [p for p in pd.unique(dia["plu"]) if p not in ids]
+    ids.update(zip(nuevos, range(siguiente, siguiente + len(nuevos))))
+    plu_id = dia["plu"].map(ids).to_numpy("int32")
+
+    # Versión vigente por PLU (índice de fila en dim) para los PLUs del día
+    previas = dim[dim["desde"] <= fecha]
+    vigente = previas.groupby("plu_id", sort=False).tail(1)
+    fila = pd.Series(vigente.index, index=vigente["plu_id"].to_numpy())
+    pos = fila.reindex(plu_id).to_numpy()
+    existe = ~np.isnan(pos)
+    pos_ok = pos[existe].astype(int)
+
+    iguales = np.zeros(len(dia), dtype=bool)
+    if existe.any():
+        antes = dim.loc[pos_ok, attrs].fillna("\0").to_numpy()
+        ahora = dia.loc[existe, attrs].fillna("\0").to_numpy()
+        iguales[existe] = (antes == ahora).all(axis=1)
+
+    dim = dim.copy()
+    # Sin cambios: se extiende la vigencia
+    extender = pos[existe & iguales].astype(int)
+    dim.loc[extender, "hasta"] = np.maximum(dim.loc[extender, "hasta"].to_numpy(), fecha)
+
+    # Cambió en un re-run del mismo día: se corrige esa versión
+    cambio = existe & ~iguales
+    mismo_dia = np.zeros(len(dia), dtype=bool)
+    if cambio.any():
+        mismo_dia[cambio] = dim.loc[pos[cambio].astype(int), "desde"].to_numpy() == fecha
+        corregir = pos[mismo_dia].astype(int)
+        dim.loc[corregir, attrs] = dia.loc[mismo_dia, attrs].to_numpy()
+
+    # PLU nuevo o atributos nuevos: versión [fecha, fecha]
+    alta = ~existe | (cambio & ~mismo_dia)
+    if alta.any():
+        nuevas = dia[alta].copy()
+        nuevas.insert(0, "plu_id", plu_id[alta])
+        nuevas["desde"] = np.int32(fecha)
+        nuevas["hasta"] = np.int32(fecha)
+        dim = pd.concat([dim, nuevas], ignore_index=True)
+        dim = dim.sort_values(["plu_id", "desde"], kind="stable").reset_index(drop=True)
+
+    for c in ("plu_id", "desde", "hasta"):
+        dim[c] = dim[c].astype("int32")
+    return dim, plu_id
+
+
+def describir(df, columnas=("plu", "nombre", "marca", "categoria"), fecha=None):
+    """
+    Agrega a `df` (con plu_id) los atributos de la dimensión vigentes en
+    `fecha` (int YYYYMMDD; default la última versión de cada PLU).
+    Pensado para las pocas filas que llegan a un ranking.
+    """
+    dim = leer_dimension()
+    if fecha is not None:
+        dim = dim[dim["desde"] <= int(fecha)]
+    ultima = dim.groupby("plu_id", sort=False).tail(1).set_index("plu_id")
+    out = df.copy()
+    for c in columnas:
+        out[c] = df["plu_id"].map(ultima[c]).to_numpy()
+    return out
+
+
+def _atributos_por_fila(dim, plu_id, fecha, columnas):
+    """
+    Atributos vigentes para cada (plu_id, fecha) de los hechos.
+    Los PLUs con una sola versión (casi todos) se resuelven indexando por
+    plu_id; sólo los que cambiaron pasan por merge_asof.
+    """
+    ultima = dim.groupby("plu_id", sort=False).tail(1)
+    n_ids = int(dim["plu_id"].max()) + 1 if len(dim) else 0
+    out = {}
+    for c in columnas:
+        cat = pd.Categorical(ultima[c])
+        codigos = np.full(n_ids, -1, dtype=np.int32)
+        codigos[ultima["plu_id"].to_numpy()] = cat.codes
+        out[c] = (codigos[plu_id], cat.categories)
+
+    versiones = dim["plu_id"].value_counts()
+    multi = versiones.index[versiones.to_numpy() > 1].to_numpy()
+    if len(multi):
+        sel = np.isin(plu_id, multi)
+        hechos = pd.DataFrame({"plu_id": plu_id[sel], "fecha": fecha[sel], "_fila": np.nonzero(sel)[0]})
+        hechos = hechos.sort_values("fecha", kind="stable")
+        vers = dim[dim["plu_id"].isin(multi)].sort_values("desde", kind="stable")
+        unidos = pd.merge_asof(hechos, vers[["plu_id", "desde", *columnas]],
+                               left_on="fecha", right_on="desde", by="plu_id")
+        for c in columnas:
+            codigos, categorias = out[c]
+            faltan = ~unidos[c].isin(categorias) & unidos[c].notna()
+            if faltan.any():
+                categorias = categorias.append(pd.Index(pd.unique(unidos.loc[faltan, c])))
+            codigos[unidos["_fila"].to_numpy()] = categorias.get_indexer(unidos[c])
+            out[c] = (codigos, categorias)
+
+    return {c: pd.Categorical.from_codes(codigos, categorias) for c, (codigos, categorias) in out.items()}
+
+
+# ── API ──────────────────────────────────────────────────────────────────────
+def escribir_dia(df_dia, fecha_str):
+    """
+    Escribe (o reemplaza) la partición de `fecha_str` y actualiza la
+    dimensión. Re-run seguro. Devuelve el plu_id de cada fila de df_dia.
+    """
+    fecha = int(fecha_str)
+    df = df_dia.copy()
+    df["plu"] = df["plu"].astype(str)
+    dim, plu_id = _actualizar_dimension(leer_dimension(), df, fecha)
+
+    hechos = pd.DataFrame({
+        "plu_id": plu_id,
+        "fecha": np.full(len(df), fecha, dtype="int32"),
+        **{c: _a_centavos(df[c]) for c in PRECIOS},
+    })
+    ruta = _escribir_archivo(hechos, _dir_precios() / f"{fecha_str}{FORMATO}")
+    for ext in (EXT_PARQUET, EXT_CSV):
+        otra = _dir_precios() / f"{fecha_str}{ext}"
+        if otra != ruta:
+            otra.unlink(missing_ok=True)
+    _escribir_archivo(dim, DIR_HISTORIAL / f"productos{FORMATO}")
+    return plu_id
+
+
+def recorrer(desde=None, hasta=None, columnas=None):
+    """
+    Recorre las particiones de [desde, hasta] ("YYYYMMDD", ambos opcionales)
+    en orden de fecha, de a una: genera (fecha, df) con las columnas tal
+    como están guardadas (precios en centavos). Para pasadas en streaming
+    que no necesitan todo el histórico en memoria.
+    """
+    for fecha, ruta in sorted(particiones().items()):
+        if (desde is None or fecha >= desde) and (hasta is None or fecha <= hasta):
+            yield fecha, _leer_archivo(ruta, columnas)
+
+
+def leer(desde=None, hasta=None, atributos=("cat_principal",)):
+    """
+    Hechos de las fechas en [desde, hasta] ("YYYYMMDD", ambos opcionales),
+    en orden de fecha: plu_id, fecha (int32), precio_actual, precio_regular
+    (float, en pesos) y los `atributos` de la dimensión vigentes ese día
+    (como categóricas). Sólo se abren las particiones del rango.
+    """
+    dfs = [df for _, df in recorrer(desde, hasta)]
+    if not dfs:
+        return pd.DataFrame(columns=["plu_id", "fecha", *PRECIOS, *atributos])
+    hechos = pd.concat(dfs, ignore_index=True)
+    plu_id = hechos["plu_id"].to_numpy("int32")
+    fecha = hechos["fecha"].to_numpy("int32")
+    df = pd.DataFrame({"plu_id": plu_id, "fecha": fecha,
+                       **{c: _a_pesos(hechos[c]) for c in PRECIOS}})
+    if atributos:
+        for c, valores in _atributos_por_fila(leer_dimension(), plu_id, fecha, list(atributos)).items():
+            df[c] = valores
+    return df
+
+
+class Historial:
+    """
+    Histórico en memoria con índice de fechas: las filas de cada fecha son
+    un rango contiguo [inicio, fin) y las fechas quedan en una lista
+    ordenada, así un snapshot es un bisect + un slice (sin máscara sobre
+    toda la tabla ni copia).
+
+        hist = Historial(leer(desde))
+        hist.dia(hist.en_o_antes(20260101))
+    """
+
+    def __init__(self, df):
+        f = df["fecha"].to_numpy()
+        if len(f) > 1 and (np.diff(f) < 0).any():
+            df = df.sort_values("fecha", kind="stable", ignore_index=True)
+            f = df["fecha"].to_numpy()
+        self.df = df
+        cortes = np.flatnonzero(np.diff(f)) + 1
+        self._inicio = np.r_[0, cortes].astype(int) if len(f) else np.array([], dtype=int)
+        self._fin = np.r_[cortes, len(f)].astype(int) if len(f) else np.array([], dtype=int)
+        self.fechas = [int(x) for x in f[self._inicio]]
+
+    def __len__(self):
+        return len(self.df)
+
+    def rango(self, fecha):
+        """(inicio, fin) de las filas de `fecha`, o None si no hay snapshot ese día."""
+        if fecha is None:
+            return None
+        i = bisect_left(self.fechas, int(fecha))
+        if i < len(self.fechas) and self.fechas[i] == int(fecha):
+            return int(self._inicio[i]), int(self._fin[i])
+        return None
+
+    def dia(self, fecha):
+        """Filas de `fecha` (slice del DataFrame, sin copiar), o None."""
+        r = self.rango(fecha)
+        return self.df.iloc[r[0]:r[1]] if r else None
+
+    def en_o_antes(self, fecha):
+        """La fecha más reciente <= fecha (o None)."""
+        i = bisect_right(self.fechas, int(fecha))
+        return self.fechas[i - 1] if i else None
+
+    def anterior(self, fecha):
+        """La fecha más reciente < fecha (o None)."""
+        i = bisect_left(self.fechas, int(fecha))
+        return self.fechas[i - 1] if i else None
+
+    def desde(self, fecha):
+        """Fechas >= fecha."""
+        return self.fechas[bisect_left(self.fechas, int(fecha)):]
+
+
+# ── MIGRACIÓN ────────────────────────────────────────────────────────────────
+def _migrar_dias(dias):
+    """dias: iterable de (fecha_str, df ancho del día), en orden de fecha."""
+    n = filas = 0
+    for fecha, df_dia in dias:
+        if "cat_principal" not in df_dia.columns:
+            df_dia = df_dia.assign(cat_principal=principal_de(df_dia["categoria"]))
+        escribir_dia(df_dia, fecha)
+        n += 1
+        filas += len(df_dia)
+    return n, filas
+
+
+def migrar_csv(ruta_csv=PRECIOS_COMPACTO):
+    """Parte precios_compacto.csv en dimensión + una partición por fecha."""
+    df = pd.read_csv(ruta_csv, dtype={"plu": str, "fecha": str})
+    n, filas = _migrar_dias(df.groupby("fecha", sort=True))
+    print(f"  Migrado {ruta_csv}: {filas} filas en {n} particiones -> {DIR_HISTORIAL}")
+    return n
+
+
+def migrar_particiones_anchas():
+    """Pasa las particiones data/historial/YYYYMMDD.* (una fila ancha por producto) al formato actual."""
+    anchas = _particiones_en(DIR_HISTORIAL)
+    n, filas = _migrar_dias((f, _leer_archivo(r)) for f, r in sorted(anchas.items()))
+    for f in anchas:
+        for ext in (EXT_PARQUET, EXT_CSV):
+            (DIR_HISTORIAL / f"{f}{ext}").unlink(missing_ok=True)
+    print(f"  Migradas {n} particiones anchas ({filas} filas) -> {DIR_HISTORIAL}")
+    return n
+
+
+def migrar_si_hace_falta():
+    """Primera corrida: migra el histórico viejo si todavía no hay particiones de precios."""
+    if particiones():
+        return
+    if _particiones_en(DIR_HISTORIAL):
+        migrar_particiones_anchas()
+    elif PRECIOS_COMPACTO.exists():
+        migrar_csv(PRECIOS_COMPACTO)
+        print(f"  {PRECIOS_COMPACTO} ya no se actualiza; se puede borrar.")
+
+
+if __name__ == "__main__":
+    if "--migrar" in sys.argv:
+        if _particiones_en(DIR_HISTORIAL):
+            migrar_particiones_anchas()
+        else:
+            migrar_csv(PRECIOS_COMPACTO)
+    else:
+        fs = fechas()
+        print(f"{len(fs)} particiones en {_dir_precios()}" + (f" ({fs[0]} → {fs[-1]})" if fs else ""))
+        print(f"{len(leer_dimension())} versiones de productos en {_ruta_dimension()}")
@@ -0,0 +1,75 @@
+"""
+rankings.py
+===========
+Rankings de los productos que más subieron / bajaron a partir de la tabla
+de variaciones de analizar_precios (calcular_variacion / comparar_horizontes).
+
+En vez de ordenar todo el catálogo para quedarse con 20 filas, se hace una
+selección parcial (np.partition, lineal) del umbral del top-K y sólo se
+ordenan los candidatos: los K mejores más los empatados en el umbral.
+Subas y bajas salen de la misma pasada sobre los mismos arrays.
+
+Empates: se desempata por las columnas de DESEMPATE (ascendente), de modo
+que el ranking no depende del orden en que llegaron las filas. Con
+desempate=() queda el orden de las filas.
+
+Filtro de precio mínimo: con precio_minimo > 0 se excluyen los productos
+cuyo precio de hoy o de referencia está por debajo (evita que un producto
+de $50 que pasa a $100 encabece el ranking con +100%).
+"""
+
+import numpy as np
+
+TOP_N = 20
+DESEMPATE = ("plu",)
+PRECIO_MINIMO = 0.0
+
+
+def _elegibles(df_var, columna, precio_minimo):
+    """Posiciones de las filas rankeables y sus valores de `columna`."""
+    valores = df_var[columna].to_numpy(float)
+    ok = ~np.isnan(valores)
+    if precio_minimo:
+        for c in ("precio_hoy", "precio_antes"):
+            if c in df_var.columns:
+                ok &= df_var[c].to_numpy(float) >= precio_minimo
+    pos = np.flatnonzero(ok)
+    return pos, valores[pos]
+
+
+def _seleccionar(df_var, pos, valores, n, ascendente, columna, desempate):
+    """Top-n de `valores` (filas `pos` de df_var) sin ordenar todo el array."""
+    if n <= 0 or not len(pos):
+        return df_var.iloc[:0]
+    if n < len(valores):
+        if ascendente:
+            umbral = np.partition(valores, n - 1)[n - 1]
+            pos = pos[valores <= umbral]
+        else:
+            umbral = np.partition(valores, len(valores) - n)[len(valores) - n]
+            pos = pos[valores >= umbral]
+    cols = [columna] + [c for c in desempate if c in df_var.columns]
+    candidatos = df_var.iloc[pos]
+    return candidatos.sort_values(
+        cols, ascending=[ascendente] + [True] * (len(cols) - 1), kind="stable").head(n)
+
+
+def top_k(df_var, n=TOP_N, ascendente=False, columna="diff_pct",
+          desempate=DESEMPATE, precio_minimo=PRECIO_MINIMO):
+    """
+    Las n filas de df_var con mayor `columna` (menor si ascendente), en
+    orden, desempatadas por `desempate`. Mismas columnas que df_var.
+    """
+    pos, valores = _elegibles(df_var, columna, precio_minimo)
+    return _seleccionar(df_var, pos, valores, n, ascendente, columna, desempate)
+
+
+def subas_y_bajas(df_var, n_subas=TOP_N, n_bajas=TOP_N, columna="diff_pct",
+                  desempate=DESEMPATE, precio_minimo=PRECIO_MINIMO):
+    """
+    (subas, bajas): top n_subas descendente y top n_bajas ascendente de
+    `columna`, con un solo filtrado de df_var. n = 0 devuelve un DataFrame vacío.
+    """
+    pos, valores = _elegibles(df_var, columna, precio_minimo)
+    return (_seleccionar(df_var, pos, valores, n_subas, False, columna, desempate),
+            _seleccionar(df_var, pos, valores, n_bajas, True, columna, desempate))
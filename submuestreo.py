@@ -0,0 +1,79 @@
+"""
+submuestreo.py
+==============
+Reducción de las series de graficos.json a un máximo de puntos por serie,
+para que los períodos largos (6m, 1y y lo que venga) no crezcan sin límite
+ni obliguen a Chart.js a dibujar un punto por día.
+
+Dos métodos, ambos conservan el primer y el último punto:
+  "minmax" → parte la serie en baldes y de cada uno deja el mínimo y el
+             máximo (en orden de fecha): ningún pico ni pozo desaparece,
+             sólo se achica la resolución entre ellos.
+  "lttb"   → Largest-Triangle-Three-Buckets: de cada balde deja el punto
+             que forma el triángulo más grande con el elegido antes y el
+             promedio del balde siguiente; sigue mejor la forma con un
+             punto por balde, pero no garantiza quedarse con cada extremo.
+
+Las series son listas [{"fecha": "YYYY-MM-DD", "pct": float}]; con menos
+puntos que el máximo se devuelven tal cual.
+"""
+
+import numpy as np
+
+# Máximo de puntos por serie en graficos.json / docs/datos (None = sin límite)
+PUNTOS_POR_SERIE = 240
+METODO = "minmax"
+
+
+def _baldes(n_interior, n_baldes):
+    """Límites [ini, fin) de n_baldes baldes parejos sobre los puntos 1..n_interior."""
+    bordes = np.linspace(1, n_interior + 1, n_baldes + 1).astype(int)
+    return zip(bordes[:-1], bordes[1:])
+
+
+def indices_minmax(y, max_puntos):
+    """Posiciones a conservar: primero, último y min/max de cada balde."""
+    n = len(y)
+    if n <= max_puntos:
+        return np.arange(n)
+    idx = [0]
+    for ini, fin in _baldes(n - 2, max(1, (max_puntos - 2) // 2)):
+        if fin <= ini:
+            continue
+        tramo = y[ini:fin]
+        a, b = ini + int(np.argmin(tramo)), ini + int(np.argmax(tramo))
+        idx.extend(sorted({a, b}))
+    idx.append(n - 1)
+    return np.array(idx)
+
+
+def indices_lttb(x, y, max_puntos):
+    """Posiciones a conservar según Largest-Triangle-Three-Buckets."""
+    n = len(y)
+    if n <= max_puntos or max_puntos < 3:
+        return np.arange(n) if n <= max_puntos else np.array([0, n - 1])
+    baldes = list(_baldes(n - 2, max_puntos - 2))
+    idx = [0]
+    for i, (ini, fin) in enumerate(baldes):
+        sig_ini, sig_fin = baldes[i + 1] if i + 1 < len(baldes) else (n - 1, n)
+        cx, cy = x[sig_ini:sig_fin].mean(), y[sig_ini:sig_fin].mean()
+        ax, ay = x[idx[-1]], y[idx[-1]]
+        area = np.abs((ax - cx) * (y[ini:fin] - ay) - (ax - x[ini:fin]) * (cy - ay))
+        idx.append(ini + int(np.argmax(area)))
+    idx.append(n - 1)
+    return np.array(idx)
+
+
+def reducir(serie, max_puntos=PUNTOS_POR_SERIE, metodo=METODO):
+    """Serie [{fecha, pct}] con a lo sumo max_puntos puntos (ver METODO)."""
+    if not max_puntos or len(serie) <= max_puntos:
+        return serie
+    y = np.array([p["pct"] for p in serie], dtype=float)
+    if metodo == "minmax":
+        idx = indices_minmax(y, max_puntos)
+    elif metodo == "lttb":
+        x = np.array([p["fecha"] for p in serie], dtype="datetime64[D]").astype(float)
+        idx = indices_lttb(x, y, max_puntos)
+    else:
+        raise ValueError(f"método de submuestreo desconocido: {metodo!r} (usar 'minmax' o 'lttb')")
+    return [serie[i] for i in idx]